@@ -0,0 +1,56 @@
+from fastapi import FastAPI, Request
+from app.services.llm.llm_service import LLMService
+from app.services.story_generation.emotion_variants import EmotionVariants
+from app.services.story_generation.story_jobs import StoryJobRunner
+from app.services.story_generation.story_pool import StoryPool
+from app.services.story_generation.story_service import StoryService
+from app.services.vocabulary.vocabulary_service import VocabularyService
+
+def init_services(app: FastAPI) -> None:
+    """
+    Create the process-wide service instances on app.state.
+    Called once from the lifespan handler, after the database is connected.
+    """
+    llm_service = LLMService()
+    vocabulary_service = VocabularyService(llm_service=llm_service)
+    app.state.llm_service = llm_service
+    app.state.vocabulary_service = vocabulary_service
+    app.state.story_service = StoryService(
+        llm_service=llm_service,
+        vocabulary_service=vocabulary_service
+    )
+    # Their workers are started by the lifespan handler
+    app.state.story_pool = StoryPool(app.state.story_service)
+    app.state.story_job_runner = StoryJobRunner(app.state.story_service)
+    app.state.emotion_variants = EmotionVariants(app.state.story_service)
+    app.state.story_service.emotion_variants = app.state.emotion_variants
+
+def _get_service(request: Request, name: str):
+    if not hasattr(request.app.state, name):
+        # Apps started without the lifespan handler (e.g. in tests) create them on first use
+        init_services(request.app)
+    return getattr(request.app.state, name)
+
+def get_llm_service(request: Request) -> LLMService:
+    """Dependency to get the shared LLMService."""
+    return _get_service(request, "llm_service")
+
+def get_vocabulary_service(request: Request) -> VocabularyService:
+    """Dependency to get the shared VocabularyService."""
+    return _get_service(request, "vocabulary_service")
+
+def get_story_service(request: Request) -> StoryService:
+    """Dependency to get the shared StoryService."""
+    return _get_service(request, "story_service")
+
+def get_story_pool(request: Request) -> StoryPool:
+    """Dependency to get the shared StoryPool."""
+    return _get_service(request, "story_pool")
+
+def get_story_job_runner(request: Request) -> StoryJobRunner:
+    """Dependency to get the shared StoryJobRunner."""
+    return _get_service(request, "story_job_runner")
+
+def get_emotion_variants(request: Request) -> EmotionVariants:
+    """Dependency to get the shared EmotionVariants."""
+    return _get_service(request, "emotion_variants")
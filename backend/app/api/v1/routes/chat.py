@@ -1,17 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from app.services.llm.chat_service import ChatService
+from app.services.llm.circuit_breaker import LLMUnavailable
+from app.services.llm.scheduler import LLMRateLimitExceeded
 from app.schemas.chat import ChatRequest, ChatResponse
 from app.api.v1.dependencies.auth import get_current_user, require_role
+from app.api.v1.dependencies.services import get_llm_service
+from app.services.llm.llm_service import LLMService
 from app.models.enums import UserRole
 import logging
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 logger = logging.getLogger(__name__)
 
+def get_chat_service(
+    request: Request,
+    llm_service: LLMService = Depends(get_llm_service)
+) -> ChatService:
+    """Dependency to get the shared ChatService."""
+    if not hasattr(request.app.state, "chat_service"):
+        request.app.state.chat_service = ChatService(llm_service=llm_service)
+    return request.app.state.chat_service
+
 @router.post("/ask", response_model=ChatResponse)
 async def chat_with_ai(
     request: ChatRequest,
-    current_user: tuple[str, UserRole] = Depends(get_current_user)
+    current_user: tuple[str, UserRole] = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service)
 ):
     """
     Chat with AI using relevant chunks as context.
@@ -34,9 +48,6 @@ async def chat_with_ai(
                 detail="Only children can use the chat feature"
             )
         
-        # Initialize chat service
-        chat_service = ChatService()
-        
         # Get response from chat service
         result = await chat_service.chat_with_context(
             query=request.query,
@@ -49,6 +60,16 @@ async def chat_with_ai(
             context_used=result["context_used"]
         )
         
+    except LLMRateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e)
+        )
+    except LLMUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
     except ValueError as ve:
         logger.error(f"Value error in chat: {str(ve)}")
         raise HTTPException(
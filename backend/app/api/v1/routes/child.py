@@ -7,9 +7,12 @@ from app.models.enums import UserRole
 from app.core.security import create_token_for_user
 from typing import List
 from app.models.user import Child, Parent, UserProfileResponse
+import logging
 
 router = APIRouter(prefix="/children", tags=["children"])
 
+logger = logging.getLogger(__name__)
+
 @router.post("", response_model=TokenResponse)
 async def create_child(
     request: ChildCreateRequest,
@@ -34,7 +37,7 @@ async def create_child(
         )
     except Exception as e:
         # Log the error for debugging
-        print(f"Error creating child account: {str(e)}")
+        logger.error("Error creating child account: %s", e)
         # Return a more specific error message
         raise HTTPException(
             status_code=500,
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from app.api.v1.dependencies.auth import require_role
+from app.api.v1.dependencies.services import get_emotion_variants, get_story_job_runner, get_story_pool, get_story_service
+from app.models.enums import UserRole
+from app.services.child_context import get_child_context_cache
+from app.services.llm.circuit_breaker import get_circuit_breakers
+from app.services.llm.hedging import get_hedger
+from app.services.llm.json_repair import get_repair_stats
+from app.services.llm.metrics import get_llm_metrics
+from app.services.llm.model_cache import get_model_cache
+from app.services.llm.response_cache import get_response_cache
+from app.services.llm.scheduler import get_scheduler
+from app.services.llm.single_flight import get_single_flight
+from app.services.story_generation.emotion_variants import EmotionVariants
+from app.services.story_generation.pipeline import get_pipeline_metrics
+from app.services.story_generation.story_jobs import StoryJobRunner
+from app.services.story_generation.story_pool import StoryPool
+from app.services.story_generation.story_service import StoryService
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/llm")
+async def get_llm_stats(
+    admin_id: str = Depends(require_role(UserRole.ADMIN)),
+    story_pool: StoryPool = Depends(get_story_pool),
+    story_job_runner: StoryJobRunner = Depends(get_story_job_runner),
+    emotion_variants: EmotionVariants = Depends(get_emotion_variants),
+    story_service: StoryService = Depends(get_story_service)
+):
+    """
+    Dump LLM call metrics per caller, plus the response cache, model cache,
+    single-flight, scheduler, circuit breaker, hedging and JSON repair
+    counters, the story pool's hit rate and refill lag, story job counts,
+    per-stage timings of the story pipelines, the child context cache, how
+    often emotion taps were served from a precomputed variant and how often
+    new stories were copied from a shared template.
+    Only accessible by admins.
+    """
+    return {
+        "calls": get_llm_metrics().get_stats(),
+        "cache": get_response_cache().get_stats(),
+        "model_cache": get_model_cache().get_stats(),
+        "single_flight": get_single_flight().get_stats(),
+        "scheduler": get_scheduler().get_stats(),
+        "circuit_breakers": get_circuit_breakers().get_stats(),
+        "hedging": get_hedger().get_stats(),
+        "json_repair": get_repair_stats().get_stats(),
+        "story_pool": story_pool.get_stats(),
+        "story_jobs": story_job_runner.get_stats(),
+        "pipelines": get_pipeline_metrics().get_stats(),
+        "child_context": get_child_context_cache().get_stats(),
+        "emotion_variants": emotion_variants.get_stats(),
+        "story_templates": story_service.story_templates.get_stats(),
+    }
+
+@router.get("/llm/prometheus", response_class=PlainTextResponse)
+async def get_llm_prometheus_metrics(
+    admin_id: str = Depends(require_role(UserRole.ADMIN))
+):
+    """
+    LLM call metrics in the Prometheus text format, for scraping.
+    Only accessible by admins.
+    """
+    return PlainTextResponse(
+        get_llm_metrics().render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from app.services.story_generation.story_service import StoryService
-from app.models.story.story import StoryResponse, VocabularyResponse, PaginatedStoryResponse, StoryUpdateRequest, StoryEmotionUpdateRequest
+from app.services.llm.circuit_breaker import LLMUnavailable
+from app.services.llm.scheduler import LLMRateLimitExceeded
+from app.models.story.story import StoryResponse, VocabularyResponse, PaginatedStoryResponse, StoryUpdateRequest, StoryEmotionUpdateRequest, StoryBatchRequest
 from app.api.v1.dependencies.auth import get_current_user, require_role
-from app.models.enums import UserRole
-from typing import List
+from app.api.v1.dependencies.services import get_emotion_variants, get_story_job_runner, get_story_pool, get_story_service
+from app.services.story_generation.emotion_variants import EmotionVariants
+from app.services.story_generation.story_jobs import StoryJobRunner
+from app.services.story_generation.story_pool import StoryPool
+from app.models.enums import JobKind, UserRole
+from app.models.job import Job, JobResponse, StoryJobRequest
+from typing import List, Optional
 from app.db.mongo import MongoDB
+import json
 import logging
 
 router = APIRouter(prefix="/stories", tags=["stories"])
@@ -13,10 +22,13 @@ logger = logging.getLogger(__name__)
 
 @router.post("/generate", response_model=StoryResponse)
 async def generate_story(
-    current_user: tuple[str, UserRole] = Depends(get_current_user)
+    current_user: tuple[str, UserRole] = Depends(get_current_user),
+    story_service: StoryService = Depends(get_story_service),
+    story_pool: StoryPool = Depends(get_story_pool)
 ):
     """
     Generate a new story for the current child.
+    Serves a pre-generated story from the child's pool when one is ready.
     Only accessible by children.
     """
     try:
@@ -27,10 +39,11 @@ async def generate_story(
                 detail="Only children can generate stories"
             )
 
-        story_service = StoryService()
-        story = await story_service.generate_personalized_story(
-            user_id
-        )
+        story = await story_pool.take(user_id)
+        if story is None:
+            story = await story_service.generate_personalized_story(
+                user_id
+            )
         
         return StoryResponse(
             story_id=story.story_id,
@@ -38,6 +51,16 @@ async def generate_story(
             story_body=story.content,
             image_url=story.image_url
         )
+    except LLMRateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e)
+        )
+    except LLMUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
     except ValueError as ve:
         logger.error(f"Value error in story generation: {str(ve)}")
         raise HTTPException(
@@ -51,14 +74,250 @@ async def generate_story(
             detail=f"Failed to generate story: {str(e)}"
         )
 
+@router.get("/generate/stream")
+async def generate_story_stream(
+    current_user: tuple[str, UserRole] = Depends(get_current_user),
+    story_service: StoryService = Depends(get_story_service)
+):
+    """
+    Generate a new story for the current child as a Server-Sent Events stream.
+    Sends a `title` event as soon as the title is written, `token` events with
+    the story text as it is generated, then a `done` event with the stored
+    story's id (or an `error` event).
+    Only accessible by children.
+    """
+    user_id, user_role = current_user
+    if user_role != UserRole.CHILD:
+        raise HTTPException(
+            status_code=403,
+            detail="Only children can generate stories"
+        )
+
+    async def event_stream():
+        async for event in story_service.stream_personalized_story(user_id):
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/parent/generate/batch")
+async def generate_stories_for_children(
+    request: StoryBatchRequest,
+    parent_id: str = Depends(require_role(UserRole.PARENT)),
+    story_service: StoryService = Depends(get_story_service)
+):
+    """
+    Generate a story for each of the parent's children, or the selected ones,
+    as a Server-Sent Events stream.
+    Sends a `story` event with each child's stored story as soon as it is
+    ready, an `error` event for each child whose story failed (with the
+    status code a single request would get), then a `done` event with the
+    number of stories stored and failed.
+    Only accessible by parents.
+    """
+    async def event_stream():
+        async for event in story_service.generate_stories_for_children(parent_id, request.child_ids):
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_story_job(
+    request: StoryJobRequest,
+    current_user: tuple[str, UserRole] = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    story_service: StoryService = Depends(get_story_service),
+    story_job_runner: StoryJobRunner = Depends(get_story_job_runner)
+):
+    """
+    Queue a story generation and return its job right away.
+    Children queue new stories for themselves; parents queue regenerations
+    of their children's stories (kind "regenerate", with child_id, story_id
+    and parent_comment).
+
+    A retried request gets the job it already created when it sends the
+    same Idempotency-Key header.
+    Follow the job with GET /stories/jobs/{job_id} or its /events stream.
+
+    Raises:
+    - **400**: Missing fields for a regeneration
+    - **403**: Not allowed to queue this job
+    - **404**: Story not found
+    """
+    user_id, user_role = current_user
+    if request.kind == JobKind.STORY:
+        if user_role != UserRole.CHILD:
+            raise HTTPException(
+                status_code=403,
+                detail="Only children can generate stories"
+            )
+        job = await story_job_runner.submit(
+            JobKind.STORY,
+            child_id=user_id,
+            requested_by=user_id,
+            idempotency_key=idempotency_key
+        )
+        return JobResponse.from_job(job)
+
+    if user_role != UserRole.PARENT:
+        raise HTTPException(
+            status_code=403,
+            detail="Only parents can regenerate stories"
+        )
+    if not (request.child_id and request.story_id and request.parent_comment):
+        raise HTTPException(
+            status_code=400,
+            detail="child_id, story_id and parent_comment are required to regenerate a story"
+        )
+
+    # Verify parent-child relationship
+    db = MongoDB.get_db()
+    child = await db["children"].find_one({
+        "child_id": request.child_id,
+        "parent_id": user_id
+    })
+    if not child:
+        raise HTTPException(
+            status_code=403,
+            detail="Not authorized to update this story"
+        )
+    story = await story_service.story_repository.get_story(request.story_id)
+    if not story:
+        raise HTTPException(
+            status_code=404,
+            detail="Story not found"
+        )
+    if story.child_id != request.child_id:
+        raise HTTPException(
+            status_code=403,
+            detail="Story does not belong to the specified child"
+        )
+
+    job = await story_job_runner.submit(
+        JobKind.REGENERATE,
+        child_id=request.child_id,
+        requested_by=user_id,
+        params={"story_id": request.story_id, "parent_comment": request.parent_comment},
+        idempotency_key=idempotency_key
+    )
+    return JobResponse.from_job(job)
+
+async def _get_own_job(job_id: str, user_id: str, story_job_runner: StoryJobRunner) -> Job:
+    job = await story_job_runner.get(job_id)
+    # Jobs of other users are reported as missing, so their ids cannot be probed
+    if job is None or user_id not in (job.requested_by, job.child_id):
+        raise HTTPException(
+            status_code=404,
+            detail="Job not found"
+        )
+    return job
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_story_job(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, le=30, description="Seconds to wait for the job to finish"),
+    current_user: tuple[str, UserRole] = Depends(get_current_user),
+    story_job_runner: StoryJobRunner = Depends(get_story_job_runner)
+):
+    """
+    Get a story job; its story is included once it has succeeded.
+    With `wait`, the response is held until the job finishes or the time is up.
+    Accessible by the user who queued the job and the child it is for.
+    """
+    user_id, _ = current_user
+    job = await _get_own_job(job_id, user_id, story_job_runner)
+    if wait and not job.finished:
+        job = await story_job_runner.wait(job_id, timeout=wait) or job
+    return JobResponse.from_job(job)
+
+@router.get("/jobs/{job_id}/events")
+async def get_story_job_events(
+    job_id: str,
+    current_user: tuple[str, UserRole] = Depends(get_current_user),
+    story_job_runner: StoryJobRunner = Depends(get_story_job_runner)
+):
+    """
+    Follow a story job as a Server-Sent Events stream.
+    Sends a `status` event whenever the job changes, the last one once it
+    has succeeded or failed.
+    Accessible by the user who queued the job and the child it is for.
+    """
+    user_id, _ = current_user
+    await _get_own_job(job_id, user_id, story_job_runner)
+
+    async def event_stream():
+        async for job in story_job_runner.watch(job_id):
+            data = JobResponse.from_job(job).model_dump_json()
+            yield f"event: status\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _story_page(
+    story_service: StoryService,
+    child_id: str,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    include_total: Optional[bool]
+) -> PaginatedStoryResponse:
+    """One page of a child's stories; the total is counted on the first page unless asked otherwise."""
+    if include_total is None:
+        include_total = cursor is None
+    try:
+        stories, next_cursor, total = await story_service.story_repository.get_child_stories_page(
+            child_id,
+            limit=limit,
+            cursor=cursor,
+            skip=skip,
+            include_total=include_total
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Map Story objects to StoryResponse objects
+    story_responses = [
+        StoryResponse(
+            story_id=story.story_id,
+            title=story.title,
+            story_body=story.content,  # Map content to story_body
+            image_url=story.image_url
+        )
+        for story in stories
+    ]
+
+    return PaginatedStoryResponse(
+        stories=story_responses,
+        total=total,
+        skip=skip,
+        limit=limit,
+        next_cursor=next_cursor
+    )
+
 @router.get("/my-stories", response_model=PaginatedStoryResponse)
 async def get_my_stories(
     current_user: tuple[str, UserRole] = Depends(get_current_user),
-    skip: int = Query(default=0, ge=0, description="Number of stories to skip"),
-    limit: int = Query(default=10, ge=1, le=50, description="Number of stories to return")
+    skip: int = Query(default=0, ge=0, description="Number of stories to skip; prefer cursor"),
+    limit: int = Query(default=10, ge=1, le=50, description="Number of stories to return"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor of the previous page"),
+    include_total: Optional[bool] = Query(default=None, description="Count all stories; by default only without a cursor"),
+    story_service: StoryService = Depends(get_story_service)
 ):
     """
-    Get paginated stories for the current child.
+    Get paginated stories for the current child, newest first.
+    Pass the response's `next_cursor` as `cursor` to get the next page.
     Only accessible by children.
     """
     try:
@@ -68,30 +327,7 @@ async def get_my_stories(
                 status_code=403,
                 detail="Only children can access their stories"
             )
-        story_service = StoryService()
-        stories, total = await story_service.story_repository.get_child_stories_paginated(
-            user_id,
-            skip=skip,
-            limit=limit
-        )
-        
-        # Map Story objects to StoryResponse objects
-        story_responses = [
-            StoryResponse(
-                story_id=story.story_id,
-                title=story.title,
-                story_body=story.content,  # Map content to story_body
-                image_url=story.image_url
-            )
-            for story in stories
-        ]
-        
-        return PaginatedStoryResponse(
-            stories=story_responses,
-            total=total,
-            skip=skip,
-            limit=limit
-        )
+        return await _story_page(story_service, user_id, skip, limit, cursor, include_total)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -102,7 +338,8 @@ async def get_my_stories(
 
 @router.get("/my-vocabulary", response_model=List[VocabularyResponse])
 async def get_my_vocabulary(
-    current_user: tuple[str, UserRole] = Depends(get_current_user)
+    current_user: tuple[str, UserRole] = Depends(get_current_user),
+    story_service: StoryService = Depends(get_story_service)
 ):
     """
     Get all vocabulary words from stories generated by the current child.
@@ -116,7 +353,6 @@ async def get_my_vocabulary(
                 detail="Only children can access their vocabulary words"
             )
             
-        story_service = StoryService()
         vocabulary_words = await story_service.story_repository.get_child_vocabulary_words(user_id)
         
         return [
@@ -140,11 +376,15 @@ async def get_my_vocabulary(
 async def get_child_stories_by_parent(
     child_id: str,
     parent_id: str = Depends(require_role(UserRole.PARENT)),
-    skip: int = Query(default=0, ge=0, description="Number of stories to skip"),
-    limit: int = Query(default=10, ge=1, le=50, description="Number of stories to return")
+    skip: int = Query(default=0, ge=0, description="Number of stories to skip; prefer cursor"),
+    limit: int = Query(default=10, ge=1, le=50, description="Number of stories to return"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor of the previous page"),
+    include_total: Optional[bool] = Query(default=None, description="Count all stories; by default only without a cursor"),
+    story_service: StoryService = Depends(get_story_service)
 ):
     """
     Get paginated stories for a specific child, verifying parent relationship.
+    Pass the response's `next_cursor` as `cursor` to get the next page.
     Only accessible by parents.
     """
     try:
@@ -161,30 +401,7 @@ async def get_child_stories_by_parent(
                 detail="Not authorized to access this child's information"
             )
             
-        story_service = StoryService()
-        stories, total = await story_service.story_repository.get_child_stories_paginated(
-            child_id,
-            skip=skip,
-            limit=limit
-        )
-        
-        # Map Story objects to StoryResponse objects
-        story_responses = [
-            StoryResponse(
-                story_id=story.story_id,
-                title=story.title,
-                story_body=story.content,  # Map content to story_body
-                image_url=story.image_url
-            )
-            for story in stories
-        ]
-        
-        return PaginatedStoryResponse(
-            stories=story_responses,
-            total=total,
-            skip=skip,
-            limit=limit
-        )
+        return await _story_page(story_service, child_id, skip, limit, cursor, include_total)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -196,7 +413,8 @@ async def get_child_stories_by_parent(
 @router.put("/parent/story/update", response_model=StoryResponse)
 async def update_and_regenerate_story(
     request: StoryUpdateRequest,
-    parent_id: str = Depends(require_role(UserRole.PARENT))
+    parent_id: str = Depends(require_role(UserRole.PARENT)),
+    story_service: StoryService = Depends(get_story_service)
 ):
     """
     Update a story with parent's comment and regenerate it.
@@ -216,11 +434,11 @@ async def update_and_regenerate_story(
     Raises:
     - **404**: Story not found
     - **403**: Not authorized to update this story
+    - **429**: Too many requests waiting for the model
+    - **503**: No model is available
     - **500**: Failed to update story
     """
     try:
-        story_service = StoryService()
-        
         # Get the original story
         story = await story_service.story_repository.get_story(request.story_id)
         if not story:
@@ -249,24 +467,8 @@ async def update_and_regenerate_story(
                 detail="Story does not belong to the specified child"
             )
             
-        # Generate new story
-        new_story = await story_service.generate_personalized_story(
-            request.child_id,
-            parent_comment=request.parent_comment,
-            original_story=story
-        )
-        
-        # Update the story in the database
-        updated_story = await story_service.story_repository.update_story(
-            request.story_id,
-            new_story
-        )
-        
-        if not updated_story:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to update story"
-            )
+        # Generate new story and save it in place of the original
+        updated_story = await story_service.regenerate_story(story, request.parent_comment)
             
         return StoryResponse(
             story_id=updated_story.story_id,
@@ -277,6 +479,16 @@ async def update_and_regenerate_story(
         
     except HTTPException as he:
         raise he
+    except LLMRateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e)
+        )
+    except LLMUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -287,7 +499,8 @@ async def update_and_regenerate_story(
 async def delete_child_story(
     child_id: str,
     story_id: str,
-    parent_id: str = Depends(require_role(UserRole.PARENT))
+    parent_id: str = Depends(require_role(UserRole.PARENT)),
+    story_service: StoryService = Depends(get_story_service)
 ):
     """
     Delete a story for a specific child, verifying parent relationship.
@@ -319,8 +532,6 @@ async def delete_child_story(
                 detail="Not authorized to delete this story"
             )
             
-        story_service = StoryService()
-        
         # Get the story to verify it exists
         story = await story_service.story_repository.get_story(story_id)
         if not story:
@@ -357,11 +568,14 @@ async def delete_child_story(
 @router.put("/story/update-emotion", response_model=StoryResponse)
 async def update_story_emotion(
     request: StoryEmotionUpdateRequest,
-    current_user: tuple[str, UserRole] = Depends(get_current_user)
+    current_user: tuple[str, UserRole] = Depends(get_current_user),
+    story_service: StoryService = Depends(get_story_service),
+    emotion_variants: EmotionVariants = Depends(get_emotion_variants)
 ):
     """
     Update a story based on the child's emotion.
     If the emotion is negative (sad, fear, angry), the story will be regenerated to be more positive and uplifting.
+    Children who use this regularly get the new version prepared in advance, so it is swapped in at once.
     Only accessible by children.
 
     Parameters:
@@ -377,6 +591,8 @@ async def update_story_emotion(
     Raises:
     - **404**: Story not found
     - **403**: Not authorized to update this story
+    - **429**: Too many requests waiting for the model
+    - **503**: No model is available
     - **500**: Failed to update story
     """
     try:
@@ -387,8 +603,6 @@ async def update_story_emotion(
                 detail="Only children can update their stories"
             )
 
-        story_service = StoryService()
-        
         # Get the original story
         story = await story_service.story_repository.get_story(request.story_id)
         if not story:
@@ -404,43 +618,8 @@ async def update_story_emotion(
                 detail="Not authorized to update this story"
             )
             
-        # Generate emotion-based prompt
-        emotion_prompt = ""
-        if request.emotion.lower() in ["sad", "fear", "angry"]:
-            emotion_prompt = f"""The child is feeling {request.emotion}. Please regenerate this story to be more positive and uplifting, 
-            focusing on themes of hope, courage, and happiness. Make sure to:
-            - Include positive outcomes and solutions
-            - Add elements of joy and comfort
-            - Maintain the educational value
-            - Keep the story engaging and fun
-            - Use encouraging and supportive language"""
-        else:
-            emotion_prompt = f"""The child is feeling {request.emotion}. Please enhance this story to maintain and amplify these positive emotions, 
-            focusing on themes of joy, friendship, and adventure. Make sure to:
-            - Keep the positive and happy elements
-            - Add more fun and engaging moments
-            - Maintain the educational value
-            - Keep the story uplifting
-            - Use cheerful and enthusiastic language"""
-            
-        # Generate new story
-        new_story = await story_service.generate_personalized_story(
-            child_id,
-            parent_comment=emotion_prompt,
-            original_story=story
-        )
-        
-        # Update the story in the database
-        updated_story = await story_service.story_repository.update_story(
-            request.story_id,
-            new_story
-        )
-        
-        if not updated_story:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to update story"
-            )
+        # Serve the precomputed variant for this emotion, or regenerate the story live
+        updated_story = await emotion_variants.apply(story, request.emotion)
             
         return StoryResponse(
             story_id=updated_story.story_id,
@@ -451,6 +630,16 @@ async def update_story_emotion(
         
     except HTTPException as he:
         raise he
+    except LLMRateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e)
+        )
+    except LLMUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from app.models.story.story import VocabularyResponse, VocabularyWord
 from app.services.vocabulary.vocabulary_service import VocabularyService
 from app.api.v1.dependencies.auth import get_current_user, require_role
+from app.api.v1.dependencies.services import get_vocabulary_service
 from app.models.enums import UserRole
 from typing import List
 import logging
@@ -10,10 +11,6 @@ from app.db.mongo import MongoDB
 router = APIRouter(prefix="/vocabulary", tags=["vocabulary"])
 logger = logging.getLogger(__name__)
 
-def get_vocabulary_service() -> VocabularyService:
-    """Dependency to get an instance of VocabularyService."""
-    return VocabularyService()
-
 @router.get("/my-vocabulary", response_model=List[VocabularyResponse])
 async def get_my_vocabulary(
     current_user: tuple[str, UserRole] = Depends(get_current_user),
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 from functools import lru_cache
 
 class Settings(BaseSettings):
@@ -23,8 +23,92 @@ class Settings(BaseSettings):
     MAIL_FROM_NAME: str
     
     # Gemini settings
-    GEMINI_API_KEY: str
-    
+    GEMINI_API_KEY: Optional[str] = None  # required when LLM_BACKEND is "gemini"
+
+    # LLM backend: "gemini", or "stub" to run offline with generated responses
+    LLM_BACKEND: str = "gemini"
+    LLM_STUB_LATENCY_SECONDS: float = 0.5
+    LLM_STUB_LATENCY_JITTER_SECONDS: float = 0.2
+    LLM_STUB_LATENCY_DISTRIBUTION: str = "uniform"  # "fixed", "uniform" or "lognormal"
+    LLM_STUB_FAILURE_RATE: float = 0.0  # fraction of calls that raise
+    LLM_STUB_MALFORMED_RATE: float = 0.0  # fraction of responses with broken JSON
+    LLM_STUB_SEED: int = 0
+
+    # LLM request settings
+    LLM_MAX_CONCURRENCY: int = 8  # max in-flight model calls per worker
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 60.0
+    LLM_MODEL_CACHE_MAX_ENTRIES: int = 32  # model handles kept per system instruction/config
+
+    # LLM response cache settings
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_TTL_SECONDS: int = 3600
+    LLM_CACHE_USE_MONGO: bool = True
+    LLM_SINGLE_FLIGHT_ENABLED: bool = True  # coalesce identical in-flight requests
+
+    # LLM scheduler settings (0 means no limit)
+    LLM_REQUESTS_PER_MINUTE: int = 0
+    LLM_TOKENS_PER_MINUTE: int = 0
+    LLM_SCHEDULER_MAX_QUEUE_SIZE: int = 100  # per priority class
+    LLM_BACKGROUND_POLICY: str = "defer"  # "defer" or "reject" when quota is drained
+
+    # LLM circuit breaker settings
+    LLM_BREAKER_ENABLED: bool = True
+    LLM_FALLBACK_MODEL: Optional[str] = None  # cheaper/faster model used while the primary's circuit is open
+    LLM_BREAKER_WINDOW_SECONDS: float = 60.0
+    LLM_BREAKER_MIN_CALLS: int = 10  # calls in the window before the circuit can open
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 20.0
+    LLM_BREAKER_SLOW_CALL_RATE: float = 0.8
+    LLM_BREAKER_OPEN_SECONDS: float = 30.0  # cool-down before probing again
+    LLM_BREAKER_HALF_OPEN_PROBES: int = 1
+
+    # LLM request hedging: duplicate calls slower than a latency percentile
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_HEDGE_CALLERS: List[str] = ["story", "chat"]
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_WINDOW: int = 200  # recent successful calls kept per caller
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # calls seen before a caller is hedged
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    LLM_HEDGE_BUDGET_RATIO: float = 0.05  # at most ~5% extra calls
+    LLM_HEDGE_BUDGET_BURST: float = 5.0
+
+    # Logging settings
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    # Share of sub-WARNING records kept per logger, for high-volume payload logs
+    LOG_SAMPLE_RATES: Dict[str, float] = {"app.services.llm.llm_service.payload": 0.01}
+
+    # Child context cache: settings, name, parent and level per child
+    CHILD_CONTEXT_TTL_SECONDS: float = 300.0
+    CHILD_CONTEXT_MAX_ENTRIES: int = 10000
+
+    # Story settings
+    STORY_SINGLE_CALL_VOCABULARY: bool = True  # generate a story's vocabulary in the same LLM call
+    STORY_POOL_SIZE: int = 2  # ready stories kept per active child; 0 disables the pool
+    STORY_POOL_WORKERS: int = 2
+    STORY_POOL_TTL_SECONDS: int = 7 * 24 * 3600  # pooled stories of inactive children expire
+    STORY_TEMPLATES_ENABLED: bool = True  # share new stories between children with identical settings
+    STORY_TEMPLATE_TTL_SECONDS: int = 30 * 24 * 3600  # templates expire, so shared profiles get new stories
+    # Emotion variants: stories rewritten ahead of time for children who use the emotion buttons
+    EMOTION_VARIANTS_WORKERS: int = 1  # 0 disables precomputation; taps then always regenerate live
+    EMOTION_VARIANTS_ACTIVE_SECONDS: int = 14 * 24 * 3600  # children who tapped an emotion this recently get variants
+    EMOTION_VARIANTS_TTL_SECONDS: int = 7 * 24 * 3600  # unused variants expire
+    EMOTION_VARIANTS_MAX_PENDING: int = 1000  # stories waiting for variants; more are skipped
+
+    # Example stories corpus used for RAG stories
+    STORY_CORPUS_DIR: str = "stories"
+    STORY_CORPUS_CACHE_PATH: Optional[str] = ".cache/story_corpus.json"  # extracted text; None keeps it in memory only
+    STORY_CORPUS_REFRESH_SECONDS: float = 60.0  # how often the directory is checked for changed PDFs
+    STORY_RETRIEVAL_TOP_K: int = 5  # example stories retrieved per RAG story
+
+    # Story job settings: generations that outlive the request that started them
+    STORY_JOB_CONCURRENCY: int = 4  # jobs run at once per worker process; 0 runs none here
+    STORY_JOB_LEASE_SECONDS: float = 120.0  # a crashed worker's job is claimed again after this
+    STORY_JOB_POLL_SECONDS: float = 1.0
+    STORY_JOB_MAX_ATTEMPTS: int = 3
+    STORY_JOB_RETENTION_SECONDS: int = 24 * 3600  # finished jobs are deleted after this
+
     # Image Generator settings
     IMAGE_GENERATOR_URI: str = "https://a84e-34-125-77-122.ngrok-free.app/images/generate"
     
@@ -3,20 +3,56 @@ from fastapi.openapi.utils import get_openapi
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.db.mongo import MongoDB
-from app.api.v1.routes import auth, child, story, vocabulary, chat
+from app.api.v1.routes import auth, child, story, vocabulary, chat, metrics
 from app.api.v1.routes.settings import router as settings_router
 from app.routers.science_qa import router as science_qa_router
 from app.config.settings import get_settings
+from app.services.llm.response_cache import get_response_cache
+from app.services.llm.chat_service import ChatService
+from app.api.v1.dependencies.services import init_services
+from app.core.logging_setup import setup_logging
+from app.repositories.story_pool_repository import StoryPoolRepository
+from app.repositories.story_repository import StoryRepository
+from app.repositories.job_repository import JobRepository
+from app.repositories.story_template_repository import StoryTemplateRepository
+from app.repositories.story_variant_repository import StoryVariantRepository
+from app.utils.story_processing.story_corpus import get_story_corpus
 
 settings = get_settings()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    # Handlers run on a listener thread, off the event loop
+    log_listener = setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_SAMPLE_RATES)
     await MongoDB.connect_to_db()
+    if settings.LLM_CACHE_ENABLED and settings.LLM_CACHE_USE_MONGO:
+        await get_response_cache().ensure_indexes()
+    # Services are shared by every request; see app/api/v1/dependencies/services.py
+    init_services(app)
+    await StoryRepository().ensure_indexes()
+    app.state.chat_service = ChatService(llm_service=app.state.llm_service)
+    # Parse the example stories now rather than on the first RAG request
+    await get_story_corpus().warm_up()
+    if settings.STORY_TEMPLATES_ENABLED:
+        await StoryTemplateRepository().ensure_indexes(settings.STORY_TEMPLATE_TTL_SECONDS)
+    if settings.STORY_POOL_SIZE > 0:
+        await StoryPoolRepository().ensure_indexes(settings.STORY_POOL_TTL_SECONDS)
+        app.state.story_pool.start()
+    await JobRepository().ensure_indexes(settings.STORY_JOB_RETENTION_SECONDS)
+    app.state.story_job_runner.start()
+    if settings.EMOTION_VARIANTS_WORKERS > 0:
+        await StoryVariantRepository().ensure_indexes(
+            settings.EMOTION_VARIANTS_TTL_SECONDS, settings.EMOTION_VARIANTS_ACTIVE_SECONDS
+        )
+        app.state.emotion_variants.start()
     yield
     # Shutdown
+    await app.state.emotion_variants.stop()
+    await app.state.story_job_runner.stop()
+    await app.state.story_pool.stop()
     await MongoDB.close_db_connection()
+    log_listener.stop()
 
 app = FastAPI(
     title="Buddy API",
@@ -44,6 +80,7 @@ app.include_router(science_qa_router, prefix="/api/v1")
 app.include_router(vocabulary.router, prefix="/api/v1")
 app.include_router(settings_router, prefix="/api/v1")
 app.include_router(chat.router, prefix="/api/v1")
+app.include_router(metrics.router, prefix="/api/v1")
 
 def custom_openapi():
     if app.openapi_schema:
@@ -7,4 +7,15 @@ class UserRole(str, Enum):
 
 class ChildStatus(str, Enum):
     ACTIVE = "Active"
-    INACTIVE = "Inactive" 
\ No newline at end of file
+    INACTIVE = "Inactive"
+
+
+class JobKind(str, Enum):
+    STORY = "story"            # a new story for a child
+    REGENERATE = "regenerate"  # a parent's rewrite of an existing story
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from uuid import uuid4
+from pydantic import BaseModel, Field
+from app.models.enums import JobKind, JobStatus
+from app.models.story.story import StoryResponse
+
+class Job(BaseModel):
+    job_id: str = Field(default_factory=lambda: str(uuid4()))
+    kind: JobKind
+    child_id: str
+    requested_by: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    idempotency_key: Optional[str] = None
+    status: JobStatus = JobStatus.QUEUED
+    attempts: int = 0
+    available_at: datetime = Field(default_factory=datetime.utcnow)  # not claimed before this
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+class StoryJobRequest(BaseModel):
+    kind: JobKind = JobKind.STORY
+    # Required for regenerations, which only parents can request
+    child_id: Optional[str] = None
+    story_id: Optional[str] = None
+    parent_comment: Optional[str] = None
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: JobKind
+    status: JobStatus
+    attempts: int
+    story: Optional[StoryResponse] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_job(cls, job: Job) -> "JobResponse":
+        return cls(
+            job_id=job.job_id,
+            kind=job.kind,
+            status=job.status,
+            attempts=job.attempts,
+            story=StoryResponse(**job.result) if job.result else None,
+            error=job.error,
+            created_at=job.created_at,
+            updated_at=job.updated_at
+        )
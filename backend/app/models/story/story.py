@@ -40,9 +40,10 @@ class VocabularyResponse(BaseModel):
 
 class PaginatedStoryResponse(BaseModel):
     stories: List[StoryResponse]
-    total: int
+    total: Optional[int] = None  # only counted when asked for; by default on the first page
     skip: int
     limit: int
+    next_cursor: Optional[str] = None  # pass as `cursor` for the next page; None on the last page
 
 class StoryUpdateRequest(BaseModel):
     parent_comment: str
@@ -51,4 +52,8 @@ class StoryUpdateRequest(BaseModel):
 
 class StoryEmotionUpdateRequest(BaseModel):
     emotion: str
-    story_id: str 
\ No newline at end of file
+    story_id: str
+
+
+class StoryBatchRequest(BaseModel):
+    child_ids: Optional[List[str]] = Field(default=None, description="Children to generate stories for; all of the parent's children if omitted")
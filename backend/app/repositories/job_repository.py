@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.db.mongo import MongoDB
+from app.models.enums import JobStatus
+from app.models.job import Job
+
+
+class JobRepository:
+    """
+    Background jobs with leases.
+
+    A worker claims a job by taking a lease on it. While it runs the job it
+    renews the lease; if the worker dies, the lease runs out and another
+    worker claims the job again. Only the lease owner can finish a job.
+    """
+
+    def __init__(self):
+        self.db = MongoDB.get_db()
+        self.collection = self.db["jobs"]
+
+    async def ensure_indexes(self, retention_seconds: int) -> None:
+        """Index claims and lookups, and let Mongo drop finished jobs after `retention_seconds`."""
+        await self.collection.create_index("job_id", unique=True)
+        await self.collection.create_index([("status", 1), ("available_at", 1), ("created_at", 1)])
+        await self.collection.create_index([("status", 1), ("lease_expires_at", 1)])
+        await self.collection.create_index(
+            [("requested_by", 1), ("idempotency_key", 1)],
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$type": "string"}}
+        )
+        await self.collection.create_index("finished_at", expireAfterSeconds=retention_seconds)
+
+    async def create(self, job: Job) -> Job:
+        """
+        Store a new job, unless the same request is already known.
+
+        A request that repeats an idempotency key gets the existing job back
+        instead. Without a key every request is a new job.
+        """
+        if job.idempotency_key:
+            existing = await self.collection.find_one({
+                "requested_by": job.requested_by,
+                "idempotency_key": job.idempotency_key
+            })
+            if existing:
+                return Job(**existing)
+        try:
+            await self.collection.insert_one(job.model_dump())
+        except DuplicateKeyError:
+            # A concurrent retry with the same idempotency key won the race
+            return Job(**await self.collection.find_one({
+                "requested_by": job.requested_by,
+                "idempotency_key": job.idempotency_key
+            }))
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = await self.collection.find_one({"job_id": job_id})
+        return Job(**job) if job else None
+
+    async def claim(self, worker_id: str, lease_seconds: float, max_attempts: int) -> Optional[Job]:
+        """Lease the oldest job that is queued, or whose lease has run out."""
+        now = datetime.utcnow()
+        job = await self.collection.find_one_and_update(
+            {
+                "attempts": {"$lt": max_attempts},
+                "$or": [
+                    {"status": JobStatus.QUEUED.value, "available_at": {"$lte": now}},
+                    {"status": JobStatus.RUNNING.value, "lease_expires_at": {"$lt": now}},
+                ]
+            },
+            {
+                "$set": {
+                    "status": JobStatus.RUNNING.value,
+                    "lease_owner": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        return Job(**job) if job else None
+
+    async def renew_lease(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extend a lease; False if the worker no longer holds it."""
+        result = await self.collection.update_one(
+            {"job_id": job_id, "lease_owner": worker_id, "status": JobStatus.RUNNING.value},
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease_seconds)}}
+        )
+        return result.modified_count > 0
+
+    async def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        return await self._finish(job_id, worker_id, {"status": JobStatus.SUCCEEDED.value, "result": result})
+
+    async def fail(self, job_id: str, worker_id: str, error: str, retry_at: Optional[datetime] = None) -> bool:
+        """Fail a job, or put it back in the queue until `retry_at`."""
+        if retry_at is not None:
+            return await self._release(job_id, worker_id, {
+                "status": JobStatus.QUEUED.value,
+                "available_at": retry_at,
+                "error": error
+            })
+        return await self._finish(job_id, worker_id, {"status": JobStatus.FAILED.value, "error": error})
+
+    async def fail_abandoned(self, max_attempts: int) -> int:
+        """Fail jobs whose lease ran out on their last allowed attempt."""
+        now = datetime.utcnow()
+        result = await self.collection.update_many(
+            {
+                "status": JobStatus.RUNNING.value,
+                "lease_expires_at": {"$lt": now},
+                "attempts": {"$gte": max_attempts}
+            },
+            {"$set": {
+                "status": JobStatus.FAILED.value,
+                "error": "Job was abandoned by its workers too many times",
+                "lease_owner": None,
+                "updated_at": now,
+                "finished_at": now
+            }}
+        )
+        return result.modified_count
+
+    async def _finish(self, job_id: str, worker_id: str, fields: Dict[str, Any]) -> bool:
+        return await self._release(job_id, worker_id, {**fields, "finished_at": datetime.utcnow()})
+
+    async def _release(self, job_id: str, worker_id: str, fields: Dict[str, Any]) -> bool:
+        result = await self.collection.update_one(
+            {"job_id": job_id, "lease_owner": worker_id},
+            {"$set": {**fields, "lease_owner": None, "lease_expires_at": None, "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count > 0
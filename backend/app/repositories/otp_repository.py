@@ -1,8 +1,11 @@
+import logging
 from datetime import datetime
 from typing import Optional, Dict, Any
 from app.db.mongo import MongoDB
 from app.utils.otp import is_otp_expired
 
+logger = logging.getLogger(__name__)
+
 class OTPRepository:
     def __init__(self):
         self.db = MongoDB.get_db()
@@ -36,25 +39,21 @@ class OTPRepository:
 
     async def verify_otp(self, email: str, otp: str) -> bool:
         """Verify if OTP is valid and not expired."""
-        print(f"Verifying OTP: {otp} for email: {email}")
         otp_doc = await self.otp_collection.find_one({
             "email": email,
             "otp": otp
         })
         
         if not otp_doc:
-            print("OTP document not found")
+            logger.debug("No matching OTP for %s", email)
             return False
             
-        print(f"Found OTP document: {otp_doc}")
-        
         if is_otp_expired(otp_doc["expires_at"]):
-            print("OTP is expired")
+            logger.debug("OTP for %s is expired", email)
             await self.otp_collection.delete_one({"_id": otp_doc["_id"]})
             return False
             
         # Only delete the OTP if it's valid and not expired
-        print("OTP is valid and not expired")
         await self.otp_collection.delete_one({"_id": otp_doc["_id"]})
         return True
 
@@ -1,6 +1,7 @@
 from typing import Optional
 from app.db.mongo import MongoDB
 from app.models.reward import Reward
+from app.services.child_context import get_child_context_cache
 from datetime import datetime
 
 class RewardRepository:
@@ -49,8 +50,8 @@ class RewardRepository:
             reward = Reward(child_id=child_id)
             return await self.create_reward(reward)
         
-        reward.add_xp(1)
-        return await self.update_reward(reward)
+        leveled_up = reward.add_xp(1)
+        return await self._update_xp(reward, leveled_up)
 
     async def add_xp_for_achievement(self, child_id: str) -> Optional[Reward]:
         """Add 5 XP for earning an achievement."""
@@ -59,5 +60,12 @@ class RewardRepository:
             reward = Reward(child_id=child_id)
             return await self.create_reward(reward)
         
-        reward.add_xp(5)
-        return await self.update_reward(reward) 
\ No newline at end of file
+        leveled_up = reward.add_xp(5)
+        return await self._update_xp(reward, leveled_up)
+
+    async def _update_xp(self, reward: Reward, leveled_up: bool) -> Optional[Reward]:
+        updated = await self.update_reward(reward)
+        if leveled_up:
+            # Question difficulty follows the level
+            get_child_context_cache().invalidate(reward.child_id)
+        return updated 
\ No newline at end of file
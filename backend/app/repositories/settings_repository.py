@@ -3,6 +3,8 @@ from typing import Optional
 from bson import ObjectId
 from app.db.mongo import MongoDB
 from app.models.settings import Settings, SettingsUpdate
+from app.repositories.story_pool_repository import StoryPoolRepository
+from app.services.child_context import get_child_context_cache
 
 class SettingsRepository:
     def __init__(self):
@@ -12,6 +14,7 @@ class SettingsRepository:
     async def create(self, settings: Settings) -> Settings:
         settings_dict = settings.model_dump(by_alias=True)
         await self.collection.insert_one(settings_dict)
+        get_child_context_cache().invalidate(settings.child_id)
         return settings
 
     async def get_by_child_id(self, child_id: str) -> Optional[Settings]:
@@ -43,9 +46,18 @@ class SettingsRepository:
         )
         
         if result:
-            return Settings(**result)
+            get_child_context_cache().invalidate(child_id)
+            updated_settings = Settings(**result)
+            if any(
+                getattr(updated_settings, field) != getattr(existing_settings, field)
+                for field in ("themes", "preferences", "moral_values")
+            ):
+                # Pre-generated stories were written for the old settings
+                await StoryPoolRepository().delete_for_child(child_id)
+            return updated_settings
         return None
 
     async def delete(self, child_id: str) -> bool:
         result = await self.collection.delete_one({"child_id": child_id})
+        get_child_context_cache().invalidate(child_id)
         return result.deleted_count > 0 
\ No newline at end of file
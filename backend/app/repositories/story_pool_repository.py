@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import Dict, Optional
+from app.db.mongo import MongoDB
+
+class StoryPoolRepository:
+    """
+    Stories generated ahead of time and not yet served.
+
+    Each entry is tagged with the fingerprint of the story request it was
+    generated from, so entries built from outdated settings are never served.
+    """
+
+    def __init__(self):
+        self.db = MongoDB.get_db()
+        self.collection = self.db["story_pool"]
+
+    async def ensure_indexes(self, ttl_seconds: int) -> None:
+        """Index pool lookups and let Mongo expire entries of children who stopped reading."""
+        await self.collection.create_index([("child_id", 1), ("fingerprint", 1), ("created_at", 1)])
+        await self.collection.create_index("created_at", expireAfterSeconds=ttl_seconds)
+
+    async def add(self, child_id: str, fingerprint: str, story_data: Dict) -> None:
+        """Add a generated story to a child's pool."""
+        await self.collection.insert_one({
+            "child_id": child_id,
+            "fingerprint": fingerprint,
+            "story_data": story_data,
+            "created_at": datetime.utcnow()
+        })
+
+    async def pop(self, child_id: str, fingerprint: str) -> Optional[Dict]:
+        """Atomically remove and return the oldest matching entry, so it is served only once."""
+        return await self.collection.find_one_and_delete(
+            {"child_id": child_id, "fingerprint": fingerprint},
+            sort=[("created_at", 1)]
+        )
+
+    async def count(self, child_id: str, fingerprint: str) -> int:
+        """Count a child's ready entries for a fingerprint."""
+        return await self.collection.count_documents({"child_id": child_id, "fingerprint": fingerprint})
+
+    async def delete_stale(self, child_id: str, fingerprint: str) -> int:
+        """Delete a child's entries generated for any other fingerprint."""
+        result = await self.collection.delete_many({"child_id": child_id, "fingerprint": {"$ne": fingerprint}})
+        return result.deleted_count
+
+    async def delete_for_child(self, child_id: str) -> int:
+        """Delete all of a child's entries."""
+        result = await self.collection.delete_many({"child_id": child_id})
+        return result.deleted_count
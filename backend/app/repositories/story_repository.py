@@ -1,6 +1,12 @@
+import asyncio
 from typing import List, Optional, Tuple
 from app.db.mongo import MongoDB
 from app.models.story.story import Story, VocabularyWord
+from app.utils.pagination import decode_cursor, encode_cursor
+
+# Order of story listings, and the compound index that serves it
+STORY_LISTING_SORT = [("created_at", -1), ("story_id", -1)]
+STORY_LISTING_INDEX = [("child_id", 1), *STORY_LISTING_SORT]
 
 class StoryRepository:
     def __init__(self):
@@ -14,6 +20,12 @@ class StoryRepository:
         await self.stories_collection.insert_one(story_dict)
         return story
 
+    async def create_stories(self, stories: List[Story]) -> List[Story]:
+        """Create several stories in the database with one write."""
+        if stories:
+            await self.stories_collection.insert_many([story.model_dump() for story in stories])
+        return stories
+
     async def get_story(self, story_id: str) -> Optional[Story]:
         """Get a story by its ID."""
         story = await self.stories_collection.find_one({"story_id": story_id})
@@ -25,22 +37,65 @@ class StoryRepository:
         stories = await cursor.to_list(length=None)
         return [Story(**story) for story in stories]
 
-    async def get_child_stories_paginated(
+    async def get_latest_story(self, child_id: str) -> Optional[Story]:
+        """Get the most recently created story of a child."""
+        cursor = self.stories_collection.find({"child_id": child_id}).sort("created_at", -1).limit(1)
+        stories = await cursor.to_list(length=1)
+        return Story(**stories[0]) if stories else None
+
+    async def ensure_indexes(self) -> None:
+        """Index story listings: a child's stories, newest first, with story_id breaking ties."""
+        await self.stories_collection.create_index(STORY_LISTING_INDEX)
+
+    async def get_child_stories_page(
         self,
         child_id: str,
+        limit: int = 10,
+        cursor: Optional[str] = None,
         skip: int = 0,
-        limit: int = 10
-    ) -> Tuple[List[Story], int]:
-        # Get total count
-        total = await self.stories_collection.count_documents({"child_id": child_id})
-        
-        # Get paginated stories
-        cursor = self.stories_collection.find(
-            {"child_id": child_id}
-        ).sort("created_at", -1).skip(skip).limit(limit)
-        
-        stories = await cursor.to_list(length=None)
-        return [Story(**story) for story in stories], total
+        include_total: bool = True
+    ) -> Tuple[List[Story], Optional[str], Optional[int]]:
+        """
+        Get a page of a child's stories, newest first.
+
+        With `cursor` (a previous page's next cursor) the query seeks to the
+        page on the (child_id, created_at, story_id) index rather than
+        skipping the earlier pages; `skip` is only used without a cursor.
+
+        Returns:
+            The stories, the cursor of the next page (None on the last page)
+            and, with `include_total`, the number of the child's stories
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        query = {"child_id": child_id}
+        if cursor:
+            created_at, story_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "story_id": {"$lt": story_id}}
+            ]
+        find = self.stories_collection.find(query).sort(STORY_LISTING_SORT)
+        if skip and not cursor:
+            find = find.skip(skip)
+        # One extra story tells whether there is a next page
+        find = find.limit(limit + 1).to_list(length=None)
+
+        total = None
+        if include_total:
+            documents, total = await asyncio.gather(
+                find,
+                self.stories_collection.count_documents({"child_id": child_id})
+            )
+        else:
+            documents = await find
+
+        stories = [Story(**story) for story in documents[:limit]]
+        next_cursor = None
+        if len(documents) > limit:
+            next_cursor = encode_cursor(stories[-1].created_at, stories[-1].story_id)
+        return stories, next_cursor, total
 
     async def update_story(self, story_id: str, story: Story) -> Optional[Story]:
         """Update a story in the database."""
@@ -98,4 +153,9 @@ class StoryRepository:
             "story_id": story_id,
             "child_id": child_id
         })
-        return result.deleted_count > 0 
\ No newline at end of file
+        return result.deleted_count > 0
+
+    async def delete_story_with_vocabulary(self, story_id: str) -> None:
+        """Delete a story and its vocabulary words, e.g. after a failed partial write."""
+        await self.stories_collection.delete_one({"story_id": story_id})
+        await self.vocabulary_collection.delete_many({"story_id": story_id})
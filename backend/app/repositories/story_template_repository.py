@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import uuid4
+from app.db.mongo import MongoDB
+
+class StoryTemplateRepository:
+    """
+    Stories written with a name placeholder, shared by every child whose
+    story request has the same fingerprint.
+
+    Each template records the children it was served to, so no child gets
+    the same template twice.
+    """
+
+    def __init__(self):
+        self.db = MongoDB.get_db()
+        self.collection = self.db["story_templates"]
+
+    async def ensure_indexes(self, ttl_seconds: int) -> None:
+        """Index template lookups and let Mongo expire old templates, so profiles get fresh stories."""
+        await self.collection.create_index([("fingerprint", 1), ("created_at", -1)])
+        await self.collection.create_index("created_at", expireAfterSeconds=ttl_seconds)
+
+    async def add(self, fingerprint: str, story_data: Dict, child_id: str) -> None:
+        """Store a template, already served to the child it was generated for."""
+        await self.collection.insert_one({
+            "template_id": str(uuid4()),
+            "fingerprint": fingerprint,
+            "story_data": story_data,
+            "served_to": [child_id],
+            "created_at": datetime.utcnow()
+        })
+
+    async def claim(self, fingerprint: str, child_id: str) -> Optional[Dict]:
+        """Atomically mark the newest template the child has not been served as served, and return it."""
+        return await self.collection.find_one_and_update(
+            {"fingerprint": fingerprint, "served_to": {"$ne": child_id}},
+            {"$addToSet": {"served_to": child_id}},
+            sort=[("created_at", -1)]
+        )
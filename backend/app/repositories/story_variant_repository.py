@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from app.db.mongo import MongoDB
+
+class StoryVariantRepository:
+    """
+    Emotion variants of stories, generated ahead of time, and the children
+    who use the emotion feature.
+
+    A story has at most one variant of each kind; serving one removes it.
+    """
+
+    def __init__(self):
+        self.db = MongoDB.get_db()
+        self.collection = self.db["story_variants"]
+        self.users_collection = self.db["emotion_feature_users"]
+
+    async def ensure_indexes(self, ttl_seconds: int, active_seconds: int) -> None:
+        """Index variant lookups; expire unused variants and children who stopped using the feature."""
+        await self.collection.create_index([("story_id", 1), ("variant", 1)], unique=True)
+        await self.collection.create_index("created_at", expireAfterSeconds=ttl_seconds)
+        await self.users_collection.create_index("child_id", unique=True)
+        await self.users_collection.create_index("last_used_at", expireAfterSeconds=active_seconds)
+
+    async def add(self, story_id: str, child_id: str, variant: str, story_data: Dict) -> None:
+        """Store a variant of a story, replacing an older one of the same kind."""
+        await self.collection.update_one(
+            {"story_id": story_id, "variant": variant},
+            {"$set": {
+                "story_id": story_id,
+                "child_id": child_id,
+                "variant": variant,
+                "story_data": story_data,
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+
+    async def pop(self, story_id: str, variant: str) -> Optional[Dict]:
+        """Atomically remove and return a story's variant, so it is served only once."""
+        return await self.collection.find_one_and_delete({"story_id": story_id, "variant": variant})
+
+    async def exists(self, story_id: str, variant: str) -> bool:
+        return await self.collection.count_documents({"story_id": story_id, "variant": variant}) > 0
+
+    async def delete_for_story(self, story_id: str) -> int:
+        """Delete every variant of a story."""
+        result = await self.collection.delete_many({"story_id": story_id})
+        return result.deleted_count
+
+    async def record_use(self, child_id: str) -> None:
+        """Remember that the child just used the emotion feature."""
+        await self.users_collection.update_one(
+            {"child_id": child_id},
+            {"$set": {"child_id": child_id, "last_used_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def is_active_user(self, child_id: str, active_seconds: int) -> bool:
+        """Whether the child used the emotion feature in the last `active_seconds`."""
+        user = await self.users_collection.find_one({
+            "child_id": child_id,
+            "last_used_at": {"$gte": datetime.utcnow() - timedelta(seconds=active_seconds)}
+        })
+        return user is not None
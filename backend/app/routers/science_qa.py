@@ -15,14 +15,17 @@ from app.models.science_qa import (
     Reward,
     PaginatedQuestionResponse
 )
-from app.models.user import Child
-from app.services.vector_store import VectorStore
+from app.services.vector_store import get_vector_store
 from app.services.pdf_processor import PDFProcessor
 from app.services.llm.llm_service import LLMService
+from app.services.llm.circuit_breaker import LLMUnavailable
+from app.services.llm.scheduler import LLMRateLimitExceeded
 from app.repositories.science_question_repository import ScienceQuestionRepository
 from app.repositories.achievement_repository import AchievementRepository
 from app.repositories.reward_repository import RewardRepository
+from app.services.child_context import get_child_context_cache
 from app.api.v1.dependencies.auth import get_current_user, require_role
+from app.api.v1.dependencies.services import get_llm_service
 from app.models.enums import UserRole
 from app.db.mongo import MongoDB, get_database
 from typing import List, Optional
@@ -37,23 +40,15 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/science", tags=["science"])
-vector_store = VectorStore()
+vector_store = get_vector_store()
 pdf_processor = PDFProcessor()
-llm_service = LLMService()
 question_repository = ScienceQuestionRepository()
 achievement_repo = AchievementRepository()
 reward_repo = RewardRepository()
 
-async def get_child_info(child_id: str) -> Optional[Child]:
-    """Get child information from the database."""
-    db = MongoDB.get_db()
-    child_data = await db["children"].find_one({"child_id": child_id})
-    return Child(**child_data) if child_data else None
-
 def get_question_repository() -> ScienceQuestionRepository:
     """Dependency to get an instance of ScienceQuestionRepository."""
     return ScienceQuestionRepository()
@@ -209,27 +204,22 @@ async def process_pdf(request: PDFProcessingRequest) -> PDFProcessingResponse:
 @router.post("/generate-question", response_model=QuestionGenerationResponse)
 async def generate_question(
     request: QuestionGenerationRequest,
-    child_id: str = Depends(require_role(UserRole.CHILD))
+    child_id: str = Depends(require_role(UserRole.CHILD)),
+    llm_service: LLMService = Depends(get_llm_service)
 ) -> QuestionGenerationResponse:
     try:
-        # Get child's information
-        child = await get_child_info(child_id)
-        if not child:
+        # Get child's information and current level (reward created if missing)
+        try:
+            child = await get_child_context_cache().get(child_id)
+        except ValueError:
             raise HTTPException(status_code=404, detail="Child not found")
             
-        # Get child's current level
-        reward_repo = RewardRepository()
-        reward = await reward_repo.get_reward(child_id)
-        if not reward:
-            reward = Reward(child_id=child_id)
-            reward = await reward_repo.create_reward(reward)
-            
         # 70% chance to generate new question, 30% chance to get existing unsolved question
         if random.random() < 0.3:  # 30% chance
             # Try to get an existing unsolved or incorrect question
             existing_question = await question_repository.get_random_unsolved_question(child_id)
             if existing_question:
-                logger.info(f"Returning existing unsolved question for child {child_id}")
+                logger.info("Returning existing unsolved question for child %s", child_id)
                 return QuestionGenerationResponse(
                     questions=[existing_question],
                     source_book="Previously generated question"
@@ -238,17 +228,17 @@ async def generate_question(
         # If no existing question found or 70% chance hit, generate new question
         try:
             chunk = vector_store.get_random_chunk(request.topic)
-            logger.info(f"Found chunk for topic: {request.topic}")
+            logger.debug("Found chunk for topic: %s", request.topic)
         except ValueError as e:
             # If no chunks found for topic, get any random chunk
-            logger.warning(f"No chunks found for topic '{request.topic}', getting random chunk instead")
+            logger.warning("No chunks found for topic '%s', getting random chunk instead", request.topic)
             chunk = vector_store.get_random_chunk()
         
-        logger.info(f"Using chunk from book: {chunk['metadata']['book_title']}")
+        logger.debug("Using chunk from book: %s", chunk["metadata"]["book_title"])
         
         # Get age range and difficulty level based on child's information
         age_range = request.get_age_range(child.birth_date)
-        difficulty_level = request.get_difficulty_level(reward.level)
+        difficulty_level = request.get_difficulty_level(child.level)
         
         # Get the system instruction and schema
         system_instruction = get_system_instruction(age_range, difficulty_level, request.topic)
@@ -256,9 +246,7 @@ async def generate_question(
         
         # Create the prompt
         if request.topic and request.topic.lower() == "english":
-            prompt = f"""{system_instruction}
-
-Generate a grammar question that is:
+            prompt = f"""Generate a grammar question that is:
 - Age-appropriate for {age_range} years old
 - {difficulty_level} difficulty level
 - Fun and engaging
@@ -283,9 +271,7 @@ Make sure to:
 - Keep the question engaging and fun
 """
         else:
-            prompt = f"""{system_instruction}
-
-Based on this science text, generate a multiple-choice question with 4 options:
+            prompt = f"""Based on this science text, generate a multiple-choice question with 4 options:
 
 Text content:
 {chunk["content"]}
@@ -301,10 +287,27 @@ The question should be:
 """
         
         # Generate question using LLM service
-        qa_data = await llm_service.generate_json_content(
-            prompt=prompt,
-            json_schema=response_schema
-        )
+        try:
+            qa_data = await llm_service.generate_json_content(
+                prompt=prompt,
+                json_schema=response_schema,
+                caller="question",
+                system_instruction=system_instruction
+            )
+        except LLMUnavailable:
+            # Serve a question the child already has instead of failing
+            degraded_question = await question_repository.get_random_unsolved_question(child_id)
+            if not degraded_question:
+                previous_questions, _ = await question_repository.get_questions_by_child_id(child_id, limit=1)
+                degraded_question = previous_questions[0] if previous_questions else None
+            if not degraded_question:
+                raise
+            llm_service.circuit_breakers.record_degraded("question")
+            logger.warning(f"No model available, serving stored question to child {child_id}")
+            return QuestionGenerationResponse(
+                questions=[degraded_question],
+                source_book="Previously generated question"
+            )
         
         # Create ScienceQuestion object
         question = ScienceQuestion(
@@ -322,13 +325,17 @@ The question should be:
         # Store the question in the database
         stored_question = await question_repository.create_question(question)
         
-        logger.info(f"Successfully generated and stored new question for child {child_id}")
+        logger.info("Successfully generated and stored new question for child %s", child_id)
         
         return QuestionGenerationResponse(
             questions=[stored_question],
             source_book=chunk["metadata"]["book_title"]
         )
         
+    except LLMRateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except LLMUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating question: {str(e)}")
         raise HTTPException(
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from app.config.settings import get_settings
+from app.db.mongo import MongoDB
+from app.models.reward import Reward
+from app.services.story_generation.pipeline import gather_or_cancel
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+DEFAULT_CHILD_SETTINGS = {
+    "age_range": "4-8",
+    "themes": ["friendship", "adventure", "learning"],
+    "moral_values": ["kindness", "courage", "honesty"],
+    "preferences": ["animals", "nature", "games"]
+}
+
+
+class ChildContext(BaseModel):
+    """What the generation endpoints need to know about a child."""
+    child_id: str
+    parent_id: Optional[str] = None
+    name: str
+    birth_date: Optional[datetime] = None
+    age_range: str
+    level: int
+    settings: Dict[str, Any]  # the settings document; shared by every reader, do not modify
+
+
+class ChildContextCache:
+    """
+    Per-child cache of settings, name, age range, parent and level.
+
+    A miss reads the child, then its settings and rewards documents
+    concurrently (creating default settings and rewards when missing), and
+    concurrent misses for one child share that fetch. Entries live `ttl_seconds`, at
+    most `max_entries` of them, least recently used first out.
+
+    `get_for_parent` loads several children at once, reading each
+    collection with a single `$in` query for the ones not cached.
+
+    Writers call `invalidate` after changing a child's settings, profile or
+    level. A fetch that was in flight during an invalidation is returned
+    but not cached. Invalidation is per process; the TTL bounds how long
+    another worker can serve a stale entry.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, ChildContext]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generations: Dict[str, int] = {}  # child_id -> invalidation count
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0, "evictions": 0}
+
+    async def get(self, child_id: str) -> ChildContext:
+        """
+        Raises:
+            ValueError: If the child does not exist or default settings could not be created
+        """
+        context = self._cached(child_id)
+        if context is not None:
+            return context
+
+        inflight = self._inflight.get(child_id)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(inflight)
+
+        self.stats["misses"] += 1
+        generation = self._generations.get(child_id, 0)
+        fetch = asyncio.ensure_future(self._fetch(child_id))
+        self._inflight[child_id] = fetch
+        try:
+            context = await asyncio.shield(fetch)
+        finally:
+            if fetch.done():
+                self._inflight.pop(child_id, None)
+            else:
+                # This caller was cancelled; let the fetch finish for the others
+                fetch.add_done_callback(lambda _: self._inflight.pop(child_id, None))
+
+        if self._generations.get(child_id, 0) == generation:
+            self._store(child_id, context)
+        return context
+
+    async def get_for_parent(self, parent_id: str, child_ids: Optional[List[str]] = None) -> Dict[str, ChildContext]:
+        """
+        Contexts of a parent's children, or of the selected ones, by child id.
+        Children that do not exist or belong to another parent are left out.
+        """
+        query: Dict[str, Any] = {"parent_id": parent_id}
+        if child_ids is not None:
+            query["child_id"] = {"$in": list(child_ids)}
+        children = await MongoDB.get_db()["children"].find(query).to_list(length=None)
+
+        contexts: Dict[str, ChildContext] = {}
+        missing: Dict[str, Dict] = {}
+        for child in children:
+            context = self._cached(child["child_id"])
+            if context is not None:
+                contexts[child["child_id"]] = context
+            else:
+                missing[child["child_id"]] = child
+        if not missing:
+            return contexts
+
+        self.stats["misses"] += len(missing)
+        generations = {child_id: self._generations.get(child_id, 0) for child_id in missing}
+        settings_by_child, rewards_by_child = await gather_or_cancel(
+            self._load_many_settings(list(missing)),
+            self._load_many_rewards(list(missing))
+        )
+        for child_id, child in missing.items():
+            context = self._context(child, settings_by_child[child_id], rewards_by_child[child_id])
+            if self._generations.get(child_id, 0) == generations[child_id]:
+                self._store(child_id, context)
+            contexts[child_id] = context
+        return contexts
+
+    def invalidate(self, child_id: str) -> None:
+        """Forget a child's context; the next request reads it again."""
+        self._entries.pop(child_id, None)
+        self._generations[child_id] = self._generations.get(child_id, 0) + 1
+        self.stats["invalidations"] += 1
+
+    def _cached(self, child_id: str) -> Optional[ChildContext]:
+        entry = self._entries.get(child_id)
+        if entry is None:
+            return None
+        expires_at, context = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[child_id]
+            return None
+        self._entries.move_to_end(child_id)
+        self.stats["hits"] += 1
+        return context
+
+    def _store(self, child_id: str, context: ChildContext) -> None:
+        self._entries[child_id] = (time.monotonic() + self.ttl_seconds, context)
+        self._entries.move_to_end(child_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def _fetch(self, child_id: str) -> ChildContext:
+        # The defaults for missing settings and rewards are only created for a real child
+        child = await self._load_child(child_id)
+        child_settings, reward = await gather_or_cancel(
+            self._load_settings(child_id),
+            self._load_reward(child_id)
+        )
+        return self._context(child, child_settings, reward)
+
+    def _context(self, child: Dict, child_settings: Dict, reward: Dict) -> ChildContext:
+        birth_date = child.get("birth_date")
+        if isinstance(birth_date, str):
+            birth_date = datetime.fromisoformat(birth_date)
+        return ChildContext(
+            child_id=child["child_id"],
+            parent_id=child.get("parent_id"),
+            name=self._display_name(child),
+            birth_date=birth_date,
+            age_range=child_settings.get("age_range", "4-8"),
+            level=reward.get("level", 0),
+            settings=child_settings
+        )
+
+    @staticmethod
+    def _display_name(child: Dict) -> str:
+        # Get child's name from first_name and last_name
+        child_name = f"{child.get('first_name', '')} {child.get('last_name', '')}".strip()
+        return child_name or child.get('nickname') or 'the child'
+
+    async def _load_child(self, child_id: str) -> Dict:
+        child = await MongoDB.get_db()["children"].find_one({"child_id": child_id})
+        if not child:
+            raise ValueError("Child not found")
+        return child
+
+    async def _load_settings(self, child_id: str) -> Dict:
+        collection = MongoDB.get_db()["settings"]
+        child_settings = await collection.find_one({"child_id": child_id})
+        if child_settings:
+            return child_settings
+
+        logger.info("Creating default settings for child %s", child_id)
+        default_settings = {"child_id": child_id, **DEFAULT_CHILD_SETTINGS}
+        try:
+            await collection.insert_one(default_settings)
+        except Exception as e:
+            logger.error(f"Failed to create default settings: {str(e)}")
+            raise ValueError(f"Failed to create default settings: {str(e)}")
+        return default_settings
+
+    async def _load_reward(self, child_id: str) -> Dict:
+        collection = MongoDB.get_db()["rewards"]
+        reward = await collection.find_one({"child_id": child_id})
+        if reward:
+            return reward
+        # Every child starts at level 0
+        reward = Reward(child_id=child_id).model_dump()
+        await collection.insert_one(reward)
+        return reward
+
+    async def _load_many_settings(self, child_ids: List[str]) -> Dict[str, Dict]:
+        collection = MongoDB.get_db()["settings"]
+        found = await collection.find({"child_id": {"$in": child_ids}}).to_list(length=None)
+        settings_by_child = {child_settings["child_id"]: child_settings for child_settings in found}
+        defaults = [
+            {"child_id": child_id, **DEFAULT_CHILD_SETTINGS}
+            for child_id in child_ids if child_id not in settings_by_child
+        ]
+        if defaults:
+            logger.info("Creating default settings for %d children", len(defaults))
+            try:
+                await collection.insert_many(defaults)
+            except Exception as e:
+                logger.error(f"Failed to create default settings: {str(e)}")
+                raise ValueError(f"Failed to create default settings: {str(e)}")
+            settings_by_child.update((default["child_id"], default) for default in defaults)
+        return settings_by_child
+
+    async def _load_many_rewards(self, child_ids: List[str]) -> Dict[str, Dict]:
+        collection = MongoDB.get_db()["rewards"]
+        found = await collection.find({"child_id": {"$in": child_ids}}).to_list(length=None)
+        rewards_by_child = {reward["child_id"]: reward for reward in found}
+        defaults = [
+            Reward(child_id=child_id).model_dump()
+            for child_id in child_ids if child_id not in rewards_by_child
+        ]
+        if defaults:
+            await collection.insert_many(defaults)
+            rewards_by_child.update((reward["child_id"], reward) for reward in defaults)
+        return rewards_by_child
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "hit_rate": (self.stats["hits"] + self.stats["coalesced"]) / lookups if lookups else None,
+            "entries": len(self._entries),
+        }
+
+
+@lru_cache()
+def get_child_context_cache() -> ChildContextCache:
+    return ChildContextCache(
+        ttl_seconds=settings.CHILD_CONTEXT_TTL_SECONDS,
+        max_entries=settings.CHILD_CONTEXT_MAX_ENTRIES
+    )
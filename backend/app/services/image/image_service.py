@@ -4,7 +4,6 @@ from typing import Dict, Optional
 from app.config.settings import get_settings
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
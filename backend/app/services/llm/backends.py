@@ -0,0 +1,328 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import random
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.generativeai.types import BlockedPromptException, StopCandidateException
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# The line LLMService's JSON instructions put right before the schema
+_SCHEMA_MARKER = "must match this schema exactly:"
+
+_WORDS = [
+    "Abebe", "Almaz", "lion", "river", "market", "injera", "coffee", "friend",
+    "brave", "kind", "shared", "helped", "smiled", "village", "mountain", "sun",
+    "bird", "garden", "school", "song", "honest", "gentle", "happy", "learned",
+]
+
+
+# Releases of google-generativeai before 0.5 have no system_instruction argument
+_GENAI_SYSTEM_INSTRUCTION = "system_instruction" in inspect.signature(genai.GenerativeModel.__init__).parameters
+
+
+class StubBackendError(Exception):
+    """A failure injected by the stub backend."""
+    pass
+
+
+class LLMBackend(ABC):
+    """
+    Creates the model objects LLMService sends requests to.
+
+    A model only needs `generate_content_async(contents, generation_config=None,
+    stream=False)`. It returns an object with a `.text` attribute, or, with
+    `stream=True`, an async iterable of such objects.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def create_model(
+        self,
+        model_name: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        safety_settings: Optional[List[Dict[str, str]]] = None,
+        system_instruction: Optional[str] = None
+    ) -> Any:
+        pass
+
+    def classify_error(self, error: Exception) -> Optional[str]:
+        """Map a backend exception to an LLM metrics outcome, or None if unknown."""
+        return None
+
+    def block_reason(self, response: Any) -> Optional[str]:
+        """Return why a response was blocked by safety filters, or None."""
+        return None
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through google.generativeai."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str]):
+        if not api_key:
+            logger.error("No GEMINI_API_KEY found in settings")
+            raise ValueError("GEMINI_API_KEY is required for the gemini LLM backend")
+        genai.configure(api_key=api_key)
+
+    def create_model(
+        self,
+        model_name: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        safety_settings: Optional[List[Dict[str, str]]] = None,
+        system_instruction: Optional[str] = None
+    ) -> Any:
+        kwargs = {}
+        if system_instruction and _GENAI_SYSTEM_INSTRUCTION:
+            kwargs["system_instruction"] = system_instruction
+        model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config,
+            safety_settings=safety_settings,
+            **kwargs
+        )
+        if system_instruction and not _GENAI_SYSTEM_INSTRUCTION:
+            return InstructionPrefixedModel(model, system_instruction)
+        return model
+
+    def classify_error(self, error: Exception) -> Optional[str]:
+        if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+            return "quota"
+        if isinstance(error, google_exceptions.DeadlineExceeded):
+            return "timeout"
+        if isinstance(error, (BlockedPromptException, StopCandidateException)):
+            return "safety_block"
+        return None
+
+    def block_reason(self, response: Any) -> Optional[str]:
+        feedback = getattr(response, "prompt_feedback", None)
+        if feedback is not None and getattr(feedback, "block_reason", None):
+            return str(feedback.block_reason)
+        for candidate in getattr(response, "candidates", None) or []:
+            finish_reason = getattr(candidate, "finish_reason", None)
+            if getattr(finish_reason, "name", finish_reason) == "SAFETY":
+                return "SAFETY"
+        return None
+
+
+class InstructionPrefixedModel:
+    """Sends the system instruction as a prompt prefix, for SDKs that cannot set one."""
+
+    def __init__(self, model: Any, system_instruction: str):
+        self.model = model
+        self.system_instruction = system_instruction
+
+    async def generate_content_async(self, contents, **kwargs):
+        return await self.model.generate_content_async(f"{self.system_instruction}\n\n{contents}", **kwargs)
+
+
+class StubUsage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class StubResponse:
+    def __init__(self, text: str, usage_metadata: Optional[StubUsage] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class StubStream:
+    def __init__(self, text: str, chunk_size: int, chunk_delay: float):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+
+    async def __aiter__(self):
+        for start in range(0, len(self.text), self.chunk_size):
+            await asyncio.sleep(self.chunk_delay)
+            yield StubResponse(self.text[start:start + self.chunk_size])
+
+
+class StubModel:
+    """A model that answers any JSON prompt with a schema-valid response."""
+
+    def __init__(self, backend: "StubBackend", model_name: str, system_instruction: Optional[str] = None):
+        self.backend = backend
+        self.model_name = model_name
+        self.system_instruction = system_instruction or ""
+
+    async def generate_content_async(self, contents, generation_config=None, stream: bool = False, **kwargs):
+        prompt = str(contents)
+        latency = self.backend.sample_latency()
+        if self.backend.should_fail():
+            await asyncio.sleep(latency)
+            raise StubBackendError("Injected stub backend failure")
+
+        text = json.dumps(self.backend.build_response(f"{self.system_instruction}\n\n{prompt}", generation_config))
+        if self.backend.should_malform():
+            text = self.backend.malform(text)
+
+        if stream:
+            # Spread the latency over the chunks, like a real stream
+            chunk_size = 16
+            chunks = max(1, -(-len(text) // chunk_size))
+            return StubStream(text, chunk_size, latency / chunks)
+        await asyncio.sleep(latency)
+        # Report usage like Gemini does, at ~4 characters per token
+        prompt_tokens = (len(self.system_instruction) + len(prompt)) // 4
+        return StubResponse(text, StubUsage(prompt_tokens, len(text) // 4))
+
+
+class StubBackend(LLMBackend):
+    """
+    An offline backend for load tests and benchmarks.
+
+    Each response is built from the JSON schema in the request (the schema
+    in LLMService's JSON instructions, or `response_schema` in the
+    generation config), so it validates like a real answer. Response
+    content is derived from the prompt, so the same prompt always gets the
+    same answer. Latency, failures and malformed JSON are drawn from a
+    random generator seeded with `seed`, so a run can be reproduced.
+
+    Latency distributions:
+    - fixed: always `latency_seconds`
+    - uniform: `latency_seconds` +/- `jitter_seconds`
+    - lognormal: median `latency_seconds`, log-space sigma `jitter_seconds`,
+      which gives the long tail real model calls have
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency_seconds: float = 0.5,
+        jitter_seconds: float = 0.2,
+        distribution: str = "uniform",
+        failure_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        seed: int = 0
+    ):
+        if distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown stub latency distribution: {distribution}")
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.distribution = distribution
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self._random = random.Random(seed)
+
+    def create_model(
+        self,
+        model_name: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        safety_settings: Optional[List[Dict[str, str]]] = None,
+        system_instruction: Optional[str] = None
+    ) -> StubModel:
+        return StubModel(self, model_name, system_instruction)
+
+    def sample_latency(self) -> float:
+        if self.distribution == "fixed":
+            return self.latency_seconds
+        if self.distribution == "uniform":
+            low = max(0.0, self.latency_seconds - self.jitter_seconds)
+            return self._random.uniform(low, self.latency_seconds + self.jitter_seconds)
+        return self._random.lognormvariate(0.0, self.jitter_seconds) * self.latency_seconds
+
+    def should_fail(self) -> bool:
+        return self._random.random() < self.failure_rate
+
+    def should_malform(self) -> bool:
+        return self._random.random() < self.malformed_rate
+
+    def malform(self, text: str) -> str:
+        """Damage a response the way models do: a code fence plus truncation or a trailing comma."""
+        if self._random.random() < 0.5:
+            return "```json\n" + text[:max(1, int(len(text) * self._random.uniform(0.3, 0.9)))]
+        return "```json\n" + text[:-1] + ",}\n```"
+
+    def build_response(self, prompt: str, generation_config: Any = None) -> Any:
+        schema = self._find_schema(prompt, generation_config)
+        # Content depends only on the prompt, never on call order
+        content_random = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        if schema is None:
+            return {"text": self._sentence(content_random, 12)}
+        return self._value_for(schema, content_random, "")
+
+    def _find_schema(self, prompt: str, generation_config: Any) -> Optional[Dict[str, Any]]:
+        if isinstance(generation_config, dict):
+            schema = generation_config.get("response_schema")
+        else:
+            schema = getattr(generation_config, "response_schema", None)
+        if isinstance(schema, dict):
+            return schema
+
+        marker = prompt.find(_SCHEMA_MARKER)
+        if marker == -1:
+            return None
+        start = prompt.find("{", marker)
+        try:
+            schema, _ = json.JSONDecoder().raw_decode(prompt, start)
+        except (ValueError, json.JSONDecodeError):
+            return None
+        return schema if isinstance(schema, dict) else None
+
+    def _sentence(self, rng: random.Random, words: int) -> str:
+        return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+    def _value_for(self, schema: Dict[str, Any], rng: random.Random, name: str) -> Any:
+        if "enum" in schema:
+            return rng.choice(schema["enum"])
+        schema_type = schema.get("type", "string")
+        if isinstance(schema_type, list):
+            schema_type = schema_type[0]
+
+        if schema_type == "object":
+            return {
+                key: self._value_for(value, rng, key)
+                for key, value in schema.get("properties", {}).items()
+            }
+        if schema_type == "array":
+            min_items = schema.get("minItems", 3)
+            count = min(max(min_items, 3), schema.get("maxItems", max(min_items, 3)))
+            return [self._value_for(schema.get("items", {}), rng, name) for _ in range(count)]
+        if schema_type == "integer":
+            return rng.randint(schema.get("minimum", 0), schema.get("maximum", 3))
+        if schema_type == "number":
+            return rng.uniform(schema.get("minimum", 0.0), schema.get("maximum", 1.0))
+        if schema_type == "boolean":
+            return rng.random() < 0.5
+        if name.endswith("url"):
+            return ""
+        if name in ("content", "story_body", "answer", "explanation"):
+            # Long enough for the story body length check
+            return " ".join(self._sentence(rng, 10) for _ in range(6))
+        if name in ("word", "synonym"):
+            return rng.choice(_WORDS).lower()
+        return self._sentence(rng, 5)
+
+
+@lru_cache()
+def get_llm_backend() -> LLMBackend:
+    if settings.LLM_BACKEND == "gemini":
+        return GeminiBackend(settings.GEMINI_API_KEY)
+    if settings.LLM_BACKEND == "stub":
+        logger.warning("Using the stub LLM backend; responses are generated locally")
+        return StubBackend(
+            latency_seconds=settings.LLM_STUB_LATENCY_SECONDS,
+            jitter_seconds=settings.LLM_STUB_LATENCY_JITTER_SECONDS,
+            distribution=settings.LLM_STUB_LATENCY_DISTRIBUTION,
+            failure_rate=settings.LLM_STUB_FAILURE_RATE,
+            malformed_rate=settings.LLM_STUB_MALFORMED_RATE,
+            seed=settings.LLM_STUB_SEED
+        )
+    raise ValueError(f"Unknown LLM backend: {settings.LLM_BACKEND}")
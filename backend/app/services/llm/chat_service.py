@@ -1,16 +1,22 @@
 from typing import List, Dict, Optional
 from app.config.settings import get_settings
-from app.services.vector_store import VectorStore
+from app.services.vector_store import VectorStore, get_vector_store
 from app.services.llm.llm_service import LLMService
+from app.services.llm.circuit_breaker import LLMUnavailable
+from app.services.llm.scheduler import LLMPriority, LLMRateLimitExceeded
 import logging
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 class ChatService:
-    def __init__(self):
-        self.vector_store = VectorStore()
-        self.llm_service = LLMService()
+    def __init__(
+        self,
+        llm_service: Optional[LLMService] = None,
+        vector_store: Optional[VectorStore] = None
+    ):
+        self.vector_store = vector_store or get_vector_store()
+        self.llm_service = llm_service or LLMService()
         
     async def get_relevant_chunks(self, query: str, n_results: int = 3) -> List[Dict]:
         """Get relevant chunks from vector store for context."""
@@ -68,7 +74,9 @@ class ChatService:
                             }
                         },
                         "required": ["response"]
-                    }
+                    },
+                    priority=LLMPriority.INTERACTIVE,
+                    caller="chat"
                 )
                 return {
                     "response": response["response"],
@@ -101,7 +109,9 @@ class ChatService:
                         }
                     },
                     "required": ["response"]
-                }
+                },
+                priority=LLMPriority.INTERACTIVE,
+                caller="chat"
             )
             
             return {
@@ -109,6 +119,8 @@ class ChatService:
                 "context_used": context
             }
             
+        except (LLMRateLimitExceeded, LLMUnavailable):
+            raise
         except Exception as e:
             logger.error(f"Error in chat_with_context: {str(e)}")
             raise ValueError(f"Failed to generate response: {str(e)}") 
\ No newline at end of file
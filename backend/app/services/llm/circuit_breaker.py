@@ -0,0 +1,173 @@
+import logging
+import time
+from collections import defaultdict, deque
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"        # calls go through
+    OPEN = "open"            # calls are refused until the cool-down ends
+    HALF_OPEN = "half_open"  # a few probe calls decide whether to close again
+
+
+class LLMUnavailable(Exception):
+    """Raised when the circuit of every model a call could use is open."""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stop sending calls to a model that is failing or too slow.
+
+    Outcomes of the last `window_seconds` are kept. Once at least
+    `min_calls` were seen, the circuit opens when the share of failed calls
+    reaches `error_rate` or the share of calls slower than
+    `slow_call_seconds` reaches `slow_call_rate`. After `open_seconds` it
+    goes half-open and lets `half_open_probes` calls through at a time; that
+    many successes close it, a single failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 60.0,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 20.0,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()  # (time, failed, slow)
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.stats = {"opened": 0, "rejected": 0, "probes": 0}
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = CircuitState.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+            logger.info(f"Circuit for {self.name} is half-open, probing")
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to the model now. A call allowed while
+        half-open is a probe and must be followed by record() or release().
+        """
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+            self._probes_in_flight += 1
+            self.stats["probes"] += 1
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def release(self) -> None:
+        """Give back a probe slot for a call that never reached the model."""
+        if self._state == CircuitState.HALF_OPEN and self._probes_in_flight:
+            self._probes_in_flight -= 1
+
+    def record(self, success: bool, latency: Optional[float] = None) -> None:
+        """Record the outcome of a call that reached the model."""
+        slow = latency is not None and latency >= self.slow_call_seconds
+        if self._state == CircuitState.HALF_OPEN:
+            self.release()
+            if not success or slow:
+                self._open("probe failed")
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._state = CircuitState.CLOSED
+                self._calls.clear()
+                logger.info(f"Circuit for {self.name} closed")
+            return
+        if self._state == CircuitState.OPEN:
+            # A call that started before the circuit opened
+            return
+
+        now = time.monotonic()
+        self._calls.append((now, not success, slow))
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+        total = len(self._calls)
+        if total < self.min_calls:
+            return
+        failed = sum(1 for _, call_failed, _ in self._calls if call_failed)
+        slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+        if failed / total >= self.error_rate:
+            self._open(f"{failed}/{total} calls failed")
+        elif slow_calls / total >= self.slow_call_rate:
+            self._open(f"{slow_calls}/{total} calls slower than {self.slow_call_seconds}s")
+
+    def _open(self, reason: str) -> None:
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self.stats["opened"] += 1
+        logger.warning(f"Circuit for {self.name} opened: {reason}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "state": self.state.value, "window_calls": len(self._calls)}
+
+
+class CircuitBreakers:
+    """One circuit breaker per model name, plus counts of degraded responses."""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.degraded: Dict[str, int] = defaultdict(int)
+
+    def get(self, model_name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model_name)
+        if breaker is None:
+            breaker = self._breakers[model_name] = CircuitBreaker(model_name, **self.breaker_options)
+        return breaker
+
+    def record_degraded(self, feature: str) -> None:
+        """Count a response served from stored content because no model was available."""
+        self.degraded[feature] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "models": {name: breaker.get_stats() for name, breaker in self._breakers.items()},
+            "degraded": dict(self.degraded),
+        }
+
+
+@lru_cache()
+def get_circuit_breakers() -> CircuitBreakers:
+    return CircuitBreakers(
+        window_seconds=settings.LLM_BREAKER_WINDOW_SECONDS,
+        min_calls=settings.LLM_BREAKER_MIN_CALLS,
+        error_rate=settings.LLM_BREAKER_ERROR_RATE,
+        slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate=settings.LLM_BREAKER_SLOW_CALL_RATE,
+        open_seconds=settings.LLM_BREAKER_OPEN_SECONDS,
+        half_open_probes=settings.LLM_BREAKER_HALF_OPEN_PROBES
+    )
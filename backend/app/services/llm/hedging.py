@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class Hedger:
+    """
+    Send a duplicate of a slow call and take whichever answers first.
+
+    Latencies of successful calls are kept per caller tag (the last
+    `window` of them). Once a caller has `min_samples`, a call that has not
+    finished after the `percentile` of that distribution (but never before
+    `min_delay_seconds`) gets a hedge: the same call started again. The
+    first valid response wins and the other call is cancelled.
+
+    Hedges are paid from a budget: every call earns `budget_ratio` of a
+    hedge, up to `budget_burst` saved, so hedges stay at roughly
+    `budget_ratio` of all calls even when the model is slow for everyone.
+    """
+
+    def __init__(
+        self,
+        callers: Iterable[str] = ("story", "chat"),
+        percentile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+        min_delay_seconds: float = 1.0,
+        budget_ratio: float = 0.05,
+        budget_burst: float = 5.0
+    ):
+        self.callers = set(callers)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay_seconds = min_delay_seconds
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._budget = budget_burst
+        self.stats = {"calls": 0, "hedged": 0, "hedge_won": 0, "budget_exhausted": 0, "losers_cancelled": 0}
+
+    def record(self, caller: str, latency: float) -> None:
+        """Record the latency of a successful call."""
+        self._latencies[caller].append(latency)
+
+    def delay_for(self, caller: str) -> Optional[float]:
+        """Seconds to wait before hedging a call, or None if it should not be hedged."""
+        if caller not in self.callers:
+            return None
+        latencies = self._latencies[caller]
+        if len(latencies) < self.min_samples:
+            return None
+        ordered = sorted(latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return max(self.min_delay_seconds, ordered[index])
+
+    def _spend(self) -> bool:
+        if self._budget >= 1.0:
+            self._budget -= 1.0
+            return True
+        self.stats["budget_exhausted"] += 1
+        return False
+
+    async def run(self, caller: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `call`, hedging it with a second `call()` if it is slow.
+
+        `call` must raise for an invalid response, so that only a valid one
+        can win. If both calls fail, the first call's error is raised.
+        """
+        delay = self.delay_for(caller)
+        if delay is None:
+            return await call()
+
+        self.stats["calls"] += 1
+        self._budget = min(self.budget_burst, self._budget + self.budget_ratio)
+        primary = asyncio.ensure_future(call())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self._spend():
+                return await primary
+
+            logger.info(f"Hedging {caller} call still running after {delay:.2f}s")
+            self.stats["hedged"] += 1
+            hedge = asyncio.ensure_future(call())
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedge_won"] += 1
+                        return task.result()
+            return primary.result()  # both failed: raise the first call's error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            self.stats["losers_cancelled"] += len(losers)
+            if losers:
+                # Let the losers unwind, so their slots and spans are released before returning
+                await asyncio.gather(*losers, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "budget": round(self._budget, 3),
+            "delay_seconds": {caller: self.delay_for(caller) for caller in sorted(self.callers)},
+        }
+
+
+@lru_cache()
+def get_hedger() -> Hedger:
+    return Hedger(
+        callers=settings.LLM_HEDGE_CALLERS,
+        percentile=settings.LLM_HEDGE_PERCENTILE,
+        window=settings.LLM_HEDGE_WINDOW,
+        min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+        min_delay_seconds=settings.LLM_HEDGE_MIN_DELAY_SECONDS,
+        budget_ratio=settings.LLM_HEDGE_BUDGET_RATIO,
+        budget_burst=settings.LLM_HEDGE_BUDGET_BURST
+    )
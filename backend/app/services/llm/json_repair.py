@@ -0,0 +1,171 @@
+import json
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+_CODE_FENCE = re.compile(r"```(?:json|JSON)?")
+_CLOSERS = {"{": "}", "[": "]"}
+# The next non-space character, or an empty match at the end of the text
+_NEXT_SIGNIFICANT = re.compile(r"\s*(\S?)")
+
+
+class JSONRepairError(ValueError):
+    pass
+
+
+def _escape_or_close_quote(text: str, index: int) -> bool:
+    """
+    Decide whether the quote at `index` closes the current string.
+
+    A quote closes a string when the next non-space character is one that
+    can legally follow a string value or key. Anything else is treated as
+    an unescaped quote inside the string.
+    """
+    char = _NEXT_SIGNIFICANT.match(text, index + 1).group(1)
+    return not char or char in ",:}]"
+
+
+def _close(output: List[str], stack: List[str], in_string: bool) -> str:
+    text = "".join(output)
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    elif text.endswith(":"):
+        text += " null"
+    return text + "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def _scan_object(text: str, start: int) -> Tuple[List[str], int]:
+    """
+    Rewrite the JSON object starting at `start` into well-formed candidates.
+
+    The scan escapes stray quotes and raw newlines inside strings and drops
+    trailing commas. If the object is balanced it returns that single
+    candidate and the index just past its closing brace. If the text is
+    truncated it closes any open string, array and object, and also offers
+    the object cut back to the last complete value, because the truncated
+    value itself may be unusable. The returned end index is then -1.
+    """
+    output: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    # Output length and open containers right after the last complete value
+    safe_point: Tuple[int, List[str]] = (0, [])
+
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                if not _escape_or_close_quote(text, index):
+                    output.append('\\"')
+                    continue
+                in_string = False
+            elif char == "\n":
+                output.append("\\n")
+                continue
+            output.append(char)
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(char)
+        elif char in "}]":
+            stack.pop()
+            # Drop a trailing comma before the closing bracket
+            while output and output[-1].isspace():
+                output.pop()
+            if output and output[-1] == ",":
+                output.pop()
+            output.append(char)
+            if not stack:
+                return ["".join(output)], index + 1
+            continue
+        elif char == ",":
+            safe_point = (len(output), list(stack))
+        output.append(char)
+
+    candidates = [_close(output, stack, in_string)]
+    cut, cut_stack = safe_point
+    if cut:
+        candidates.append(_close(output[:cut], cut_stack, False))
+    return candidates, -1
+
+
+def _repair_candidates(text: str) -> List[str]:
+    """
+    Collect repaired candidates for every top-level object in `text`.
+
+    Balanced objects are tried largest first, so a short example echoed
+    before the real answer does not win. A truncated trailing object is
+    only tried after them.
+    """
+    start = text.find("{")
+    if start == -1:
+        raise JSONRepairError("No JSON object found in response")
+
+    balanced: List[str] = []
+    truncated: List[str] = []
+    while start != -1:
+        candidates, end = _scan_object(text, start)
+        if end == -1:
+            truncated = candidates
+            break
+        balanced.extend(candidates)
+        start = text.find("{", end)
+
+    return sorted(balanced, key=len, reverse=True) + truncated
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parse JSON from a model response, repairing common defects.
+
+    Handles code fences anywhere in the text, prose before or after the
+    object, trailing commas, unescaped quotes and raw newlines inside
+    strings, and responses truncated before their closing braces.
+
+    Raises:
+        JSONRepairError: If no candidate parses.
+    """
+    cleaned = _CODE_FENCE.sub("", text)
+    last_error = None
+    for candidate in _repair_candidates(cleaned):
+        try:
+            return json.loads(candidate, strict=False)
+        except json.JSONDecodeError as e:
+            last_error = e
+    raise JSONRepairError(f"Could not repair JSON response: {last_error}")
+
+
+class JSONRepairStats:
+    """
+    Per-schema counters for how responses were parsed.
+
+    - clean: parsed as-is
+    - repaired: repaired locally and passed validation (a saved round trip)
+    - repaired_invalid: repaired but failed validation, so the model was retried
+    - unrepairable: repair failed, so the model was retried
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, schema_key: str, outcome: str) -> None:
+        self._counts[schema_key][outcome] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {key: dict(counts) for key, counts in self._counts.items()}
+
+
+@lru_cache()
+def get_repair_stats() -> JSONRepairStats:
+    return JSONRepairStats()
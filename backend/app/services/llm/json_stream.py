@@ -0,0 +1,112 @@
+import json
+from typing import Iterable, List, Optional, Tuple
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+_CLOSE = object()  # returned by _decode for the quote that ends a string
+
+
+class IncrementalJSONParser:
+    """
+    Pull top-level string fields out of a JSON object as it streams in.
+
+    Feed raw model output chunk by chunk. `feed` returns events:
+
+    - ("delta", field, text): new decoded text of a field listed in
+      `stream_fields`, emitted while the value is still being written
+    - ("field", field, value): a top-level string field that has just been
+      closed
+
+    Only top-level string values are tracked; nested values are skipped.
+    Anything before the first `{` (such as a code fence) is ignored.
+    """
+
+    def __init__(self, stream_fields: Iterable[str] = ()):
+        self.stream_fields = set(stream_fields)
+        self._depth = 0
+        self._in_string = False
+        self._is_key = False
+        self._escape: Optional[str] = None  # pending escape sequence, without the backslash
+        self._buffer: List[str] = []
+        self._key: Optional[str] = None
+        self._expect_value = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, str]]:
+        events: List[Tuple[str, str, str]] = []
+        delta: List[str] = []
+
+        for char in chunk:
+            if self._in_string:
+                decoded = self._decode(char)
+                if decoded is None:
+                    continue
+                if decoded is _CLOSE:
+                    self._close_string(events, delta)
+                    delta = []
+                    continue
+                if self._depth == 1:
+                    self._buffer.append(decoded)
+                    if not self._is_key and self._key in self.stream_fields:
+                        delta.append(decoded)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._is_key = self._depth == 1 and not self._expect_value
+                self._buffer = []
+            elif char in "{[":
+                self._depth += 1
+                if self._depth > 1:
+                    self._expect_value = False
+            elif char in "}]":
+                self._depth -= 1
+            elif char == ":" and self._depth == 1:
+                self._expect_value = True
+            elif char == "," and self._depth == 1:
+                self._expect_value = False
+
+        if delta and self._in_string:
+            events.append(("delta", self._key, "".join(delta)))
+        return events
+
+    def _decode(self, char: str):
+        """Decode one character of a string body; None means more input is needed."""
+        if self._escape is not None:
+            self._escape += char
+            if self._escape[0] == "u":
+                if len(self._escape) < 5:
+                    return None
+                sequence, self._escape = self._escape, None
+                try:
+                    return json.loads(f'"\\{sequence}"')
+                except json.JSONDecodeError:
+                    return ""
+            sequence, self._escape = self._escape, None
+            return _SIMPLE_ESCAPES.get(sequence, sequence)
+        if char == "\\":
+            self._escape = ""
+            return None
+        if char == '"':
+            return _CLOSE
+        return char
+
+    def _close_string(self, events, delta) -> None:
+        self._in_string = False
+        if self._depth != 1:
+            return
+        value = "".join(self._buffer)
+        if self._is_key:
+            self._key = value
+            return
+        if delta:
+            events.append(("delta", self._key, "".join(delta)))
+        events.append(("field", self._key, value))
+        self._expect_value = False
@@ -1,22 +1,43 @@
 import os
-import google.generativeai as genai
-from pydantic import BaseModel, create_model
+import asyncio
 import json
 import logging
-from typing import Dict, Any, Type, List
+import time
+from functools import partial
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from app.config.settings import get_settings
-from jsonschema import validate, ValidationError
+from app.services.llm.backends import get_llm_backend
+from app.services.llm.circuit_breaker import CircuitBreaker, LLMUnavailable, get_circuit_breakers
+from app.services.llm.hedging import get_hedger
+from app.services.llm.metrics import LLMCallSpan, get_llm_metrics
+from app.services.llm.model_cache import get_model_cache
+from app.services.llm.response_cache import get_response_cache, make_cache_key
+from app.services.llm.schema_registry import CompiledSchema, get_schema_registry
+from app.services.llm.single_flight import get_single_flight
+from app.services.llm.scheduler import LLMPriority, LLMRateLimitExceeded, get_scheduler
+from app.services.llm.json_repair import JSONRepairError, get_repair_stats, repair_json
+from app.core.logging_setup import LazyJSON
+from jsonschema import ValidationError
 
 # Add this import for structured output
 from google.generativeai.types import GenerationConfig
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
+# Full model responses; sampled through LOG_SAMPLE_RATES
+payload_logger = logging.getLogger(f"{__name__}.payload")
 
 settings = get_settings()
 
+# Outcomes that say the model itself is unhealthy; the rest are the request's fault
+BREAKER_FAILURE_OUTCOMES = ("timeout", "quota", "error")
+
 class LLMService:
+    # Process-wide limit on in-flight model calls, shared by every instance
+    _semaphore: asyncio.Semaphore = None
+    _semaphore_loop = None
+    # JSON generator rules per schema fingerprint
+    _json_instructions_by_schema: Dict[str, str] = {}
+
     def __init__(self, model_name: str = "gemini-2.5-flash-preview-04-17"):
         """
         Initialize the LLM service with the specified model.
@@ -25,24 +46,28 @@ class LLMService:
             model_name: The name of the model to use. Defaults to Gemini 2.5 Flash.
         """
         self.model_name = model_name
+        self.response_cache = get_response_cache()
+        self.schema_registry = get_schema_registry()
+        self.repair_stats = get_repair_stats()
+        self.single_flight = get_single_flight()
+        self.scheduler = get_scheduler()
+        self.metrics = get_llm_metrics()
+        self.model_cache = get_model_cache()
+        self.circuit_breakers = get_circuit_breakers()
+        self.hedger = get_hedger()
         
-        # Configure Gemini
-        gemini_key = settings.GEMINI_API_KEY
-        if not gemini_key:
-            logger.error("No GEMINI_API_KEY found in settings")
-            raise ValueError("GEMINI_API_KEY is required")
+        self.backend = get_llm_backend()
         
         try:
-            genai.configure(api_key=gemini_key)
             # Initialize the model with safety settings
-            generation_config = {
+            self.generation_config = {
                 "temperature": 0.7,
                 "top_p": 1,
                 "top_k": 1,
                 "max_output_tokens": 2048,
             }
             
-            safety_settings = [
+            self.safety_settings = [
                 {
                     "category": "HARM_CATEGORY_HARASSMENT",
                     "threshold": "BLOCK_MEDIUM_AND_ABOVE"
@@ -61,49 +86,168 @@ class LLMService:
                 },
             ]
             
-            self.model = genai.GenerativeModel(
-                model_name=self.model_name,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
-            self.client = genai
-            logger.info(f"LLM model {model_name} initialized successfully")
+            self.model = self._get_model()
+            logger.info("LLM model %s initialized successfully on the %s backend", model_name, self.backend.name)
         except Exception as e:
             logger.error(f"Failed to initialize LLM model: {str(e)}")
             raise
 
-    def _create_pydantic_model(self, schema: Dict[str, Any]) -> Type[BaseModel]:
-        """
-        Create a Pydantic model from a JSON schema.
-        """
-        if not isinstance(schema, dict) or "properties" not in schema:
-            raise ValueError("Invalid schema format")
-
-        fields = {}
-        for field_name, field_schema in schema["properties"].items():
-            field_type = str  # Default to string
-            if field_schema.get("type") == "integer":
-                field_type = int
-            elif field_schema.get("type") == "number":
-                field_type = float
-            elif field_schema.get("type") == "boolean":
-                field_type = bool
-            elif field_schema.get("type") == "array":
-                # Get the type of array items
-                items_schema = field_schema.get("items", {})
-                item_type = str  # Default to string
-                if items_schema.get("type") == "integer":
-                    item_type = int
-                elif items_schema.get("type") == "number":
-                    item_type = float
-                elif items_schema.get("type") == "boolean":
-                    item_type = bool
-                field_type = List[item_type]
-            
-            required = field_name in schema.get("required", [])
-            fields[field_name] = (field_type, ... if required else None)
+    def _get_model(self, system_instruction: Optional[str] = None, model_name: Optional[str] = None):
+        """
+        Get a model handle for a system instruction from the shared model cache.
+        """
+        return self.model_cache.get(
+            self.backend,
+            model_name or self.model_name,
+            system_instruction=system_instruction,
+            generation_config=self.generation_config,
+            safety_settings=self.safety_settings
+        )
+
+    def _model_names(self) -> List[str]:
+        """
+        The models a call may use, in order of preference.
+        """
+        model_names = [self.model_name]
+        if settings.LLM_FALLBACK_MODEL and settings.LLM_FALLBACK_MODEL != self.model_name:
+            model_names.append(settings.LLM_FALLBACK_MODEL)
+        return model_names
+
+    def _route_model(self, system_instruction: Optional[str] = None) -> Tuple[str, Any]:
+        """
+        Pick the model for the next call: the primary model unless its circuit
+        is open, otherwise the fallback model.
+
+        Raises:
+            LLMUnavailable: If the circuit of every model is open
+        """
+        if not settings.LLM_BREAKER_ENABLED:
+            return self.model_name, self._get_model(system_instruction)
+        model_names = self._model_names()
+        for model_name in model_names:
+            if self.circuit_breakers.get(model_name).allow():
+                if model_name != self.model_name:
+                    logger.warning("Circuit for %s is open, using fallback model %s", self.model_name, model_name)
+                return model_name, self._get_model(system_instruction, model_name)
+        raise LLMUnavailable(f"No LLM model is available right now (circuit open for {', '.join(model_names)})")
+
+    def _breaker_for(self, span: Optional[LLMCallSpan]) -> Optional[CircuitBreaker]:
+        if not settings.LLM_BREAKER_ENABLED or span is None:
+            return None
+        return self.circuit_breakers.get(span.model)
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        """
+        Get the concurrency limiter for the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if cls._semaphore is None or cls._semaphore_loop is not loop:
+            cls._semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+            cls._semaphore_loop = loop
+        return cls._semaphore
+
+    async def _admit(self, contents, generation_config, priority: LLMPriority) -> None:
+        """
+        Wait for the rate-limit scheduler to let a call through.
+        """
+        if isinstance(generation_config, dict):
+            max_output_tokens = generation_config.get("max_output_tokens") or 0
+        else:
+            max_output_tokens = getattr(generation_config, "max_output_tokens", None) or 0
+        # Rough estimate of ~4 characters per token for the prompt
+        estimated_tokens = len(str(contents)) // 4 + max_output_tokens
+        await self.scheduler.acquire(priority, estimated_tokens)
 
-        return create_model("DynamicModel", **fields)
+    def _classify_error(self, error: Exception) -> str:
+        """
+        Map an exception raised by a model call to a metrics outcome.
+        """
+        if isinstance(error, asyncio.TimeoutError):
+            return "timeout"
+        if isinstance(error, LLMRateLimitExceeded):
+            return "quota"
+        return self.backend.classify_error(error) or "error"
+
+    async def _generate_content(
+        self,
+        model,
+        contents,
+        generation_config,
+        priority: LLMPriority = LLMPriority.GENERATION,
+        span: Optional[LLMCallSpan] = None
+    ):
+        """
+        Call the model without blocking the event loop.
+
+        Every model call goes through here so that the rate-limit scheduler,
+        the global concurrency limit, the per-call timeout and the circuit
+        breaker of `span.model` apply to all entry points. Failures of the
+        call itself finish `span` with their outcome; the caller finishes it
+        once the response has been checked.
+        """
+        breaker = self._breaker_for(span)
+        started_at = None
+        try:
+            await self._admit(contents, generation_config, priority)
+
+            async with self._get_semaphore():
+                if span:
+                    span.start()
+                started_at = time.monotonic()
+                response = await asyncio.wait_for(
+                    model.generate_content_async(
+                        contents,
+                        generation_config=generation_config
+                    ),
+                    timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS
+                )
+        except Exception as e:
+            outcome = self._classify_error(e)
+            if span:
+                span.finish(outcome)
+            if breaker:
+                if started_at is not None and outcome in BREAKER_FAILURE_OUTCOMES:
+                    breaker.record(False, time.monotonic() - started_at)
+                else:
+                    # Rejected by the scheduler, or a failure that says nothing about the model
+                    breaker.release()
+            raise
+        except asyncio.CancelledError:
+            # e.g. the losing call of a hedged pair
+            if span:
+                span.finish("cancelled")
+            if breaker:
+                breaker.release()
+            raise
+
+        if breaker:
+            breaker.record(True, time.monotonic() - started_at)
+        if span:
+            span.record_response(response)
+        return response
+
+    def _response_text(self, response, span: LLMCallSpan) -> str:
+        """
+        Get the text of a response, recording safety blocks and empty answers.
+        """
+        if not response:
+            span.finish("error")
+            raise ValueError("Invalid response format from model")
+        block_reason = self.backend.block_reason(response)
+        if block_reason:
+            span.finish("safety_block")
+            raise ValueError(f"Response blocked by safety filters: {block_reason}")
+        try:
+            response_text = response.text
+        except (AttributeError, ValueError) as e:
+            span.finish("error")
+            raise ValueError(f"Invalid response format from model: {str(e)}")
+        if not response_text:
+            span.finish("error")
+            raise ValueError("Empty response from model")
+        span.record_text(response_text)
+        return response_text
 
     def _extract_json_from_text(self, text: str) -> str:
         """
@@ -136,13 +280,85 @@ class LLMService:
             
         return json_text
 
+    def _parse_json_response(self, response_text: str) -> Tuple[Any, bool]:
+        """
+        Parse the model's JSON, repairing common defects before giving up.
+
+        Returns:
+            The parsed value and whether it needed repair
+        """
+        try:
+            return json.loads(self._extract_json_from_text(response_text)), False
+        except ValueError:
+            return repair_json(response_text), True
+
+    def _json_instructions(self, json_schema: Dict[str, Any], compiled_schema: CompiledSchema) -> str:
+        """
+        The JSON generator rules for a schema, built once per schema.
+        """
+        instructions = self._json_instructions_by_schema.get(compiled_schema.fingerprint)
+        if instructions is not None:
+            return instructions
+
+        # Create example response
+        example_response = {}
+        for field_name, field_schema in json_schema["properties"].items():
+            if field_schema.get("type") == "array":
+                example_response[field_name] = []
+            else:
+                example_response[field_name] = f"<{field_schema.get('description', 'value')}>"
+
+        instructions = f"""You are a JSON generator that must follow these rules exactly:
+1. Generate ONLY a JSON object, nothing else
+2. The JSON must match this schema exactly:
+{json.dumps(json_schema, indent=2)}
+
+Format your response like this example:
+{json.dumps(example_response, indent=2)}
+
+The content should be based on the user's prompt.
+
+Remember:
+- No text before or after the JSON
+- No markdown formatting (no ```json or ```)
+- No comments
+- Properly escape strings
+- Include all required fields
+- Single, valid JSON object only"""
+        self._json_instructions_by_schema[compiled_schema.fingerprint] = instructions
+        return instructions
+
+    def _json_system_instruction(
+        self,
+        system_instruction: Optional[str],
+        json_schema: Dict[str, Any],
+        compiled_schema: CompiledSchema
+    ) -> str:
+        """
+        Combine a caller's static rules with the JSON rules for its schema.
+
+        Everything here is static for a given caller and schema, so it is sent
+        as the system instruction of a cached model and only the dynamic
+        prompt is built per request.
+        """
+        json_instructions = self._json_instructions(json_schema, compiled_schema)
+        if not system_instruction:
+            return json_instructions
+        return f"{system_instruction}\n\n{json_instructions}"
+
     async def generate_json_content(
         self,
         prompt: str,
         json_schema: Dict[str, Any],
         temperature: float = 0.7,
         max_tokens: int = 2048,
-        retry_count: int = 3
+        retry_count: int = 3,
+        bypass_cache: bool = False,
+        refresh_cache: bool = False,
+        priority: LLMPriority = LLMPriority.GENERATION,
+        caller: str = "unknown",
+        system_instruction: Optional[str] = None,
+        coalesce: bool = True
     ) -> Dict[str, Any]:
         """
         Generate content in a specific JSON format using Gemini and validate with Pydantic.
@@ -153,105 +369,290 @@ class LLMService:
             temperature: Controls randomness in the response (0.0 to 1.0)
             max_tokens: Maximum number of tokens to generate
             retry_count: Number of times to retry on failure
+            bypass_cache: Skip the response cache for this call entirely
+            refresh_cache: Ignore any cached response but store the new one
+            priority: Scheduling class used when the rate limit is reached
+            caller: Feature tag for metrics (story, rag_story, vocabulary, question, chat)
+            system_instruction: Static rules for the model; keep per-request
+                details in the prompt so the model handle can be reused
+            coalesce: Share the call with identical requests already in
+                flight; pass False when each call must get its own response
 
         Returns:
             The generated content as a dictionary matching the specified schema
         """
+        # Compiled once per schema and shared by every call and retry
+        compiled_schema = self.schema_registry.get(json_schema)
+        full_instruction = self._json_system_instruction(system_instruction, json_schema, compiled_schema)
+
+        use_cache = settings.LLM_CACHE_ENABLED and not bypass_cache
+        cache_key = make_cache_key(self.model_name, prompt, json_schema, temperature, max_tokens, full_instruction)
+        if use_cache and not refresh_cache:
+            cached_response = await self.response_cache.get(cache_key)
+            if cached_response is not None:
+                logger.info("Returning cached LLM response")
+                return cached_response
+
+        async def generate() -> Dict[str, Any]:
+            validated_response = await self._generate_validated_json(
+                full_instruction,
+                prompt,
+                compiled_schema,
+                temperature,
+                max_tokens,
+                retry_count,
+                priority,
+                caller
+            )
+            if use_cache:
+                await self.response_cache.set(cache_key, validated_response, self.model_name)
+            return validated_response
+
+        if not (settings.LLM_SINGLE_FLIGHT_ENABLED and coalesce):
+            return await generate()
+        # Identical requests already in flight share one model call
+        return await self.single_flight.do(f"json_content:{cache_key}", generate)
+
+    async def _generate_validated_json(
+        self,
+        system_instruction: str,
+        prompt: str,
+        compiled_schema: CompiledSchema,
+        temperature: float,
+        max_tokens: int,
+        retry_count: int,
+        priority: LLMPriority,
+        caller: str = "unknown"
+    ) -> Dict[str, Any]:
+        """
+        Call the model until it returns JSON that validates, up to retry_count times.
+
+        The model is picked again for every attempt, so retries move to the
+        fallback model as soon as the primary's circuit opens, and stop once
+        no model is available. With hedging enabled, a slow attempt is raced
+        against a duplicate and the first valid response wins.
+        """
         last_error = None
-        
-        for attempt in range(retry_count):
-            try:
-                # Create Pydantic model from schema
-                model_class = self._create_pydantic_model(json_schema)
-
-                # Create example response
-                example_response = {}
-                for field_name, field_schema in json_schema["properties"].items():
-                    example_response[field_name] = f"<{field_schema.get('description', 'value')}>"
-
-                # Add JSON schema instructions to the prompt
-                formatted_prompt = f"""
-                You are a JSON generator that must follow these rules exactly:
-                1. Generate ONLY a JSON object, nothing else
-                2. The JSON must match this schema exactly:
-                {json.dumps(json_schema, indent=2)}
-
-                Format your response like this example:
-                {json.dumps(example_response, indent=2)}
-
-                The content should be based on this prompt:
-                {prompt}
-
-                Remember:
-                - No text before or after the JSON
-                - No markdown formatting (no ```json or ```)
-                - No comments
-                - Properly escape strings
-                - Include all required fields
-                - Single, valid JSON object only
-                """
 
-                # Generate the response
-                logger.info(f"Attempt {attempt + 1}/{retry_count}: Generating content...")
-                response = self.model.generate_content(
-                    formatted_prompt,
-                    generation_config={
-                        "temperature": temperature,
-                        "max_output_tokens": max_tokens,
-                    }
-                )
-                
-                if not response or not hasattr(response, 'text'):
-                    raise ValueError(f"Invalid response format from model on attempt {attempt + 1}")
-                
-                response_text = response.text
-                if not response_text:
-                    raise ValueError(f"Empty response from model on attempt {attempt + 1}")
-                
-                logger.info(f"Raw response from model: {response_text}")
-                
-                # Extract and parse JSON
-                try:
-                    json_text = self._extract_json_from_text(response_text)
-                    parsed_response = json.loads(json_text)
-                    
-                    # Validate with Pydantic
-                    validated_response = model_class(**parsed_response).model_dump()
-                    
-                    # Additional validation for story content
-                    if "story_body" in validated_response:
-                        if len(validated_response["story_body"]) < 200:
-                            raise ValueError("Story body is too short (minimum 200 characters)")
-                    
-                    logger.info(f"Successfully generated and validated JSON response: {json.dumps(validated_response, indent=2)}")
-                    return validated_response
-                    
-                except json.JSONDecodeError as e:
-                    last_error = f"Invalid JSON response on attempt {attempt + 1}: {str(e)}"
-                    logger.warning(last_error)
-                    logger.warning(f"Raw response: {response_text}")
-                    continue
-                except Exception as e:
-                    last_error = f"Validation failed on attempt {attempt + 1}: {str(e)}"
-                    logger.warning(last_error)
-                    continue
-                
+        for attempt in range(1, retry_count + 1):
+            logger.debug("Attempt %d/%d: Generating content...", attempt, retry_count)
+            attempt_call = partial(
+                self._attempt_validated_json,
+                system_instruction,
+                prompt,
+                compiled_schema,
+                temperature,
+                max_tokens,
+                priority,
+                caller,
+                attempt
+            )
+            try:
+                if settings.LLM_HEDGING_ENABLED:
+                    return await self.hedger.run(caller, attempt_call)
+                return await attempt_call()
+            except (LLMRateLimitExceeded, LLMUnavailable):
+                # Retrying straight away would only be rejected again
+                raise
             except Exception as e:
-                last_error = f"Error on attempt {attempt + 1}: {str(e)}"
+                last_error = str(e)
                 logger.warning(last_error)
                 continue
         
         # If we get here, all attempts failed
         raise ValueError(f"Failed to generate valid response after {retry_count} attempts. Last error: {last_error}")
 
+    async def _attempt_validated_json(
+        self,
+        system_instruction: str,
+        prompt: str,
+        compiled_schema: CompiledSchema,
+        temperature: float,
+        max_tokens: int,
+        priority: LLMPriority,
+        caller: str,
+        attempt: int
+    ) -> Dict[str, Any]:
+        """
+        One model call for _generate_validated_json; raises unless the response validates.
+        """
+        model_class = compiled_schema.model
+        schema_key = compiled_schema.fingerprint[:12]
+        model_name, model = self._route_model(system_instruction)
+        span = self.metrics.span(caller, model_name, attempt, prompt)
+        try:
+            # Generate the response
+            response = await self._generate_content(
+                model,
+                prompt,
+                generation_config={
+                    "temperature": temperature,
+                    "max_output_tokens": max_tokens,
+                },
+                priority=priority,
+                span=span
+            )
+            response_text = self._response_text(response, span)
+        except LLMRateLimitExceeded:
+            raise
+        except Exception as e:
+            span.finish("error")
+            raise ValueError(f"Error on attempt {attempt}: {str(e)}")
+        
+        payload_logger.debug("Raw response from model: %s", response_text)
+        
+        # Extract and parse JSON, repairing it locally if needed
+        repaired = False
+        try:
+            parsed_response, repaired = self._parse_json_response(response_text)
+            
+            # Validate with Pydantic
+            validated_response = model_class(**parsed_response).model_dump()
+            
+            # Additional validation for story content
+            if "story_body" in validated_response:
+                if len(validated_response["story_body"]) < 200:
+                    raise ValueError("Story body is too short (minimum 200 characters)")
+            
+        except JSONRepairError as e:
+            self.repair_stats.record(schema_key, "unrepairable")
+            span.finish("json_error")
+            payload_logger.info("Unparseable response from model: %s", response_text)
+            raise ValueError(f"Invalid JSON response on attempt {attempt}: {str(e)}")
+        except Exception as e:
+            if repaired:
+                self.repair_stats.record(schema_key, "repaired_invalid")
+            span.finish("validation_error")
+            raise ValueError(f"Validation failed on attempt {attempt}: {str(e)}")
+
+        self.repair_stats.record(schema_key, "repaired" if repaired else "clean")
+        span.finish("ok")
+        self.hedger.record(caller, span.latency)
+        payload_logger.info("Successfully generated and validated JSON response: %s", LazyJSON(validated_response))
+        return validated_response
+
+    async def stream_json_content(
+        self,
+        prompt: str,
+        json_schema: Dict[str, Any],
+        temperature: float = 0.7,
+        max_tokens: int = 2048,
+        priority: LLMPriority = LLMPriority.GENERATION,
+        caller: str = "unknown",
+        system_instruction: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the raw text of a JSON response as the model writes it.
+
+        Streams are not cached, coalesced or retried. Pass the joined text
+        to validate_json_response once the stream ends.
+
+        Args:
+            prompt: The prompt to send to the model
+            json_schema: The schema that defines the expected JSON structure
+            temperature: Controls randomness in the response (0.0 to 1.0)
+            max_tokens: Maximum number of tokens to generate
+            priority: Scheduling class used when the rate limit is reached
+            caller: Feature tag for metrics
+            system_instruction: Static rules for the model
+
+        Yields:
+            Chunks of response text
+        """
+        compiled_schema = self.schema_registry.get(json_schema)
+        model_name, model = self._route_model(
+            self._json_system_instruction(system_instruction, json_schema, compiled_schema)
+        )
+        generation_config = {
+            "temperature": temperature,
+            "max_output_tokens": max_tokens,
+        }
+        span = self.metrics.span(caller, model_name, 1, prompt)
+        breaker = self._breaker_for(span)
+        first_chunk_latency = None
+        try:
+            await self._admit(prompt, generation_config, priority)
+
+            async with self._get_semaphore():
+                span.start()
+                response = await asyncio.wait_for(
+                    model.generate_content_async(
+                        prompt,
+                        generation_config=generation_config,
+                        stream=True
+                    ),
+                    timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS
+                )
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        # The timeout bounds the gap between chunks, not the whole stream
+                        chunk = await asyncio.wait_for(
+                            chunks.__anext__(),
+                            timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS
+                        )
+                    except StopAsyncIteration:
+                        break
+                    if first_chunk_latency is None:
+                        first_chunk_latency = time.monotonic() - span.started_at
+                    span.record_response(chunk)
+                    if chunk.text:
+                        span.response_chars += len(chunk.text)
+                        yield chunk.text
+        except Exception as e:
+            outcome = self._classify_error(e)
+            span.finish(outcome)
+            if breaker:
+                if span.outcome in BREAKER_FAILURE_OUTCOMES and not isinstance(e, LLMRateLimitExceeded):
+                    breaker.record(False, span.latency)
+                else:
+                    breaker.release()
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away before the stream ended
+            span.finish("cancelled")
+            if breaker:
+                breaker.release()
+            raise
+        finally:
+            # Parsing happens in the caller, so a complete stream counts as ok
+            if span.outcome is None and breaker:
+                # Time to first chunk is what a slow model shows up in
+                breaker.record(True, first_chunk_latency)
+            span.finish("ok")
+
+    def validate_json_response(self, response_text: str, json_schema: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Parse, repair and validate a complete response against a schema.
+
+        Raises:
+            ValueError: If the response cannot be parsed or does not validate
+        """
+        compiled_schema = self.schema_registry.get(json_schema)
+        schema_key = compiled_schema.fingerprint[:12]
+        try:
+            parsed_response, repaired = self._parse_json_response(response_text)
+        except JSONRepairError:
+            self.repair_stats.record(schema_key, "unrepairable")
+            raise
+        try:
+            validated_response = compiled_schema.model(**parsed_response).model_dump()
+        except Exception as e:
+            if repaired:
+                self.repair_stats.record(schema_key, "repaired_invalid")
+            raise ValueError(f"Invalid response format: {str(e)}")
+        self.repair_stats.record(schema_key, "repaired" if repaired else "clean")
+        return validated_response
+
     async def generate_content_with_structured_schema(
         self,
         system_instruction: str,
         query: str,
-        response_schema: dict
+        response_schema: dict,
+        caller: str = "unknown"
     ) -> dict:
         """
-        Generate content using Gemini's native structured output (JSON schema).
+        Generate content using the model's native structured output (JSON schema).
         Args:
             system_instruction: System prompt for the model
             query: User prompt
@@ -261,10 +662,7 @@ class LLMService:
         """
         try:
             # Initialize the generative model with system instruction
-            model = self.client.GenerativeModel(
-                model_name=self.model_name,
-                system_instruction=system_instruction
-            )
+            model_name, model = self._route_model(system_instruction)
 
             # Configure generation with structured output
             generation_config = GenerationConfig(
@@ -273,19 +671,22 @@ class LLMService:
             )
 
             # Send the query (prompt)
-            response = await model.generate_content_async(
-                contents=query,
-                generation_config=generation_config
+            span = self.metrics.span(caller, model_name, 1, query)
+            response = await self._generate_content(
+                model,
+                query,
+                generation_config=generation_config,
+                span=span
             )
 
             # Return the parsed JSON response
-            if hasattr(response, 'text'):
-                return json.loads(response.text)
-            elif hasattr(response, 'candidates') and response.candidates:
-                # Fallback for some Gemini SDK versions
-                return json.loads(response.candidates[0].content.parts[0].text)
-            else:
-                raise ValueError("No valid JSON response from Gemini model.")
+            try:
+                parsed_response = json.loads(self._response_text(response, span))
+            except json.JSONDecodeError:
+                span.finish("json_error")
+                raise
+            span.finish("ok")
+            return parsed_response
                 
         except Exception as e:
             logger.error(f"Error in generate_content_with_structured_schema: {str(e)}")
@@ -295,67 +696,78 @@ class LLMService:
         self,
         system_instruction: str,
         query: str,
-        response_schema: dict
+        response_schema: dict,
+        bypass_cache: bool = False,
+        refresh_cache: bool = False,
+        priority: LLMPriority = LLMPriority.GENERATION,
+        caller: str = "unknown"
     ) -> str:
         """
         Generates content ensuring it adheres to a specified JSON schema.
         """
         try:
-            # Create example response based on schema
-            example_response = {}
-            for field_name, field_schema in response_schema["properties"].items():
-                if field_schema.get("type") == "array":
-                    example_response[field_name] = []
-                else:
-                    example_response[field_name] = f"<{field_schema.get('description', 'value')}>"
-
-            # Add JSON schema instructions to the prompt
-            formatted_prompt = f"""
-            You are a JSON generator that must follow these rules exactly:
-            1. Generate ONLY a JSON object, nothing else
-            2. The JSON must match this schema exactly:
-            {json.dumps(response_schema, indent=2)}
-
-            Format your response like this example:
-            {json.dumps(example_response, indent=2)}
-
-            The content should be based on this prompt:
-            {query}
-
-            Remember:
-            - No text before or after the JSON
-            - No markdown formatting (no ```json or ```)
-            - No comments
-            - Properly escape strings
-            - Include all required fields
-            - Single, valid JSON object only
-            """
+            # Static rules go in the system instruction of a cached model
+            compiled_schema = self.schema_registry.get(response_schema)
+            full_instruction = self._json_system_instruction(system_instruction, response_schema, compiled_schema)
 
-            # Generate the response
-            response = self.model.generate_content(
-                formatted_prompt,
-                generation_config={
-                    "temperature": 0.7,
-                    "max_output_tokens": 2048,
-                }
-            )
-            
-            if not response or not hasattr(response, 'text'):
-                raise ValueError("Invalid response format from model")
-            
-            response_text = response.text
-            if not response_text:
-                raise ValueError("Empty response from model")
-            
-            # Extract and parse JSON
-            json_text = self._extract_json_from_text(response_text)
-            parsed_response = json.loads(json_text)
+            use_cache = settings.LLM_CACHE_ENABLED and not bypass_cache
+            cache_key = make_cache_key(self.model_name, query, response_schema, 0.7, 2048, full_instruction)
+            if use_cache and not refresh_cache:
+                cached_response = await self.response_cache.get(cache_key)
+                if cached_response is not None:
+                    logger.info("Returning cached LLM response")
+                    return json.dumps(cached_response)
+
+            async def generate() -> Dict[str, Any]:
+                # Generate the response
+                model_name, model = self._route_model(full_instruction)
+                span = self.metrics.span(caller, model_name, 1, query)
+                response = await self._generate_content(
+                    model,
+                    query,
+                    generation_config={
+                        "temperature": 0.7,
+                        "max_output_tokens": 2048,
+                    },
+                    priority=priority,
+                    span=span
+                )
+                response_text = self._response_text(response, span)
             
+                # Extract and parse JSON, repairing it locally if needed
+                schema_key = compiled_schema.fingerprint[:12]
+                try:
+                    parsed_response, repaired = self._parse_json_response(response_text)
+                except JSONRepairError:
+                    self.repair_stats.record(schema_key, "unrepairable")
+                    span.finish("json_error")
+                    raise
+
             # Validate against schema
-            validate(instance=parsed_response, schema=response_schema)
-            
-            return json_text
+                try:
+                    compiled_schema.validator.validate(parsed_response)
+                except ValidationError:
+                    if repaired:
+                        self.repair_stats.record(schema_key, "repaired_invalid")
+                    span.finish("validation_error")
+                    raise
+                self.repair_stats.record(schema_key, "repaired" if repaired else "clean")
+                span.finish("ok")
 
+                if use_cache:
+                    await self.response_cache.set(cache_key, parsed_response, self.model_name)
+                return parsed_response
+
+            if settings.LLM_SINGLE_FLIGHT_ENABLED:
+                # Identical requests already in flight share one model call
+                parsed_response = await self.single_flight.do(f"json_format:{cache_key}", generate)
+            else:
+                parsed_response = await generate()
+
+            return json.dumps(parsed_response)
+
+        except (LLMRateLimitExceeded, LLMUnavailable):
+            raise
         except ValidationError as e:
             logger.error(f"Schema validation error: {str(e)}")
             raise ValueError(f"Invalid response format: {str(e)}")
@@ -0,0 +1,207 @@
+import logging
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# Outcome classes for a single model call
+OUTCOMES = ("ok", "json_error", "validation_error", "safety_block", "timeout", "quota", "cancelled", "error")
+
+
+class Histogram:
+    """A fixed-bucket histogram in the Prometheus style (cumulative on export)."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Estimate a percentile by interpolating inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        rows = []
+        for bound, bucket_count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            total += bucket_count
+            rows.append((bound, total))
+        return rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+class LLMCallSpan:
+    """
+    One model call (one attempt). Finish it exactly once with its outcome.
+
+    `started_at` is reset by LLMService when the call leaves the scheduler
+    queue, so latency measures the model call rather than time spent waiting
+    for quota.
+    """
+
+    def __init__(self, metrics: "LLMMetrics", caller: str, model: str, attempt: int, prompt: Any):
+        self.metrics = metrics
+        self.caller = caller
+        self.model = model
+        self.attempt = attempt
+        self.prompt_chars = len(str(prompt))
+        self.response_chars = 0
+        self.prompt_tokens: Optional[int] = None
+        self.response_tokens: Optional[int] = None
+        self.outcome: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.latency = 0.0
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+
+    def record_response(self, response: Any) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.prompt_tokens = getattr(usage, "prompt_token_count", None)
+            self.response_tokens = getattr(usage, "candidates_token_count", None)
+
+    def record_text(self, text: str) -> None:
+        self.response_chars = len(text)
+
+    def finish(self, outcome: str) -> None:
+        if self.outcome is not None:
+            return
+        self.outcome = outcome
+        self.latency = time.monotonic() - self.started_at
+        self.metrics.record(self)
+
+
+class LLMMetrics:
+    """
+    Counters and histograms aggregated from LLMCallSpans, per caller tag.
+
+    Token counts come from the response's usage metadata. When a backend
+    does not report them they are estimated at ~4 characters per token and
+    counted under `estimated_token_calls`.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Tuple[str, str, str], int] = defaultdict(int)  # (caller, model, outcome)
+        self.latency: Dict[str, Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.response_tokens: Dict[str, Histogram] = defaultdict(lambda: Histogram(TOKEN_BUCKETS))
+        self.prompt_tokens: Dict[str, int] = defaultdict(int)
+        self.prompt_chars: Dict[str, int] = defaultdict(int)
+        self.response_chars: Dict[str, int] = defaultdict(int)
+        self.retries: Dict[str, int] = defaultdict(int)
+        self.estimated_token_calls: Dict[str, int] = defaultdict(int)
+
+    def span(self, caller: str, model: str, attempt: int, prompt: Any) -> LLMCallSpan:
+        return LLMCallSpan(self, caller, model, attempt, prompt)
+
+    def record(self, span: LLMCallSpan) -> None:
+        caller = span.caller
+        self.calls[(caller, span.model, span.outcome)] += 1
+        self.latency[caller].observe(span.latency)
+        if span.attempt > 1:
+            self.retries[caller] += 1
+
+        prompt_tokens, response_tokens = span.prompt_tokens, span.response_tokens
+        if prompt_tokens is None or response_tokens is None:
+            self.estimated_token_calls[caller] += 1
+            prompt_tokens = span.prompt_chars // 4 if prompt_tokens is None else prompt_tokens
+            response_tokens = span.response_chars // 4 if response_tokens is None else response_tokens
+        self.prompt_tokens[caller] += prompt_tokens
+        self.prompt_chars[caller] += span.prompt_chars
+        self.response_chars[caller] += span.response_chars
+        if span.outcome == "ok":
+            self.response_tokens[caller].observe(response_tokens)
+
+        logger.debug(
+            "llm call caller=%s model=%s attempt=%d outcome=%s latency=%.3fs prompt_chars=%d response_chars=%d",
+            caller, span.model, span.attempt, span.outcome, span.latency, span.prompt_chars, span.response_chars
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        callers: Dict[str, Dict[str, Any]] = {}
+        for (caller, model, outcome), count in self.calls.items():
+            entry = callers.setdefault(caller, {"outcomes": defaultdict(int), "models": defaultdict(int)})
+            entry["outcomes"][outcome] += count
+            entry["models"][model] += count
+
+        for caller, entry in callers.items():
+            ok = entry["outcomes"].get("ok", 0)
+            entry["outcomes"] = dict(entry["outcomes"])
+            entry["models"] = dict(entry["models"])
+            entry["latency_seconds"] = self.latency[caller].to_dict()
+            entry["response_tokens"] = self.response_tokens[caller].to_dict()
+            entry["prompt_tokens_total"] = self.prompt_tokens[caller]
+            entry["prompt_chars_total"] = self.prompt_chars[caller]
+            entry["response_chars_total"] = self.response_chars[caller]
+            entry["retries"] = self.retries[caller]
+            entry["retries_per_success"] = self.retries[caller] / ok if ok else None
+            entry["estimated_token_calls"] = self.estimated_token_calls[caller]
+        return callers
+
+    def render_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP buddy_llm_calls_total LLM calls by caller, model and outcome",
+            "# TYPE buddy_llm_calls_total counter",
+        ]
+        for (caller, model, outcome), count in sorted(self.calls.items()):
+            lines.append(f'buddy_llm_calls_total{{caller="{caller}",model="{model}",outcome="{outcome}"}} {count}')
+
+        for name, help_text, histograms in (
+            ("buddy_llm_call_latency_seconds", "LLM call latency", self.latency),
+            ("buddy_llm_response_tokens", "Tokens in successful responses", self.response_tokens),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for caller, histogram in sorted(histograms.items()):
+                for bound, total in histogram.cumulative():
+                    lines.append(f'{name}_bucket{{caller="{caller}",le="{bound}"}} {total}')
+                lines.append(f'{name}_sum{{caller="{caller}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{caller="{caller}"}} {histogram.count}')
+
+        for name, help_text, counters in (
+            ("buddy_llm_prompt_tokens_total", "Prompt tokens sent", self.prompt_tokens),
+            ("buddy_llm_retries_total", "Calls that were retries of a failed attempt", self.retries),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for caller, value in sorted(counters.items()):
+                lines.append(f'{name}{{caller="{caller}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+@lru_cache()
+def get_llm_metrics() -> LLMMetrics:
+    return LLMMetrics()
@@ -0,0 +1,78 @@
+import hashlib
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class ModelCache:
+    """
+    LRU cache of model handles.
+
+    Handles are keyed by backend, model name, a hash of the system
+    instruction, the safety settings and the generation config, so every
+    caller with the same static instruction reuses one model object
+    instead of building a new one per request.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._models: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(
+        self,
+        backend: Any,
+        model_name: str,
+        system_instruction: Optional[str] = None,
+        generation_config: Optional[Dict[str, Any]] = None,
+        safety_settings: Optional[List[Dict[str, str]]] = None
+    ) -> Any:
+        instruction_hash = (
+            hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+            if system_instruction else ""
+        )
+        key = (
+            backend,
+            model_name,
+            instruction_hash,
+            _canonical(safety_settings),
+            _canonical(generation_config),
+        )
+        model = self._models.get(key)
+        if model is not None:
+            self._models.move_to_end(key)
+            self.stats["hits"] += 1
+            return model
+
+        self.stats["misses"] += 1
+        model = backend.create_model(
+            model_name=model_name,
+            generation_config=generation_config,
+            safety_settings=safety_settings,
+            system_instruction=system_instruction
+        )
+        self._models[key] = model
+        if len(self._models) > self.max_entries:
+            self._models.popitem(last=False)
+            self.stats["evictions"] += 1
+        return model
+
+    def clear(self) -> None:
+        self._models.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "size": len(self._models)}
+
+
+@lru_cache()
+def get_model_cache() -> ModelCache:
+    return ModelCache(max_entries=settings.LLM_MODEL_CACHE_MAX_ENTRIES)
@@ -0,0 +1,176 @@
+import copy
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from app.config.settings import get_settings
+from app.db.mongo import MongoDB
+from app.services.llm.schema_registry import schema_fingerprint
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+def make_cache_key(
+    model_name: str,
+    prompt: str,
+    schema: Optional[Dict[str, Any]],
+    temperature: float,
+    max_tokens: int,
+    system_instruction: str = ""
+) -> str:
+    """
+    Build a content-addressed key for an LLM request.
+
+    The key only depends on what the model sees and the generation settings
+    that shape its output, so byte-identical prompts share an entry no
+    matter which service built them. A response cut off at a small
+    `max_tokens` is never served to a call that allows more.
+    """
+    prompt_hash = hashlib.sha256(f"{system_instruction}\0{prompt}".encode("utf-8")).hexdigest()
+    schema_hash = schema_fingerprint(schema or {})
+    raw_key = f"{model_name}|{prompt_hash}|{schema_hash}|{temperature:.3f}|{max_tokens}"
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for LLM responses.
+
+    The first tier is a bounded in-process LRU with a TTL. The second tier
+    is the Mongo `llm_cache` collection, which is shared by all workers and
+    expired by a TTL index on `expires_at`.
+    """
+
+    collection_name = "llm_cache"
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: int = 3600,
+        use_mongo: bool = True
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_mongo = use_mongo
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._indexes_ready = False
+        self.stats = {
+            "memory_hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    @property
+    def collection(self):
+        db = MongoDB.get_db()
+        if db is None:
+            return None
+        return db[self.collection_name]
+
+    async def ensure_indexes(self) -> None:
+        """Create the TTL index that lets Mongo expire old entries."""
+        collection = self.collection if self.use_mongo else None
+        if collection is None or self._indexes_ready:
+            return
+        await collection.create_index("expires_at", expireAfterSeconds=0)
+        self._indexes_ready = True
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        # Callers own what they get back, so never hand out the cached object
+        return copy.deepcopy(value)
+
+    def _set_memory(self, key: str, value: Any) -> None:
+        # Nor keep one a caller still holds
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Look up a cached response, promoting Mongo hits into memory."""
+        value = self._get_memory(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+
+        collection = self.collection if self.use_mongo else None
+        if collection is not None:
+            try:
+                document = await collection.find_one({"_id": key})
+                # The TTL monitor only runs once a minute, so check expiry here too
+                if document and document["expires_at"] > datetime.utcnow():
+                    self.stats["mongo_hits"] += 1
+                    self._set_memory(key, document["value"])
+                    return document["value"]
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"LLM cache lookup failed: {str(e)}")
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, model_name: str = "") -> None:
+        """Store a response in both tiers."""
+        self._set_memory(key, value)
+        self.stats["stores"] += 1
+
+        collection = self.collection if self.use_mongo else None
+        if collection is None:
+            return
+        try:
+            await self.ensure_indexes()
+            now = datetime.utcnow()
+            await collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "value": value,
+                    "model_name": model_name,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"LLM cache store failed: {str(e)}")
+
+    def clear(self) -> None:
+        """Drop the in-process tier."""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["mongo_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._entries),
+        }
+
+
+@lru_cache()
+def get_response_cache() -> LLMResponseCache:
+    return LLMResponseCache(
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+        use_mongo=settings.LLM_CACHE_USE_MONGO
+    )
@@ -0,0 +1,211 @@
+import asyncio
+import time
+from collections import deque
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+
+class LLMPriority(IntEnum):
+    """Lower values are served first."""
+    INTERACTIVE = 0  # chat answers a child is waiting on
+    GENERATION = 1   # story and question generation
+    BACKGROUND = 2   # pre-generation nobody is waiting on yet
+
+
+class LLMRateLimitExceeded(Exception):
+    """Raised when the scheduler refuses to queue a request."""
+    pass
+
+
+class TokenBucket:
+    """A bucket that refills continuously up to `per_minute` units."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.available = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def refill(self, now: float) -> None:
+        if self.unlimited:
+            return
+        self.available = min(self.capacity, self.available + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def has(self, amount: float) -> bool:
+        return self.unlimited or self.available >= min(amount, self.capacity)
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.available -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        if not self.unlimited:
+            self.available = min(self.capacity, self.available + min(amount, self.capacity))
+
+    def seconds_until(self, amount: float) -> float:
+        if self.has(amount):
+            return 0.0
+        return (min(amount, self.capacity) - self.available) / self._rate
+
+
+class LLMScheduler:
+    """
+    Admit LLM calls against requests-per-minute and tokens-per-minute quotas.
+
+    Calls that fit in both buckets go straight through. Otherwise they wait
+    in a bounded queue per priority, and queues are drained strictly in
+    priority order as the buckets refill, so interactive chat is never
+    stuck behind bulk work. Background work is rejected outright when the
+    buckets are drained if `background_policy` is "reject", and queued
+    behind everything else if it is "defer".
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        max_queue_size: int = 100,
+        background_policy: str = "defer"
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue_size = max_queue_size
+        self.background_policy = background_policy
+        self._queues: Dict[LLMPriority, Deque[Tuple[int, asyncio.Future]]] = {
+            priority: deque() for priority in LLMPriority
+        }
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats: Dict[str, Dict[str, Any]] = {
+            priority.name.lower(): {
+                "admitted": 0,
+                "queued": 0,
+                "rejected": 0,
+                "total_queue_seconds": 0.0,
+                "max_queue_seconds": 0.0,
+            }
+            for priority in LLMPriority
+        }
+
+    def _bind_loop(self) -> None:
+        # Queued futures and timers belong to one loop; start clean on a new one
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._timer = None
+            for queue in self._queues.values():
+                queue.clear()
+
+    def _has_waiters(self) -> bool:
+        return any(self._queues.values())
+
+    def _try_take(self, tokens: int) -> bool:
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        if self.requests.has(1) and self.tokens.has(tokens):
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            return True
+        return False
+
+    def _schedule_dispatch(self, delay: float) -> None:
+        if self._timer is None:
+            self._timer = self._loop.call_later(delay, self._dispatch)
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        for priority in LLMPriority:
+            queue = self._queues[priority]
+            while queue:
+                tokens, future = queue[0]
+                if future.done():
+                    queue.popleft()
+                    continue
+                if not self._try_take(tokens):
+                    delay = max(self.requests.seconds_until(1), self.tokens.seconds_until(tokens))
+                    self._schedule_dispatch(max(delay, 0.01))
+                    return
+                queue.popleft()
+                future.set_result(None)
+
+    async def acquire(self, priority: LLMPriority, tokens: int) -> float:
+        """
+        Wait until a call of `tokens` estimated tokens may be sent.
+
+        Returns:
+            Seconds spent queued
+
+        Raises:
+            LLMRateLimitExceeded: If the queue for `priority` is full, or the
+                call is background work and the policy is to reject it.
+        """
+        self._bind_loop()
+        stats = self.stats[priority.name.lower()]
+
+        # Only skip the queue when nobody is already waiting for quota
+        if not self._has_waiters() and self._try_take(tokens):
+            stats["admitted"] += 1
+            return 0.0
+
+        if priority == LLMPriority.BACKGROUND and self.background_policy == "reject":
+            stats["rejected"] += 1
+            raise LLMRateLimitExceeded("LLM quota is drained; background work rejected")
+        queue = self._queues[priority]
+        if len(queue) >= self.max_queue_size:
+            stats["rejected"] += 1
+            raise LLMRateLimitExceeded(f"LLM {priority.name.lower()} queue is full")
+
+        future = self._loop.create_future()
+        entry = (tokens, future)
+        queue.append(entry)
+        stats["queued"] += 1
+        self._schedule_dispatch(0)
+
+        enqueued_at = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if entry in queue:
+                queue.remove(entry)
+            elif future.done() and not future.cancelled():
+                # Quota was granted but the caller left, so return it
+                self.requests.give_back(1)
+                self.tokens.give_back(tokens)
+            raise
+
+        waited = time.monotonic() - enqueued_at
+        stats["admitted"] += 1
+        stats["total_queue_seconds"] += waited
+        stats["max_queue_seconds"] = max(stats["max_queue_seconds"], waited)
+        return waited
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests_available": None if self.requests.unlimited else self.requests.available,
+            "tokens_available": None if self.tokens.unlimited else self.tokens.available,
+            "queue_depth": {
+                priority.name.lower(): len(queue) for priority, queue in self._queues.items()
+            },
+            "priorities": self.stats,
+        }
+
+
+@lru_cache()
+def get_scheduler() -> LLMScheduler:
+    return LLMScheduler(
+        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+        max_queue_size=settings.LLM_SCHEDULER_MAX_QUEUE_SIZE,
+        background_policy=settings.LLM_BACKGROUND_POLICY
+    )
@@ -0,0 +1,89 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Type
+
+from jsonschema.protocols import Validator
+from jsonschema.validators import validator_for
+from pydantic import BaseModel, create_model
+
+
+def schema_fingerprint(schema: Dict[str, Any]) -> str:
+    """Stable hash of a JSON schema, independent of key order."""
+    return hashlib.sha256(
+        json.dumps(schema, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+@dataclass(frozen=True)
+class CompiledSchema:
+    fingerprint: str
+    model: Type[BaseModel]
+    validator: Validator
+
+
+class SchemaRegistry:
+    """
+    Compile each response schema once and reuse it.
+
+    A compiled schema holds a Pydantic model that mirrors the schema
+    (including nested objects inside arrays) and a jsonschema validator
+    whose schema has already been checked.
+    """
+
+    def __init__(self):
+        self._compiled: Dict[str, CompiledSchema] = {}
+
+    def get(self, schema: Dict[str, Any]) -> CompiledSchema:
+        fingerprint = schema_fingerprint(schema)
+        compiled = self._compiled.get(fingerprint)
+        if compiled is None:
+            compiled = self._compile(schema, fingerprint)
+            self._compiled[fingerprint] = compiled
+        return compiled
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+    def _compile(self, schema: Dict[str, Any], fingerprint: str) -> CompiledSchema:
+        if not isinstance(schema, dict) or "properties" not in schema:
+            raise ValueError("Invalid schema format")
+
+        validator_class = validator_for(schema)
+        validator_class.check_schema(schema)
+        return CompiledSchema(
+            fingerprint=fingerprint,
+            model=self._build_model("DynamicModel", schema),
+            validator=validator_class(schema)
+        )
+
+    def _build_model(self, name: str, schema: Dict[str, Any]) -> Type[BaseModel]:
+        """Create a Pydantic model from an object schema."""
+        required = set(schema.get("required", []))
+        fields = {}
+        for field_name, field_schema in schema.get("properties", {}).items():
+            field_type = self._field_type(f"{name}_{field_name}", field_schema)
+            fields[field_name] = (field_type, ... if field_name in required else None)
+        return create_model(name, **fields)
+
+    def _field_type(self, name: str, field_schema: Dict[str, Any]) -> Any:
+        schema_type = field_schema.get("type")
+        if schema_type == "integer":
+            return int
+        if schema_type == "number":
+            return float
+        if schema_type == "boolean":
+            return bool
+        if schema_type == "array":
+            return List[self._field_type(f"{name}_item", field_schema.get("items", {}))]
+        if schema_type == "object" and "properties" in field_schema:
+            return self._build_model(name, field_schema)
+        if schema_type == "object":
+            return Dict[str, Any]
+        return str  # Default to string
+
+
+@lru_cache()
+def get_schema_registry() -> SchemaRegistry:
+    return SchemaRegistry()
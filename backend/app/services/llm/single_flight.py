@@ -0,0 +1,62 @@
+import asyncio
+import copy
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight calls into one.
+
+    The first caller for a key starts the work; callers that arrive while
+    it is running await the same task. Every caller gets the result, or
+    the same exception. A caller that is cancelled simply stops waiting;
+    the shared work is only cancelled once nobody is waiting for it.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "cancelled": 0}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+                self.stats["cancelled"] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+        # Followers get their own copy so nobody mutates a shared result
+        return result if leader else copy.deepcopy(result)
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "in_flight": len(self._flights)}
+
+
+@lru_cache()
+def get_single_flight() -> SingleFlight:
+    return SingleFlight()
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from app.config.settings import get_settings
+from app.models.story.story import Story
+from app.repositories.story_variant_repository import StoryVariantRepository
+from app.services.llm.circuit_breaker import LLMUnavailable
+from app.services.llm.scheduler import LLMPriority, LLMRateLimitExceeded
+from app.services.story_generation.story_service import StoryService
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+NEGATIVE_EMOTIONS = ("sad", "fear", "angry")
+
+# The emotion each precomputed variant is written for
+VARIANT_EMOTIONS = {
+    "uplifting": "sad",  # served for any negative emotion
+    "positive": "happy",  # served for any other emotion
+}
+
+
+def variant_for(emotion: str) -> str:
+    """The kind of variant that answers an emotion."""
+    return "uplifting" if emotion.lower() in NEGATIVE_EMOTIONS else "positive"
+
+
+def emotion_prompt(emotion: str) -> str:
+    """Instructions for rewriting a story for a child who feels `emotion`."""
+    if emotion.lower() in NEGATIVE_EMOTIONS:
+        return f"""The child is feeling {emotion}. Please regenerate this story to be more positive and uplifting,
+            focusing on themes of hope, courage, and happiness. Make sure to:
+            - Include positive outcomes and solutions
+            - Add elements of joy and comfort
+            - Maintain the educational value
+            - Keep the story engaging and fun
+            - Use encouraging and supportive language"""
+    return f"""The child is feeling {emotion}. Please enhance this story to maintain and amplify these positive emotions,
+            focusing on themes of joy, friendship, and adventure. Make sure to:
+            - Keep the positive and happy elements
+            - Add more fun and engaging moments
+            - Maintain the educational value
+            - Keep the story uplifting
+            - Use cheerful and enthusiastic language"""
+
+
+class EmotionVariants:
+    """
+    Rewrite stories for a child's emotion ahead of time.
+
+    When a story is stored for a child who used the emotion feature in the
+    last `active_seconds`, background workers generate an uplifting variant
+    (for sad, fear and angry) and an amplified-positive one (for anything
+    else) at BACKGROUND priority and store them beside the story. Children
+    who never tap an emotion cost nothing extra.
+
+    `apply` swaps in the matching variant when there is one, and otherwise
+    regenerates the story live as before.
+    """
+
+    def __init__(
+        self,
+        story_service: StoryService,
+        variant_repository: Optional[StoryVariantRepository] = None,
+        workers: int = settings.EMOTION_VARIANTS_WORKERS,
+        active_seconds: int = settings.EMOTION_VARIANTS_ACTIVE_SECONDS,
+        max_pending: int = settings.EMOTION_VARIANTS_MAX_PENDING
+    ):
+        self.story_service = story_service
+        self.variant_repository = variant_repository or StoryVariantRepository()
+        self.workers = workers
+        self.active_seconds = active_seconds
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {
+            "hits": 0, "misses": 0, "scheduled": 0, "dropped": 0,
+            "skipped_inactive": 0, "generated": 0, "failures": 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Start the precomputation workers on the running event loop."""
+        if self.running or self.workers <= 0:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self) -> None:
+        """Wait until every scheduled precomputation has finished."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def schedule(self, child_id: str, story_id: str) -> None:
+        """Precompute a new story's variants, if the child uses the emotion feature."""
+        if not self.running:
+            return
+        try:
+            self._queue.put_nowait((child_id, story_id))
+            self.stats["scheduled"] += 1
+        except asyncio.QueueFull:
+            # Live regeneration still works; variants are only a speed-up
+            self.stats["dropped"] += 1
+
+    async def apply(self, story: Story, emotion: str) -> Story:
+        """
+        Replace the story with its version for the child's emotion.
+
+        Raises:
+            ValueError: If the new version could not be saved
+        """
+        child_id = story.child_id
+        await self.variant_repository.record_use(child_id)
+        entry = await self.variant_repository.pop(story.story_id, variant_for(emotion))
+        if entry is not None:
+            self.stats["hits"] += 1
+            child_settings, _ = await self.story_service.load_story_context(child_id)
+            new_story = await self.story_service.store_story(
+                child_id, child_settings, entry["story_data"], precompute_variants=False
+            )
+        else:
+            self.stats["misses"] += 1
+            new_story = await self.story_service.generate_personalized_story(
+                child_id,
+                parent_comment=emotion_prompt(emotion),
+                original_story=story
+            )
+
+        updated_story = await self.story_service.story_repository.update_story(story.story_id, new_story)
+        if not updated_story:
+            raise ValueError("Failed to update story")
+        # The old story's other variant no longer applies; the child may tap again on the new one
+        await self.variant_repository.delete_for_story(story.story_id)
+        self.schedule(child_id, updated_story.story_id)
+        return updated_story
+
+    async def _worker(self) -> None:
+        while True:
+            child_id, story_id = await self._queue.get()
+            try:
+                await self._precompute(child_id, story_id)
+            except asyncio.CancelledError:
+                raise
+            except (LLMUnavailable, LLMRateLimitExceeded) as e:
+                # Live requests need the model more; a tap falls back to live generation
+                self.stats["failures"] += 1
+                logger.info("Emotion variants for story %s postponed: %s", story_id, e)
+            except Exception as e:
+                self.stats["failures"] += 1
+                logger.error("Emotion variants for story %s failed: %s", story_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _precompute(self, child_id: str, story_id: str) -> None:
+        if not await self.variant_repository.is_active_user(child_id, self.active_seconds):
+            self.stats["skipped_inactive"] += 1
+            return
+        story = await self.story_service.story_repository.get_story(story_id)
+        if story is None:
+            return
+        child_settings, child_name = await self.story_service.load_story_context(child_id)
+        for variant, emotion in VARIANT_EMOTIONS.items():
+            if await self.variant_repository.exists(story_id, variant):
+                continue
+            system_instruction, prompt, story_schema = self.story_service.build_story_request(
+                child_settings, child_name, emotion_prompt(emotion), story
+            )
+            story_data = await self.story_service.llm_service.generate_json_content(
+                prompt=prompt,
+                json_schema=story_schema,
+                system_instruction=system_instruction,
+                bypass_cache=True,
+                coalesce=False,
+                priority=LLMPriority.BACKGROUND,
+                caller="emotion_variant"
+            )
+            await self.variant_repository.add(story_id, child_id, variant, story_data)
+            self.stats["generated"] += 1
+
+    def get_stats(self) -> Dict:
+        served = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / served if served else None,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Any, Awaitable, Dict, List, Tuple
+
+from app.services.llm.metrics import LATENCY_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+
+async def gather_or_cancel(*awaitables: Awaitable) -> List[Any]:
+    """
+    Run independent branches concurrently and return their results in order.
+
+    Unlike asyncio.gather, the first branch to fail cancels the others, and
+    they have finished unwinding by the time its error is raised. If the
+    caller is cancelled, every branch is cancelled with it.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in tasks:
+            if task in done and not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+    finally:
+        unfinished = [task for task in tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+
+class PipelineRun:
+    """When each stage of one pipeline run started and ended, relative to the run's start."""
+
+    def __init__(self, name: str, metrics: "PipelineMetrics"):
+        self.name = name
+        self.metrics = metrics
+        self.started = time.perf_counter()
+        self.stages: Dict[str, Tuple[float, float]] = {}
+
+    async def stage(self, name: str, awaitable: Awaitable) -> Any:
+        """Await one stage and record its timing, whether it succeeds or not."""
+        start = time.perf_counter() - self.started
+        try:
+            return await awaitable
+        finally:
+            self.stages[name] = (start, time.perf_counter() - self.started)
+
+    def critical_path(self) -> List[str]:
+        """
+        The chain of stages that decided the run's duration: starting from
+        the stage that ended last, each step goes back to the stage that
+        ended last before it started.
+        """
+        path: List[str] = []
+        remaining = dict(self.stages)
+        cutoff = float("inf")
+        while True:
+            candidates = [(end, name) for name, (start, end) in remaining.items() if end <= cutoff]
+            if not candidates:
+                break
+            _, name = max(candidates)
+            path.append(name)
+            cutoff = remaining.pop(name)[0]
+        return path[::-1]
+
+    def finish(self, outcome: str = "success") -> None:
+        self.metrics.record(self, outcome)
+
+
+class PipelineMetrics:
+    """Per-stage latency histograms and critical paths of multi-stage pipelines."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Histogram]] = defaultdict(dict)
+        self.totals: Dict[str, Histogram] = {}
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+        self.critical_paths: Dict[str, Counter] = defaultdict(Counter)
+
+    def run(self, name: str) -> PipelineRun:
+        return PipelineRun(name, self)
+
+    def record(self, run: PipelineRun, outcome: str) -> None:
+        for stage, (start, end) in run.stages.items():
+            histogram = self.stages[run.name].get(stage)
+            if histogram is None:
+                histogram = self.stages[run.name][stage] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(end - start)
+        if run.name not in self.totals:
+            self.totals[run.name] = Histogram(LATENCY_BUCKETS)
+        total = time.perf_counter() - run.started
+        self.totals[run.name].observe(total)
+        self.outcomes[run.name][outcome] += 1
+        path = run.critical_path()
+        self.critical_paths[run.name][" > ".join(path)] += 1
+        logger.debug(
+            "Pipeline %s %s in %.3fs, critical path %s, stages %s",
+            run.name, outcome, total, path, run.stages
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "total_seconds": self.totals[name].to_dict(),
+                "stages_seconds": {stage: histogram.to_dict() for stage, histogram in self.stages[name].items()},
+                "outcomes": dict(self.outcomes[name]),
+                "critical_paths": dict(self.critical_paths[name].most_common(5)),
+            }
+            for name in self.totals
+        }
+
+
+@lru_cache()
+def get_pipeline_metrics() -> PipelineMetrics:
+    return PipelineMetrics()
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional
+from uuid import uuid4
+
+from app.config.settings import get_settings
+from app.models.enums import JobKind
+from app.models.job import Job
+from app.models.story.story import StoryResponse
+from app.repositories.job_repository import JobRepository
+from app.services.llm.circuit_breaker import LLMUnavailable
+from app.services.llm.scheduler import LLMRateLimitExceeded
+from app.services.story_generation.story_service import StoryService
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Failures worth another attempt; anything raised as ValueError is a bad request
+RETRYABLE_ERRORS = (LLMUnavailable, LLMRateLimitExceeded)
+
+
+class StoryJobRunner:
+    """
+    Run story generations and regenerations as durable background jobs.
+
+    Jobs live in the `jobs` collection, so they outlive the request that
+    submitted them and the worker process that runs them. A worker leases a
+    job and renews the lease while it runs; a job whose worker crashed is
+    claimed again once its lease runs out, up to `max_attempts` times.
+    A job can therefore run more than once, but only the worker holding the
+    lease can record its result.
+
+    `watch` and `wait` follow a job until it finishes. Jobs finished by this
+    process wake their watchers at once; others are seen by polling every
+    `poll_seconds`.
+    """
+
+    def __init__(
+        self,
+        story_service: StoryService,
+        job_repository: Optional[JobRepository] = None,
+        concurrency: int = settings.STORY_JOB_CONCURRENCY,
+        lease_seconds: float = settings.STORY_JOB_LEASE_SECONDS,
+        poll_seconds: float = settings.STORY_JOB_POLL_SECONDS,
+        max_attempts: int = settings.STORY_JOB_MAX_ATTEMPTS
+    ):
+        self.story_service = story_service
+        self.job_repository = job_repository or JobRepository()
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._updates: Dict[str, asyncio.Event] = {}  # job_id -> set when this process changes the job
+        self._running_jobs = 0
+        self.stats = {
+            "submitted": 0, "deduplicated": 0, "claimed": 0, "reclaimed": 0,
+            "succeeded": 0, "retried": 0, "failed": 0, "leases_lost": 0, "abandoned": 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Start the workers on the running event loop."""
+        if self.running or self.concurrency <= 0:
+            return
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """
+        Cancel the workers. Jobs they were running keep their leases and are
+        claimed again, here or elsewhere, once the leases run out.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self,
+        kind: JobKind,
+        child_id: str,
+        requested_by: str,
+        params: Optional[Dict] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Job:
+        """
+        Queue a job and return it. A retried request gets the job it already
+        created instead of a new one; see JobRepository.create.
+        """
+        job = Job(
+            kind=kind,
+            child_id=child_id,
+            requested_by=requested_by,
+            params=params or {},
+            idempotency_key=idempotency_key
+        )
+        stored = await self.job_repository.create(job)
+        if stored.job_id != job.job_id:
+            self.stats["deduplicated"] += 1
+            return stored
+        self.stats["submitted"] += 1
+        if self._wake is not None:
+            self._wake.set()
+        return stored
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.job_repository.get(job_id)
+
+    async def watch(self, job_id: str) -> AsyncIterator[Job]:
+        """Yield the job each time its status changes, ending once it has finished."""
+        last_seen = None
+        try:
+            while True:
+                updated = self._updates.setdefault(job_id, asyncio.Event())
+                updated.clear()
+                job = await self.job_repository.get(job_id)
+                if job is None:
+                    return
+                if (job.status, job.attempts) != last_seen:
+                    last_seen = (job.status, job.attempts)
+                    yield job
+                if job.finished:
+                    return
+                try:
+                    await asyncio.wait_for(updated.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Other watchers of the job fall back to polling
+            self._updates.pop(job_id, None)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Return the job once it has finished, or as it is after `timeout` seconds."""
+        job = None
+
+        async def follow():
+            nonlocal job
+            async for job in self.watch(job_id):
+                pass
+
+        try:
+            await asyncio.wait_for(follow(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job if job is not None and job.finished else await self.job_repository.get(job_id)
+
+    def _notify(self, job_id: str) -> None:
+        updated = self._updates.pop(job_id, None)
+        if updated is not None:
+            updated.set()
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await self.job_repository.claim(self.worker_id, self.lease_seconds, self.max_attempts)
+                if job is None:
+                    self.stats["abandoned"] += await self.job_repository.fail_abandoned(self.max_attempts)
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Story job worker %s could not claim a job: %s", self.worker_id, e)
+                await asyncio.sleep(self.poll_seconds)
+                continue
+
+            self.stats["claimed"] += 1
+            if job.attempts > 1:
+                self.stats["reclaimed"] += 1
+            self._notify(job.job_id)
+            self._running_jobs += 1
+            try:
+                await self._run_leased(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The lease runs out and another worker picks the job up
+                logger.error("Story job worker %s failed on job %s: %s", self.worker_id, job.job_id, e)
+            finally:
+                self._running_jobs -= 1
+                self._notify(job.job_id)
+
+    async def _run_leased(self, job: Job) -> None:
+        """Run a claimed job while renewing its lease; give it up if the lease is lost."""
+        run = asyncio.create_task(self._run(job))
+        lease_lost = False
+        try:
+            while not run.done():
+                done, _ = await asyncio.wait([run], timeout=self.lease_seconds / 3)
+                if done:
+                    break
+                if not await self.job_repository.renew_lease(job.job_id, self.worker_id, self.lease_seconds):
+                    lease_lost = True
+                    run.cancel()
+                    break
+        finally:
+            if not run.done():
+                run.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+
+        if lease_lost or run.cancelled():
+            self.stats["leases_lost"] += 1
+            logger.warning("Lost the lease on job %s, leaving it to its new owner", job.job_id)
+            return
+
+        error = run.exception()
+        if error is None:
+            if await self.job_repository.complete(job.job_id, self.worker_id, run.result()):
+                self.stats["succeeded"] += 1
+            else:
+                self.stats["leases_lost"] += 1
+            return
+
+        if isinstance(error, RETRYABLE_ERRORS) and job.attempts < self.max_attempts:
+            # Back off exponentially, so a struggling model is not hit again at once
+            retry_at = datetime.utcnow() + timedelta(seconds=self.poll_seconds * 2 ** job.attempts)
+            await self.job_repository.fail(job.job_id, self.worker_id, str(error), retry_at=retry_at)
+            self.stats["retried"] += 1
+            logger.info("Job %s attempt %d failed, retrying: %s", job.job_id, job.attempts, error)
+            return
+
+        await self.job_repository.fail(job.job_id, self.worker_id, str(error))
+        self.stats["failed"] += 1
+        logger.error("Job %s failed after %d attempts: %s", job.job_id, job.attempts, error)
+
+    async def _run(self, job: Job) -> Dict:
+        if job.kind == JobKind.REGENERATE:
+            story = await self.story_service.story_repository.get_story(job.params["story_id"])
+            if story is None or story.child_id != job.child_id:
+                raise ValueError("Story not found")
+            story = await self.story_service.regenerate_story(story, job.params["parent_comment"])
+        else:
+            # A job retries under its lease instead of succeeding with an old story
+            story = await self.story_service.generate_personalized_story(job.child_id, degrade=False)
+        return StoryResponse(
+            story_id=story.story_id,
+            title=story.title,
+            story_body=story.content,
+            image_url=story.image_url
+        ).model_dump()
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "worker_id": self.worker_id,
+            "workers": len(self._tasks),
+            "running_jobs": self._running_jobs,
+        }
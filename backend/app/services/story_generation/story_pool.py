@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from app.config.settings import get_settings
+from app.models.story.story import Story
+from app.repositories.story_pool_repository import StoryPoolRepository
+from app.services.llm.circuit_breaker import LLMUnavailable
+from app.services.llm.metrics import LATENCY_BUCKETS, Histogram
+from app.services.llm.scheduler import LLMPriority, LLMRateLimitExceeded
+from app.services.story_generation.story_service import StoryService
+from app.services.story_generation.story_templates import story_request_fingerprint
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Refilling a pool takes several model calls, so lag has a longer tail than one call
+REFILL_LAG_BUCKETS = LATENCY_BUCKETS + (120.0, 300.0, 600.0)
+
+
+class StoryPool:
+    """
+    Keep `size` ready-but-unserved stories per active child.
+
+    A child becomes active by asking for a story: `take` pops a pooled story
+    built from the child's current settings, if there is one, and schedules
+    a refill either way. Background workers refill pools at BACKGROUND
+    priority, so live requests are always served first. Refills go through
+    StoryService.new_story_data, so children with identical settings share
+    story templates whether their stories come from the pool or not.
+
+    Entries are tagged with the fingerprint of the story request. A change
+    of settings, name or story rules changes the fingerprint, so stale
+    entries are never served; refills delete them, and
+    SettingsRepository.update deletes a child's pool when themes,
+    preferences or moral values change.
+    """
+
+    def __init__(
+        self,
+        story_service: StoryService,
+        pool_repository: Optional[StoryPoolRepository] = None,
+        size: int = settings.STORY_POOL_SIZE,
+        workers: int = settings.STORY_POOL_WORKERS
+    ):
+        self.story_service = story_service
+        self.pool_repository = pool_repository or StoryPoolRepository()
+        self.size = size
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Dict[str, float] = {}  # child_id -> when its refill was requested
+        self.refill_lag = Histogram(REFILL_LAG_BUCKETS)
+        self.stats = {"hits": 0, "misses": 0, "refills": 0, "generated": 0, "stale_deleted": 0, "refill_failures": 0}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Start the refill workers on the running event loop."""
+        if self.running or self.size <= 0:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the refill workers; pooled stories stay in the database."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._pending.clear()
+
+    async def join(self) -> None:
+        """Wait until every scheduled refill has finished."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _current_request(self, child_id: str):
+        child_settings, child_name = await self.story_service.load_story_context(child_id)
+        system_instruction, prompt, _ = self.story_service.build_story_request(child_settings, child_name)
+        return child_settings, child_name, story_request_fingerprint(system_instruction, prompt)
+
+    async def take(self, child_id: str) -> Optional[Story]:
+        """
+        Serve a pooled story for the child, or None if the pool is empty or
+        not running. Either way the child's pool is refilled in the background.
+        """
+        if not self.running:
+            return None
+        child_settings, _, fingerprint = await self._current_request(child_id)
+        entry = await self.pool_repository.pop(child_id, fingerprint)
+        self.request_refill(child_id)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return await self.story_service.store_story(child_id, child_settings, entry["story_data"])
+
+    def request_refill(self, child_id: str) -> None:
+        """Schedule a refill of the child's pool, unless one is already scheduled."""
+        if not self.running or child_id in self._pending:
+            return
+        self._pending[child_id] = time.monotonic()
+        self._queue.put_nowait(child_id)
+
+    async def _worker(self) -> None:
+        while True:
+            child_id = await self._queue.get()
+            try:
+                await self._refill(child_id)
+            except asyncio.CancelledError:
+                raise
+            except (LLMUnavailable, LLMRateLimitExceeded) as e:
+                # Live requests need the model more; the next take schedules another try
+                self.stats["refill_failures"] += 1
+                logger.info("Story pool refill for child %s postponed: %s", child_id, e)
+            except Exception as e:
+                self.stats["refill_failures"] += 1
+                logger.error("Story pool refill for child %s failed: %s", child_id, e)
+            finally:
+                self._pending.pop(child_id, None)
+                self._queue.task_done()
+
+    async def _refill(self, child_id: str) -> None:
+        requested_at = self._pending.get(child_id, time.monotonic())
+        child_settings, child_name, fingerprint = await self._current_request(child_id)
+        self.stats["stale_deleted"] += await self.pool_repository.delete_stale(child_id, fingerprint)
+
+        missing = self.size - await self.pool_repository.count(child_id, fingerprint)
+        if missing <= 0:
+            return
+        self.stats["refills"] += 1
+        for _ in range(missing):
+            # Claims a shared template the child has not read when there is one
+            story_data = await self.story_service.new_story_data(
+                child_id, child_settings, child_name, priority=LLMPriority.BACKGROUND, caller="story_pool"
+            )
+            await self.pool_repository.add(child_id, fingerprint, story_data)
+            self.stats["generated"] += 1
+        self.refill_lag.observe(time.monotonic() - requested_at)
+
+    def get_stats(self) -> Dict:
+        served = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / served if served else None,
+            "pending_refills": len(self._pending),
+            "refill_lag_seconds": self.refill_lag.to_dict(),
+        }
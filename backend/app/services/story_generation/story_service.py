@@ -1,28 +1,152 @@
+import asyncio
 import os
 import json
 import logging
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from app.models.story.story import Story, StoryResponse, VocabularyWord
-from app.utils.story_processing.pdf_processor import PDFProcessor
+from app.utils.story_processing.story_corpus import StoryCorpus, get_story_corpus
+from app.services.story_generation.pipeline import gather_or_cancel, get_pipeline_metrics
+from app.services.story_generation.story_templates import (
+    TEMPLATE_NAME, TEMPLATE_NAME_INSTRUCTION, StoryTemplates, story_request_fingerprint
+)
+from app.services.child_context import ChildContext, ChildContextCache, get_child_context_cache
 from app.services.llm.llm_service import LLMService
+from app.services.llm.json_stream import IncrementalJSONParser
+from app.core.logging_setup import LazyJSON
+from app.services.llm.circuit_breaker import LLMUnavailable
+from app.services.llm.scheduler import LLMPriority, LLMRateLimitExceeded
 from app.services.image.image_service import ImageService
 from app.repositories.story_repository import StoryRepository
 from app.db.mongo import MongoDB
 from datetime import datetime
 from app.services.vocabulary.vocabulary_service import VocabularyService
+from app.config.settings import get_settings
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
+# Static rules for personalized stories; the child's details go in the prompt
+STORY_SYSTEM_INSTRUCTION = """You are a children's story generator for young Ethiopian children. 
+Your task is to create simple stories between 50-100 words that incorporate Ethiopian culture and values.
+
+Follow these rules:
+1. Keep the story between 50-100 words
+2. Use simple English words and short sentences
+3. Include clear moral lessons from the child's moral values
+4. Make the story fun and engaging
+5. Use simple dialogue
+6. Focus on one main event or lesson
+7. Use words that a young child can understand
+8. Keep the story structure simple: beginning, middle, end
+9. Use repetition and simple patterns
+10. Include the child's name and favorite things naturally
+11. Incorporate Ethiopian cultural elements
+12. Include the child's themes
+13. Include the child's preferences
+
+IMPORTANT: Make sure to:
+- Keep the story between 50-100 words
+- Format the response as valid JSON
+- Close all JSON objects properly
+- Do not include any additional properties in the response
+- Ensure all required fields are present"""
+
+# Appended when the story and its vocabulary come from one call
+STORY_VOCABULARY_INSTRUCTION = """Also identify 5 key vocabulary words used in the story:
+1. Select words that are:
+   - Age-appropriate but slightly challenging (easy difficulty level)
+   - Important for language development
+   - Naturally occurring in the story
+   - Not too common or too rare
+2. For each word, provide:
+   - ONE clear synonym that is also age-appropriate
+   - A simple, child-friendly meaning
+   - THREE related words that are:
+     * Contextually relevant to the story
+     * NOT related to the main word or its meaning
+     * Age-appropriate"""
+
+STORY_VOCABULARY_SCHEMA = {
+    "type": "array",
+    "description": "Five key vocabulary words from the story",
+    "items": {
+        "type": "object",
+        "properties": {
+            "word": {
+                "type": "string",
+                "description": "The key vocabulary word"
+            },
+            "synonym": {
+                "type": "string",
+                "description": "One clear synonym that is age-appropriate"
+            },
+            "meaning": {
+                "type": "string",
+                "description": "A short, simple explanation of the word's meaning"
+            },
+            "related_words": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Three words that are contextually relevant to the story but NOT related to the main word"
+            }
+        }
+    }
+}
+
+# Fewer complete words than this and the vocabulary service is called instead
+MIN_STORY_VOCABULARY_WORDS = 3
+
+# Static rules for RAG stories; the child's details and examples go in the prompt
+RAG_STORY_SYSTEM_INSTRUCTION = """You are a children's story generator for young Ethiopian children (ages 4-8). Your task is to create simple stories between 50-100 words that incorporate Ethiopian culture, values, and vocabulary learning.
+
+Follow these rules:
+1. Keep the story between 50-100 words (not shorter, not longer)
+2. Use simple English words and short sentences
+3. Include clear moral lessons
+4. Make the story fun and engaging
+5. Use simple dialogue
+6. Focus on one main event or lesson
+7. Use words that a 4-8 year old can understand
+8. Keep the story structure simple: beginning, middle, end
+9. Use repetition and simple patterns
+10. Include the child's name and favorite things naturally
+11. Incorporate Ethiopian cultural elements (e.g., traditional foods, clothing, places, or customs)
+12. Include 3-5 key vocabulary words that are:
+    - Age-appropriate but slightly challenging
+    - Relevant to the story's context
+    - Not commonly used by young children
+    - Important for language development
+13. For each vocabulary word, provide:
+    - ONE clear synonym that is also age-appropriate
+    - THREE words that are:
+        * Contextually relevant to the story
+        * NOT related to the main word or its meaning
+        * Help build vocabulary in different directions
+        * Age-appropriate
+14. Make sure the vocabulary words are naturally integrated into the story
+15. Use Ethiopian names, places, and cultural references when appropriate"""
+
 class StoryService:
-    def __init__(self):
-        self.stories_dir = "stories"
-        self.pdf_processor = PDFProcessor(self.stories_dir)
-        self.llm_service = LLMService()
-        self.image_service = ImageService()
-        self.story_repository = StoryRepository()
-        self.vocabulary_service = VocabularyService()
+    def __init__(
+        self,
+        llm_service: Optional[LLMService] = None,
+        vocabulary_service: Optional[VocabularyService] = None,
+        image_service: Optional[ImageService] = None,
+        story_repository: Optional[StoryRepository] = None,
+        story_corpus: Optional[StoryCorpus] = None,
+        child_contexts: Optional[ChildContextCache] = None,
+        story_templates: Optional[StoryTemplates] = None
+    ):
+        self.story_corpus = story_corpus or get_story_corpus()
+        self.child_contexts = child_contexts or get_child_context_cache()
+        self.story_templates = story_templates or StoryTemplates()
+        self.llm_service = llm_service or LLMService()
+        self.image_service = image_service or ImageService()
+        self.story_repository = story_repository or StoryRepository()
+        self.vocabulary_service = vocabulary_service or VocabularyService(llm_service=self.llm_service)
+        self.emotion_variants = None  # EmotionVariants, attached by init_services
         self.db = MongoDB.get_db()
 
     async def retrieve_relevant_stories(
@@ -30,38 +154,26 @@ class StoryService:
         child_age: int,
         preferences: List[str],
         themes: List[str],
-        moral_values: List[str]
+        moral_values: List[str],
+        top_k: int = settings.STORY_RETRIEVAL_TOP_K
     ) -> List[Dict]:
-        """Retrieve relevant stories based on child's characteristics."""
+        """
+        Retrieve the corpus stories that best match the child's themes and
+        moral values (and their synonyms) and preferences, ranked by BM25.
+        The corpus carries no age information, so child_age does not affect
+        the ranking.
+        """
         try:
-            stories = self.pdf_processor.process_stories()
-            if not stories:
-                logger.info("No PDF stories found, using default template")
+            ranked = await self.story_corpus.search(themes + moral_values, k=top_k, extra_terms=preferences)
+            if not ranked:
+                logger.info("No matching PDF stories found, using default template")
                 return [{
                     'title': 'Default Story Template',
                     'content': 'Once upon a time, there was a brave child who went on an adventure.',
                     'relevance_score': 1
                 }]
-            
-            relevant_stories = []
-            for story in stories:
-                score = 0
-                if child_age >= 4 and child_age <= 8:
-                    score += 1
-                for theme in themes:
-                    if theme.lower() in story['content'].lower():
-                        score += 1
-                for value in moral_values:
-                    if value.lower() in story['content'].lower():
-                        score += 1
-                
-                if score > 0:
-                    relevant_stories.append({
-                        **story,
-                        'relevance_score': score
-                    })
-            
-            return sorted(relevant_stories, key=lambda x: x['relevance_score'], reverse=True)
+
+            return [{**story, 'relevance_score': score} for story, score in ranked]
         except Exception as e:
             logger.error(f"Error retrieving stories: {str(e)}")
             return [{
@@ -70,201 +182,480 @@ class StoryService:
                 'relevance_score': 1
             }]
 
-    async def generate_personalized_story(
+    async def load_story_context(self, child_id: str) -> Tuple[Dict, str]:
+        """Load the child's settings (created with defaults if needed) and display name."""
+        context = await self.child_contexts.get(child_id)
+        logger.debug("Using child name: %s", context.name)
+        return context.settings, context.name
+
+    def build_story_request(
         self,
-        child_id: str,
+        child_settings: Dict,
+        child_name: str,
         parent_comment: Optional[str] = None,
         original_story: Optional[Story] = None
-    ) -> Story:
-        """
-        Generate a personalized story for a child.
-        If parent_comment and original_story are provided, it will regenerate the story with the parent's feedback.
-        """
-        try:
-            # Get child's settings
-            child_settings = await self.db["settings"].find_one({
-                "child_id": child_id
-            })
-
-            # If settings don't exist, create default settings
-            if not child_settings:
-                logger.info(f"Creating default settings for child {child_id}")
-                default_settings = {
-                    "child_id": child_id,
-                    "age_range": "4-8",
-                    "themes": ["friendship", "adventure", "learning"],
-                    "moral_values": ["kindness", "courage", "honesty"],
-                    "preferences": ["animals", "nature", "games"]
-                }
-                try:
-                    await self.db["settings"].insert_one(default_settings)
-                    child_settings = default_settings
-                    logger.info(f"Default settings created for child {child_id}")
-                except Exception as e:
-                    logger.error(f"Failed to create default settings: {str(e)}")
-                    raise ValueError(f"Failed to create default settings: {str(e)}")
-
-            # Get child's info
-            child = await self.db["children"].find_one({
-                "child_id": child_id
-            })
-
-            if not child:
-                raise ValueError("Child not found")
-
-            # Get child's name from first_name and last_name
-            child_name = f"{child.get('first_name', '')} {child.get('last_name', '')}".strip()
-            if not child_name:
-                child_name = child.get('nickname', 'the child')
-            logger.info(f"Using child name: {child_name}")
-
-            # Define the JSON schema for the story response
-            story_schema = {
-                "$schema": "http://json-schema.org/draft-07/schema#",
-                "type": "object",
-                "properties": {
-                    "title": {
-                        "type": "string",
-                        "description": "The title of the story"
-                    },
-                    "content": {
-                        "type": "string",
-                        "description": "The main content of the story"
-                    },
-                    "image_url": {
-                        "type": "string",
-                        "description": "URL for the story's illustration (use an empty string if not available)"
-                    }
+    ) -> Tuple[str, str, Dict]:
+        """Build the system instruction, prompt and JSON schema for a personalized story."""
+        # Define the JSON schema for the story response
+        story_schema = {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "properties": {
+                "title": {
+                    "type": "string",
+                    "description": "The title of the story"
                 },
-                "required": ["title", "content"],
-                "additionalProperties": False
-            }
-
-            # Create system instruction
-            system_instruction = f"""You are a children's story generator for young Ethiopian children. 
-Your task is to create simple stories between 50-100 words that incorporate Ethiopian culture and values.
-
-Follow these rules:
-1. Keep the story between 50-100 words
-2. Use simple English words and short sentences
-3. Include clear moral lessons: {', '.join(child_settings.get('moral_values', []))}
-4. Make the story fun and engaging
-5. Use simple dialogue
-6. Focus on one main event or lesson
-7. Use words that a young child can understand
-8. Keep the story structure simple: beginning, middle, end
-9. Use repetition and simple patterns
-10. Include the child's name ({child_name}) and favorite things naturally
-11. Incorporate Ethiopian cultural elements
-12. Include themes: {', '.join(child_settings.get('themes', []))}
-13. Include preferences: {', '.join(child_settings.get('preferences', []))}
-
-IMPORTANT: Make sure to:
-- Keep the story between 50-100 words
-- Format the response as valid JSON
-- Close all JSON objects properly
-- Do not include any additional properties in the response
-- Ensure all required fields are present"""
-
-            # Prepare the prompt based on whether this is a new story or an update
-            if parent_comment and original_story:
-                prompt = f"""Original story: {original_story.content}
+                "content": {
+                    "type": "string",
+                    "description": "The main content of the story"
+                },
+                "image_url": {
+                    "type": "string",
+                    "description": "URL for the story's illustration (use an empty string if not available)"
+                }
+            },
+            "required": ["title", "content"],
+            "additionalProperties": False
+        }
+        system_instruction = STORY_SYSTEM_INSTRUCTION
+        if settings.STORY_SINGLE_CALL_VOCABULARY:
+            # Not required: a missing or weak table falls back to the vocabulary service
+            story_schema["properties"]["vocabulary_words"] = STORY_VOCABULARY_SCHEMA
+            system_instruction = f"{STORY_SYSTEM_INSTRUCTION}\n\n{STORY_VOCABULARY_INSTRUCTION}"
+
+        child_details = f"""Child's name: {child_name}
+Age range: {child_settings.get('age_range', '4-8')}
+Moral values: {', '.join(child_settings.get('moral_values', []))}
+Themes: {', '.join(child_settings.get('themes', []))}
+Preferences: {', '.join(child_settings.get('preferences', []))}"""
+
+        # Prepare the prompt based on whether this is a new story or an update
+        if parent_comment and original_story:
+            prompt = f"""{child_details}
+
+Original story: {original_story.content}
 Parent's comment: {parent_comment}
 Please regenerate this story incorporating the parent's feedback while maintaining the same themes and moral values."""
-            else:
-                prompt = f"""Create a story (50-100 words) for {child_name} that is:
+        else:
+            prompt = f"""{child_details}
+
+Create a story (50-100 words) for {child_name} that is:
 - Simple and easy to understand
 - Uses short sentences and simple words
 - Includes {child_name}'s favorite things: {', '.join(child_settings.get('preferences', []))}
 - Teaches about: {', '.join(child_settings.get('moral_values', []))}
 - Incorporates Ethiopian cultural elements
-- Includes themes: {', '.join(child_settings.get('themes', []))}
+- Includes themes: {', '.join(child_settings.get('themes', []))}"""
 
-Remember to:
-- Keep the story between 50-100 words
-- Format the response as valid JSON
-- Close all JSON objects properly
-- Do not include any additional properties
-- Ensure all required fields are present"""
+        return system_instruction, prompt, story_schema
 
-            # Generate story using LLM
-            story_data = await self.llm_service.generate_json_content(
-                prompt=f"{system_instruction}\n\n{prompt}",
-                json_schema=story_schema
+    async def new_story_data(
+        self,
+        child_id: str,
+        child_settings: Dict,
+        child_name: str,
+        priority: LLMPriority = LLMPriority.GENERATION,
+        caller: str = "story"
+    ) -> Dict:
+        """
+        Generate the story data for a new story. With STORY_TEMPLATES_ENABLED
+        it is a copy of a story shared by children with the same settings.
+        """
+        if not settings.STORY_TEMPLATES_ENABLED:
+            system_instruction, prompt, story_schema = self.build_story_request(child_settings, child_name)
+            return await self.llm_service.generate_json_content(
+                prompt=prompt,
+                json_schema=story_schema,
+                system_instruction=system_instruction,
+                bypass_cache=True,  # every request should get a fresh story
+                coalesce=False,
+                priority=priority,
+                caller=caller
             )
 
-            # Create story object
-            story = Story(
-                title=story_data["title"],
-                content=story_data["content"],
-                age_range=child_settings.get("age_range", "4-8"),
-                themes=child_settings.get("themes", []),
-                moral_values=child_settings.get("moral_values", []),
-                image_url=story_data.get("image_url") or None,  # Set to None if not provided
-                child_id=child_id
+        system_instruction, prompt, story_schema = self.build_story_request(child_settings, TEMPLATE_NAME)
+        prompt = f"{prompt}\n\n{TEMPLATE_NAME_INSTRUCTION}"
+        return await self.story_templates.story_data_for(
+            child_id,
+            child_name,
+            story_request_fingerprint(system_instruction, prompt),
+            lambda: self.llm_service.generate_json_content(
+                prompt=prompt,
+                json_schema=story_schema,
+                system_instruction=system_instruction,
+                bypass_cache=True,  # a child's next template must be a different story
+                coalesce=False,
+                priority=priority,
+                caller=caller
             )
+        )
+
+    def _usable_vocabulary(self, vocabulary_words: Optional[List[Dict]]) -> Optional[List[Dict]]:
+        """Return the complete entries of a generated vocabulary table, or None if too few."""
+        usable = [
+            word for word in vocabulary_words or []
+            if word.get("word") and word.get("synonym") and word.get("meaning")
+            and isinstance(word.get("related_words"), list)
+        ]
+        return usable if len(usable) >= MIN_STORY_VOCABULARY_WORDS else None
+
+    def _precompute_variants(self, child_id: str, story_id: str) -> None:
+        if self.emotion_variants is not None:
+            self.emotion_variants.schedule(child_id, story_id)
+
+    async def store_story(
+        self,
+        child_id: str,
+        child_settings: Dict,
+        story_data: Dict,
+        precompute_variants: bool = True
+    ) -> Story:
+        """
+        Persist a generated story and its vocabulary words.
+        With `precompute_variants`, its emotion variants are prepared in the background.
+        """
+        story = self._new_story(child_id, child_settings, story_data)
+
+        # Store the story
+        stored_story = await self.story_repository.create_story(story)
+        if precompute_variants:
+            self._precompute_variants(child_id, stored_story.story_id)
+
+        # Use the vocabulary generated with the story when it is complete
+        vocabulary_words = self._usable_vocabulary(story_data.get("vocabulary_words"))
+        if vocabulary_words:
+            await self.vocabulary_service.store_vocabulary_words(
+                vocabulary_words,
+                child_id=child_id,
+                story_id=stored_story.story_id
+            )
+            return stored_story
 
-            # Store the story
-            stored_story = await self.story_repository.create_story(story)
-
-            # Generate vocabulary words for the story
+        await self._generate_story_vocabulary(stored_story, child_settings)
+        return stored_story
+
+    def _new_story(self, child_id: str, child_settings: Dict, story_data: Dict) -> Story:
+        return Story(
+            title=story_data["title"],
+            content=story_data["content"],
+            age_range=child_settings.get("age_range", "4-8"),
+            themes=child_settings.get("themes", []),
+            moral_values=child_settings.get("moral_values", []),
+            image_url=story_data.get("image_url") or None,  # Set to None if not provided
+            child_id=child_id
+        )
+
+    async def _generate_story_vocabulary(self, stored_story: Story, child_settings: Dict) -> None:
+        """Generate vocabulary for a stored story that came without usable words."""
+        child_id = stored_story.child_id
+        if settings.STORY_SINGLE_CALL_VOCABULARY:
+            logger.info("Story %s came without usable vocabulary, generating it separately", stored_story.story_id)
+        # Generate vocabulary words for the story
+        try:
             await self.vocabulary_service.generate_vocabulary_words(
-                text=story.content,
+                text=stored_story.content,
                 child_id=child_id,
                 story_id=stored_story.story_id,
                 age_range=child_settings.get("age_range", "4-8"),
                 difficulty_level="easy"  # You might want to adjust this based on child's level
             )
+        except LLMUnavailable as e:
+            # The story is already stored; it is still worth serving without vocabulary
+            logger.warning(f"Skipping vocabulary for story {stored_story.story_id}: {str(e)}")
 
-            return stored_story
+    async def _degraded_story(self, child_id: str, error: LLMUnavailable) -> Story:
+        """
+        Serve the child's latest stored story while no model is available.
+
+        Raises:
+            LLMUnavailable: If the child has no stored story yet
+        """
+        story = await self.story_repository.get_latest_story(child_id)
+        if story is None:
+            raise error
+        self.llm_service.circuit_breakers.record_degraded("story")
+        logger.warning(f"No model available, serving stored story {story.story_id} to child {child_id}")
+        return story
+
+    async def generate_personalized_story(
+        self,
+        child_id: str,
+        parent_comment: Optional[str] = None,
+        original_story: Optional[Story] = None,
+        degrade: bool = True
+    ) -> Story:
+        """
+        Generate a personalized story for a child.
+        If parent_comment and original_story are provided, it will regenerate the story with the parent's feedback.
+        With `degrade`, a new story falls back to the child's latest stored one while no model is available.
+        """
+        try:
+            child_settings, child_name = await self.load_story_context(child_id)
+            if parent_comment and original_story:
+                system_instruction, prompt, story_schema = self.build_story_request(
+                    child_settings, child_name, parent_comment, original_story
+                )
+
+                # Generate story using LLM
+                story_data = await self.llm_service.generate_json_content(
+                    prompt=prompt,
+                    json_schema=story_schema,
+                    system_instruction=system_instruction,
+                    bypass_cache=True,  # every request should get a fresh story
+                    coalesce=False,
+                    caller="story"
+                )
+            else:
+                story_data = await self.new_story_data(child_id, child_settings, child_name)
+
+            # A regeneration replaces a story whose variants are handled by the caller
+            return await self.store_story(
+                child_id, child_settings, story_data, precompute_variants=original_story is None
+            )
 
-        except ValueError as ve:
+        except LLMUnavailable as e:
+            if not degrade or parent_comment or original_story:
+                # A regeneration must not quietly hand back some other story
+                raise
+            return await self._degraded_story(child_id, e)
+        except (ValueError, LLMRateLimitExceeded) as ve:
             logger.error(f"Value error in story generation: {str(ve)}")
             raise
         except Exception as e:
             logger.error(f"Error in story generation: {str(e)}")
             raise ValueError(f"Failed to generate story: {str(e)}")
 
+    async def regenerate_story(self, story: Story, parent_comment: str) -> Story:
+        """
+        Rewrite a stored story with the parent's feedback and save it in its place.
+
+        Raises:
+            ValueError: If the rewritten story could not be saved
+        """
+        new_story = await self.generate_personalized_story(
+            story.child_id,
+            parent_comment=parent_comment,
+            original_story=story
+        )
+        updated_story = await self.story_repository.update_story(story.story_id, new_story)
+        if not updated_story:
+            raise ValueError("Failed to update story")
+        return updated_story
+
+    async def stream_personalized_story(self, child_id: str) -> AsyncIterator[Dict]:
+        """
+        Generate a personalized story, yielding events as the model writes it.
+
+        Events are dicts with an "event" key:
+        - title: the story title, as soon as it is complete
+        - token: the next piece of the story content
+        - done: the stored story, once it has been validated and saved
+        - error: generation failed; no further events follow
+
+        If the streamed response cannot be validated, the story is generated
+        again with the regular (retrying) call before "done" is sent. While no
+        model is available, "done" carries the child's latest stored story
+        and `"degraded": true`.
+        """
+        try:
+            child_settings, child_name = await self.load_story_context(child_id)
+            system_instruction, prompt, story_schema = self.build_story_request(child_settings, child_name)
+
+            parser = IncrementalJSONParser(stream_fields=["content"])
+            chunks: List[str] = []
+            async for chunk in self.llm_service.stream_json_content(
+                prompt,
+                story_schema,
+                caller="story",
+                system_instruction=system_instruction
+            ):
+                chunks.append(chunk)
+                for kind, field, value in parser.feed(chunk):
+                    if kind == "field" and field == "title":
+                        yield {"event": "title", "title": value}
+                    elif kind == "delta" and field == "content":
+                        yield {"event": "token", "text": value}
+
+            try:
+                story_data = self.llm_service.validate_json_response("".join(chunks), story_schema)
+            except ValueError as e:
+                logger.warning(f"Streamed story failed validation, regenerating: {str(e)}")
+                story_data = await self.llm_service.generate_json_content(
+                    prompt=prompt,
+                    json_schema=story_schema,
+                    bypass_cache=True,
+                    coalesce=False,
+                    caller="story",
+                    system_instruction=system_instruction
+                )
+
+            stored_story = await self.store_story(child_id, child_settings, story_data)
+            yield {
+                "event": "done",
+                "story_id": stored_story.story_id,
+                "title": stored_story.title,
+                "content": stored_story.content
+            }
+
+        except LLMUnavailable as e:
+            try:
+                stored_story = await self._degraded_story(child_id, e)
+            except LLMUnavailable:
+                yield {"event": "error", "status": 503, "detail": str(e)}
+                return
+            yield {
+                "event": "done",
+                "story_id": stored_story.story_id,
+                "title": stored_story.title,
+                "content": stored_story.content,
+                "degraded": True
+            }
+        except LLMRateLimitExceeded as e:
+            logger.error(f"Rate limited during story streaming: {str(e)}")
+            yield {"event": "error", "status": 429, "detail": str(e)}
+        except Exception as e:
+            logger.error(f"Error in story streaming: {str(e)}")
+            yield {"event": "error", "status": 500, "detail": f"Failed to generate story: {str(e)}"}
+
+    async def generate_stories_for_children(
+        self,
+        parent_id: str,
+        child_ids: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Generate a story for each of a parent's children (or the selected
+        ones) concurrently, yielding events as the stories finish.
+
+        Events are dicts with an "event" key:
+        - story: a child's stored story
+        - error: a child's story failed, with the status a single request would get
+        - done: every story has finished; counts of stored and failed stories
+
+        The children, settings and rewards are read with one `$in` query each,
+        and children with identical settings share one story template. Model
+        calls share the LLM scheduler's concurrency limit with all other
+        requests. Stories that finish together are written with one
+        `insert_many`, as are their vocabulary words. A story that came
+        without usable vocabulary is sent at once and its vocabulary is
+        generated alongside the rest of the batch, before "done".
+        """
+        contexts = await self.child_contexts.get_for_parent(parent_id, child_ids)
+        stored = failed = 0
+        for child_id in dict.fromkeys(child_ids or []):
+            if child_id not in contexts:
+                failed += 1
+                yield {"event": "error", "child_id": child_id, "status": 403,
+                       "detail": "Not authorized to access this child's information"}
+
+        tasks = {
+            asyncio.ensure_future(self.new_story_data(context.child_id, context.settings, context.name)): context
+            for context in contexts.values()
+        }
+        pending = set(tasks)
+        vocabulary_tasks: List[asyncio.Future] = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                finished: List[Tuple[Story, ChildContext, Optional[List[Dict]]]] = []
+                for task in done:
+                    context = tasks[task]
+                    try:
+                        story_data = task.result()
+                        story = self._new_story(context.child_id, context.settings, story_data)
+                    except Exception as e:
+                        failed += 1
+                        yield self._batch_error(context.child_id, e)
+                        continue
+                    finished.append((story, context, self._usable_vocabulary(story_data.get("vocabulary_words"))))
+
+                if not finished:
+                    continue
+                try:
+                    await self.story_repository.create_stories([story for story, _, _ in finished])
+                except Exception as e:
+                    for story, _, _ in finished:
+                        failed += 1
+                        yield self._batch_error(story.child_id, e)
+                    continue
+                try:
+                    await self.story_repository.create_vocabulary_words([
+                        VocabularyWord(
+                            word=word["word"],
+                            synonym=word["synonym"],
+                            meaning=word["meaning"],
+                            related_words=word["related_words"],
+                            story_id=story.story_id,
+                            child_id=story.child_id
+                        )
+                        for story, _, words in finished if words
+                        for word in words
+                    ])
+                except Exception as e:
+                    # The stories are stored; they are still worth serving without vocabulary
+                    logger.error("Failed to store batch vocabulary words: %s", e)
+                for story, context, words in finished:
+                    if not words:
+                        # Runs alongside the rest of the batch instead of holding back later children
+                        vocabulary_tasks.append(asyncio.ensure_future(
+                            self._generate_story_vocabulary(story, context.settings)
+                        ))
+                    self._precompute_variants(story.child_id, story.story_id)
+                    stored += 1
+                    yield {
+                        "event": "story",
+                        "child_id": story.child_id,
+                        "story_id": story.story_id,
+                        "title": story.title,
+                        "content": story.content
+                    }
+
+            for result in await asyncio.gather(*vocabulary_tasks, return_exceptions=True):
+                if isinstance(result, Exception):
+                    logger.error("Vocabulary for a batch story failed: %s", result)
+            yield {"event": "done", "stored": stored, "failed": failed}
+        finally:
+            # The client went away; do not spend model calls on a batch nobody receives
+            for task in pending | set(vocabulary_tasks):
+                task.cancel()
+
+    @staticmethod
+    def _batch_error(child_id: str, error: Exception) -> Dict:
+        """The error event for a child whose batch story failed, with the status a single request would get."""
+        logger.error("Batch story for child %s failed: %s", child_id, error)
+        if isinstance(error, LLMRateLimitExceeded):
+            status = 429
+        elif isinstance(error, LLMUnavailable):
+            status = 503
+        else:
+            status = 500
+        return {"event": "error", "child_id": child_id, "status": status, "detail": str(error)}
+
     async def generate_personalized_story_using_rag(
         self,
         child_id: str,
         parent_comment: Optional[str] = None,
         original_story: Optional[Story] = None
     ) -> Story:
-        """Generate a personalized story using RAG."""
+        """
+        Generate a personalized story using RAG.
+
+        Independent stages run concurrently: the child's settings, profile
+        and level are fetched together (or come from the child context
+        cache), and the vocabulary insert runs alongside the image generation
+        and story insert. The first branch to
+        fail cancels its siblings. Stage timings go to the "rag_story"
+        pipeline metrics.
+        """
+        run = get_pipeline_metrics().run("rag_story")
         try:
-            # Get child's settings
-            child_settings = await self.db["settings"].find_one({
-                "child_id": child_id
-            })
-
-            # If settings don't exist, create default settings
-            if not child_settings:
-                default_settings = {
-                    "child_id": child_id,
-                    "age_range": "4-8",
-                    "themes": ["friendship", "adventure", "learning"],
-                    "moral_values": ["kindness", "courage", "honesty"],
-                    "preferences": ["animals", "nature", "games"]
-                }
-                await self.db["settings"].insert_one(default_settings)
-                child_settings = default_settings
-
-            # Get child's info
-            child = await self.db["children"].find_one({
-                "child_id": child_id
-            })
-
-            if not child:
-                raise ValueError("Child not found")
-
+            child_settings, child_name = await run.stage("context", self.load_story_context(child_id))
             # Retrieve relevant stories
-            relevant_stories = await self.retrieve_relevant_stories(
+            relevant_stories = await run.stage("retrieval", self.retrieve_relevant_stories(
                 int(child_settings.get("age_range", "4-8").split("-")[0]),
                 child_settings.get("preferences", []),
                 child_settings.get("themes", []),
                 child_settings.get("moral_values", [])
-            )
+            ))
 
             # Define the JSON schema for the story response
             story_schema = {
@@ -308,47 +699,17 @@ Remember to:
                 "required": ["title", "story_body", "image_url", "vocabulary_table"]
             }
 
-            # Create system instruction
-            system_instruction = """You are a children's story generator for young Ethiopian children (ages 4-8). Your task is to create simple stories between 50-100 words that incorporate Ethiopian culture, values, and vocabulary learning.
-
-Follow these rules:
-1. Keep the story between 50-100 words (not shorter, not longer)
-2. Use simple English words and short sentences
-3. Include clear moral lessons
-4. Make the story fun and engaging
-5. Use simple dialogue
-6. Focus on one main event or lesson
-7. Use words that a 4-8 year old can understand
-8. Keep the story structure simple: beginning, middle, end
-9. Use repetition and simple patterns
-10. Include the child's name and favorite things naturally
-11. Incorporate Ethiopian cultural elements (e.g., traditional foods, clothing, places, or customs)
-12. Include 3-5 key vocabulary words that are:
-    - Age-appropriate but slightly challenging
-    - Relevant to the story's context
-    - Not commonly used by young children
-    - Important for language development
-13. For each vocabulary word, provide:
-    - ONE clear synonym that is also age-appropriate
-    - THREE words that are:
-        * Contextually relevant to the story
-        * NOT related to the main word or its meaning
-        * Help build vocabulary in different directions
-        * Age-appropriate
-14. Make sure the vocabulary words are naturally integrated into the story
-15. Use Ethiopian names, places, and cultural references when appropriate"""
-
             # Prepare the prompt based on whether this is a new story or an update
             if parent_comment and original_story:
                 prompt = f"""Original story: {original_story.content}
 Parent's comment: {parent_comment}
 Please regenerate this story incorporating the parent's feedback while maintaining the same themes and moral values."""
             else:
-                prompt = f"""Create a story (50-100 words) for a {child_settings.get('age_range', '4-8')}-year-old Ethiopian child named {child['name']}.
+                prompt = f"""Create a story (50-100 words) for a {child_settings.get('age_range', '4-8')}-year-old Ethiopian child named {child_name}.
 The story should be:
 - Simple and easy to understand
 - Use short sentences and simple words
-- Include {child['name']}'s favorite things: {', '.join(child_settings.get('preferences', []))}
+- Include {child_name}'s favorite things: {', '.join(child_settings.get('preferences', []))}
 - Teach about: {', '.join(child_settings.get('moral_values', []))}
 - Incorporate Ethiopian cultural elements
 - Include 3-5 key vocabulary words in a table format with:
@@ -362,48 +723,56 @@ EXAMPLE STORIES FOR REFERENCE:
 
             try:
                 # Generate the story using the new structured output method
-                story_data = await self.llm_service.generate_json_content(
-                    prompt=f"{system_instruction}\n\n{prompt}",
-                    json_schema=story_schema
-                )
+                story_data = await run.stage("story", self.llm_service.generate_json_content(
+                    prompt=prompt,
+                    json_schema=story_schema,
+                    system_instruction=RAG_STORY_SYSTEM_INSTRUCTION,
+                    bypass_cache=True,
+                    coalesce=False,
+                    caller="rag_story"
+                ))
                 
-                logger.info(f"Generated story data: {story_data}")
+                logger.debug("Generated story data: %s", LazyJSON(story_data))
 
                 # Validate story length
                 word_count = len(story_data.get("story_body", "").split())
                 if word_count < 50 or word_count > 100:
                     logger.warning(f"Story length ({word_count} words) is not within 50-100 words, generating a new version")
                     # Generate a new version with specific length requirements
-                    story_data = await self.llm_service.generate_json_content(
-                        prompt=f"{system_instruction}\nIMPORTANT: The story MUST be between 50-100 words. Current length: {word_count} words.\n\n{prompt}",
-                        json_schema=story_schema
-                    )
-
-                # Generate image for the story
-                image_url = await self.image_service.generate_story_image({
-                    "child_name": child["name"],
-                    "age": int(child_settings.get("age_range", "4-8").split("-")[0]),
-                    "preferences": child_settings.get("preferences", []),
-                    "themes": child_settings.get("themes", []),
-                    "moral_values": child_settings.get("moral_values", []),
-                    "story_title": story_data.get("title", "Untitled"),
-                    "story_summary": story_data.get("story_body", "")[:200]  # Send first 200 chars as summary
-                })
-
-                # Create story object
+                    story_data = await run.stage("story_retry", self.llm_service.generate_json_content(
+                        prompt=f"IMPORTANT: The story MUST be between 50-100 words. Current length: {word_count} words.\n\n{prompt}",
+                        json_schema=story_schema,
+                        system_instruction=RAG_STORY_SYSTEM_INSTRUCTION,
+                        bypass_cache=True,
+                        coalesce=False,
+                        caller="rag_story"
+                    ))
+
+                # Create story object; its id is known before it is stored
                 story = Story(
                     title=story_data.get("title", "Untitled"),
                     content=story_data.get("story_body", ""),
                     age_range=child_settings.get("age_range", "4-8"),
                     themes=child_settings.get("themes", []),
                     moral_values=child_settings.get("moral_values", []),
-                    image_url=image_url or None,  # Set to None if not provided
                     child_id=child_id
                 )
 
-                # Store the story
-                stored_story = await self.story_repository.create_story(story)
-
+                async def illustrate_and_store():
+                    # Generate image for the story
+                    image_url = await run.stage("image", self.image_service.generate_story_image({
+                        "child_name": child_name,
+                        "age": int(child_settings.get("age_range", "4-8").split("-")[0]),
+                        "preferences": child_settings.get("preferences", []),
+                        "themes": child_settings.get("themes", []),
+                        "moral_values": child_settings.get("moral_values", []),
+                        "story_title": story.title,
+                        "story_summary": story.content[:200]  # Send first 200 chars as summary
+                    }))
+                    story.image_url = image_url or None  # Set to None if not provided
+                    return await run.stage("store_story", self.story_repository.create_story(story))
+
+                branches = [illustrate_and_store()]
                 # Store vocabulary words if present in the response
                 if "vocabulary_table" in story_data:
                     vocabulary_words = [
@@ -412,13 +781,26 @@ EXAMPLE STORIES FOR REFERENCE:
                             synonym=vocab["synonym"],
                             meaning=vocab.get("meaning", ""),  # Handle optional meaning field
                             related_words=vocab["related_words"],
-                            story_id=stored_story.story_id,
+                            story_id=story.story_id,
                             child_id=child_id
                         )
                         for vocab in story_data["vocabulary_table"]
                     ]
-                    await self.story_repository.create_vocabulary_words(vocabulary_words)
+                    branches.append(run.stage(
+                        "store_vocabulary",
+                        self.story_repository.create_vocabulary_words(vocabulary_words)
+                    ))
 
+                try:
+                    stored_story, *_ = await gather_or_cancel(*branches)
+                except BaseException:
+                    # Do not leave half a story behind
+                    await asyncio.shield(self.story_repository.delete_story_with_vocabulary(story.story_id))
+                    raise
+
+                run.finish()
+                if original_story is None:
+                    self._precompute_variants(child_id, stored_story.story_id)
                 return stored_story
 
             except ValueError as ve:
@@ -429,5 +811,6 @@ EXAMPLE STORIES FOR REFERENCE:
                 raise
 
         except Exception as e:
+            run.finish("error")
             logger.error(f"Error in story generation: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
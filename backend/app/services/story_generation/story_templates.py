@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.repositories.story_template_repository import StoryTemplateRepository
+
+logger = logging.getLogger(__name__)
+
+# Stands in for the child's name in a shared story
+TEMPLATE_NAME = "{CHILD_NAME}"
+
+TEMPLATE_NAME_INSTRUCTION = (
+    f"Write the child's name exactly as {TEMPLATE_NAME} everywhere it appears; "
+    "it is replaced with each reader's own name."
+)
+
+
+def story_request_fingerprint(system_instruction: str, prompt: str) -> str:
+    """Identify everything a generated story depends on: settings, name and rules."""
+    return hashlib.sha256(f"{system_instruction}\n\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def personalize(value: Any, child_name: str) -> Any:
+    """Put the child's name in place of the placeholder throughout a template's story data."""
+    if isinstance(value, str):
+        return value.replace(TEMPLATE_NAME, child_name)
+    if isinstance(value, list):
+        return [personalize(item, child_name) for item in value]
+    if isinstance(value, dict):
+        return {key: personalize(item, child_name) for key, item in value.items()}
+    return value
+
+
+class StoryTemplates:
+    """
+    Share new stories between children with identical settings.
+
+    Children whose settings and age range match (most keep the defaults)
+    send the same story request apart from their name. Requests are built
+    with TEMPLATE_NAME instead of the name and fingerprinted; the story
+    generated for one child is kept as a template and every other child
+    with that fingerprint gets a copy with their own name, so the model is
+    only called when a child has read every template of their profile.
+
+    Concurrent misses for one fingerprint wait for a single generation. A
+    generated story without the placeholder is served once and not shared.
+    """
+
+    def __init__(self, template_repository: Optional[StoryTemplateRepository] = None):
+        self.template_repository = template_repository or StoryTemplateRepository()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "generated": 0, "coalesced": 0, "unshareable": 0}
+
+    async def story_data_for(
+        self,
+        child_id: str,
+        child_name: str,
+        fingerprint: str,
+        generate: Callable[[], Awaitable[Dict]]
+    ) -> Dict:
+        """
+        Story data for a new story for the child: a template the child has not
+        read yet, or a new one from `generate`, personalized with `child_name`.
+        """
+        template = await self.template_repository.claim(fingerprint, child_id)
+        if template is None:
+            inflight = self._inflight.get(fingerprint)
+            if inflight is not None:
+                self.stats["coalesced"] += 1
+                await asyncio.shield(inflight)
+                template = await self.template_repository.claim(fingerprint, child_id)
+        if template is not None:
+            self.stats["hits"] += 1
+            return personalize(template["story_data"], child_name)
+
+        story_data = await self._generate(child_id, fingerprint, generate)
+        return personalize(story_data, child_name)
+
+    async def _generate(self, child_id: str, fingerprint: str, generate: Callable[[], Awaitable[Dict]]) -> Dict:
+        done = asyncio.get_running_loop().create_future()
+        # A later miss waits for the newest generation; the template only needs to exist by then
+        self._inflight[fingerprint] = done
+        try:
+            story_data = await generate()
+            if TEMPLATE_NAME in story_data.get("content", ""):
+                await self.template_repository.add(fingerprint, story_data, child_id)
+                self.stats["generated"] += 1
+            else:
+                self.stats["unshareable"] += 1
+                logger.info("Story for child %s came without the name placeholder; not sharing it", child_id)
+            return story_data
+        finally:
+            done.set_result(None)
+            if self._inflight.get(fingerprint) is done:
+                del self._inflight[fingerprint]
+
+    def get_stats(self) -> Dict:
+        served = self.stats["hits"] + self.stats["generated"] + self.stats["unshareable"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / served if served else None,
+        }
@@ -8,6 +8,10 @@ from app.core.security import get_password_hash, verify_password, create_token_f
 from app.core.exceptions import UserAlreadyExists, InvalidCredentials, UserNotFound
 from app.utils.username_generator import generate_child_username
 from app.services.email_service import EmailService
+from app.services.child_context import get_child_context_cache
+import logging
+
+logger = logging.getLogger(__name__)
 
 class UserService:
     def __init__(self):
@@ -106,7 +110,7 @@ class UserService:
             )
         except Exception as e:
             # Log the email error but don't fail the child creation
-            print(f"Failed to send email: {str(e)}")
+            logger.error("Failed to send email: %s", e)
             # The child account was created successfully, so we'll still return it
             # The email error will be handled by the route handler
 
@@ -274,9 +278,11 @@ class UserService:
 
             if result.modified_count == 0:
                 raise UserNotFound("Failed to update child profile")
+            # Stories address the child by name
+            get_child_context_cache().invalidate(child_id)
 
             # Get updated child profile
             return await self.get_user_profile(child_id, UserRole.CHILD)
         except Exception as e:
-            print(f"Error updating child profile: {str(e)}")
+            logger.error("Error updating child profile: %s", e)
             raise UserNotFound(f"Failed to update child profile: {str(e)}") 
\ No newline at end of file
@@ -1,6 +1,7 @@
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
+from functools import lru_cache
 from typing import List, Dict, Optional
 from app.models.science_qa import TextChunk
 import os
@@ -126,4 +127,10 @@ class VectorStore:
             "chunk_id": id,
             "content": doc,
             "metadata": meta
-        } 
\ No newline at end of file
+        } 
+
+
+@lru_cache()
+def get_vector_store() -> VectorStore:
+    """The process-wide vector store; loading the embedding model is expensive."""
+    return VectorStore()
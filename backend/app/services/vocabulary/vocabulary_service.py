@@ -8,9 +8,13 @@ import json
 logger = logging.getLogger(__name__)
 
 class VocabularyService:
-    def __init__(self):
-        self.llm_service = LLMService()
-        self.vocabulary_repository = VocabularyRepository()
+    def __init__(
+        self,
+        llm_service: Optional[LLMService] = None,
+        vocabulary_repository: Optional[VocabularyRepository] = None
+    ):
+        self.llm_service = llm_service or LLMService()
+        self.vocabulary_repository = vocabulary_repository or VocabularyRepository()
 
     async def generate_vocabulary_words(
         self,
@@ -121,29 +125,18 @@ Remember to:
                 response_text = await self.llm_service.generate_content_with_json_format(
                     system_instruction=system_instruction,
                     query=prompt,
-                    response_schema=vocabulary_schema
+                    response_schema=vocabulary_schema,
+                    caller="vocabulary"
                 )
 
                 # Parse the response string into a dictionary
                 response_dict = json.loads(response_text)
 
-                # Create VocabularyWord objects
-                vocabulary_words = [
-                    VocabularyWord(
-                        word=word["word"],
-                        synonym=word["synonym"],
-                        meaning=word["meaning"],
-                        related_words=word["related_words"],
-                        story_id=story_id,
-                        child_id=child_id
-                    )
-                    for word in response_dict["vocabulary_words"]
-                ]
-
-                # Store vocabulary words
-                await self.vocabulary_repository.create_vocabulary_words(vocabulary_words)
-
-                return vocabulary_words
+                return await self.store_vocabulary_words(
+                    response_dict["vocabulary_words"],
+                    child_id=child_id,
+                    story_id=story_id
+                )
 
             except json.JSONDecodeError as e:
                 logger.error(f"Failed to parse JSON response: {str(e)}")
@@ -159,6 +152,41 @@ Remember to:
             logger.error(f"Error generating vocabulary words: {str(e)}")
             raise ValueError(f"Failed to generate vocabulary words: {str(e)}")
 
+    async def store_vocabulary_words(
+        self,
+        words: List[Dict],
+        child_id: str,
+        story_id: str
+    ) -> List[VocabularyWord]:
+        """
+        Store vocabulary words that were already generated, e.g. together with their story.
+
+        Args:
+            words: Dicts with word, synonym, meaning and related_words
+            child_id: The ID of the child
+            story_id: The ID of the story
+
+        Returns:
+            List of VocabularyWord objects
+        """
+        # Create VocabularyWord objects
+        vocabulary_words = [
+            VocabularyWord(
+                word=word["word"],
+                synonym=word["synonym"],
+                meaning=word["meaning"],
+                related_words=word["related_words"],
+                story_id=story_id,
+                child_id=child_id
+            )
+            for word in words
+        ]
+
+        # Store vocabulary words
+        await self.vocabulary_repository.create_vocabulary_words(vocabulary_words)
+
+        return vocabulary_words
+
     async def get_child_vocabulary_words(self, child_id: str) -> List[Dict]:
         """Get all vocabulary words for a specific child with story titles."""
         return await self.vocabulary_repository.get_child_vocabulary_words(child_id)
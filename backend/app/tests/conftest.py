@@ -0,0 +1,36 @@
+import google.generativeai as genai
+import pytest
+from fastapi import FastAPI
+
+from app.api.v1.routes import story
+from app.db.mongo import MongoDB
+from app.services.child_context import get_child_context_cache
+from app.tests.fakes import FakeCollection, FakeDatabase, ModelCalls, fake_generate_content_async
+
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    """Record every model call; answer with the fake story model unless a test sets `respond`."""
+    calls = ModelCalls()
+
+    async def generate(model, contents, generation_config=None, **kwargs):
+        calls.append(contents)
+        return await calls.respond(model, contents, generation_config, **kwargs)
+
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content_async", generate)
+    return calls
+
+
+@pytest.fixture
+def story_app(monkeypatch):
+    get_child_context_cache.cache_clear()
+    db = FakeDatabase()
+    db["children"] = FakeCollection([
+        {"child_id": "child-0", "first_name": "Abebe", "last_name": "Kebede"}
+    ])
+    monkeypatch.setattr(MongoDB, "db", db)
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content_async", fake_generate_content_async)
+
+    app = FastAPI()
+    app.include_router(story.router)
+    return app
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import types
+
+LLM_LATENCY = 0.2
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStream:
+    """The async iterator returned by generate_content_async(stream=True)."""
+
+    def __init__(self, text: str, chunk_size: int = 7):
+        self.chunks = [FakeResponse(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, field_direction in reversed(keys):
+            self.documents = sorted(self.documents, key=lambda document: document[field], reverse=field_direction < 0)
+        return self
+
+    def skip(self, count):
+        self.documents = self.documents[count:]
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self.documents[:length]
+
+
+OPERATORS = {
+    "$ne": lambda field, value: value not in field if isinstance(field, list) else field != value,
+    "$in": lambda field, value: field in value,
+    "$lt": lambda field, value: field is not None and field < value,
+    "$lte": lambda field, value: field is not None and field <= value,
+    "$gte": lambda field, value: field is not None and field >= value,
+}
+
+
+def matches(document, query):
+    for key, value in query.items():
+        if key == "$or":
+            if not any(matches(document, clause) for clause in value):
+                return False
+        elif isinstance(value, dict) and value and all(op in OPERATORS for op in value):
+            if not all(OPERATORS[op](document.get(key), operand) for op, operand in value.items()):
+                return False
+        elif document.get(key) != value:
+            return False
+    return True
+
+
+def apply_update(document, update):
+    document.update(update.get("$set", {}))
+    for key, amount in update.get("$inc", {}).items():
+        document[key] = document.get(key, 0) + amount
+    for key, value in update.get("$addToSet", {}).items():
+        if value not in document.setdefault(key, []):
+            document[key].append(value)
+
+
+class FakeCollection:
+    """
+    Just enough of a motor collection for the story pipeline.
+    `calls` records the name of every method called on it, in order.
+    """
+
+    def __init__(self, documents=None):
+        self.documents = list(documents or [])
+        self.calls = []
+
+    def _matching(self, query, sort=None):
+        cursor = FakeCursor([document for document in self.documents if matches(document, query)])
+        for key, direction in sort or []:
+            cursor.sort(key, direction)
+        return cursor.documents
+
+    def find(self, query):
+        self.calls.append("find")
+        return FakeCursor(self._matching(query))
+
+    async def find_one(self, query, projection=None):
+        self.calls.append("find_one")
+        found = self._matching(query)
+        return found[0] if found else None
+
+    async def find_one_and_delete(self, query, sort=None):
+        self.calls.append("find_one_and_delete")
+        found = self._matching(query, sort)
+        if not found:
+            return None
+        self.documents.remove(found[0])
+        return found[0]
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=False):
+        self.calls.append("find_one_and_update")
+        found = self._matching(query, sort)
+        if not found:
+            return None
+        apply_update(found[0], update)
+        return found[0]
+
+    async def update_one(self, query, update, upsert=False):
+        self.calls.append("update_one")
+        found = self._matching(query)
+        document = found[0] if found else None
+        if document is None and upsert:
+            document = dict(query)
+            self.documents.append(document)
+        if document is not None:
+            apply_update(document, update)
+        return types.SimpleNamespace(modified_count=int(document is not None))
+
+    async def update_many(self, query, update):
+        self.calls.append("update_many")
+        updated = self._matching(query)
+        for document in updated:
+            apply_update(document, update)
+        return types.SimpleNamespace(modified_count=len(updated))
+
+    async def count_documents(self, query):
+        self.calls.append("count_documents")
+        return len(self._matching(query))
+
+    async def delete_many(self, query):
+        self.calls.append("delete_many")
+        deleted = self._matching(query)
+        self.documents[:] = [document for document in self.documents if not matches(document, query)]
+        return types.SimpleNamespace(deleted_count=len(deleted))
+
+    async def insert_one(self, document):
+        self.calls.append("insert_one")
+        self.documents.append(document)
+
+    async def insert_many(self, documents):
+        self.calls.append("insert_many")
+        self.documents.extend(documents)
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+FAKE_VOCABULARY_WORDS = [
+    {"word": "brave", "synonym": "bold", "meaning": "Not afraid", "related_words": ["coffee", "market", "river"]},
+    {"word": "shared", "synonym": "gave", "meaning": "Let others have some", "related_words": ["lion", "sun", "song"]},
+    {"word": "kind", "synonym": "gentle", "meaning": "Nice to others", "related_words": ["injera", "bird", "school"]},
+]
+
+
+async def fake_generate_content_async(self, contents, generation_config=None, **kwargs):
+    await asyncio.sleep(LLM_LATENCY)
+    if '"title"' not in contents:
+        payload = {"vocabulary_words": FAKE_VOCABULARY_WORDS[:1]}
+    else:
+        # Shared story templates are requested with a name placeholder
+        name = "{CHILD_NAME}" if "{CHILD_NAME}" in contents else "Abebe"
+        payload = {
+            "title": "Abebe and the Lion",
+            "content": f"Once upon a time in Addis Ababa, {name} " + "shared injera with friends. " * 6,
+            "vocabulary_words": FAKE_VOCABULARY_WORDS
+        }
+    if kwargs.get("stream"):
+        return FakeStream(json.dumps(payload))
+    return FakeResponse(json.dumps(payload))
+
+
+class ModelCalls(list):
+    """
+    The prompts sent to the model, in order. Each call is answered by
+    `respond`, which takes the same arguments as generate_content_async.
+    """
+
+    def __init__(self, respond=fake_generate_content_async):
+        super().__init__()
+        self.respond = respond
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from app.db.mongo import MongoDB
+from app.services.child_context import get_child_context_cache
+
+
+async def test_child_context_is_fetched_once_and_invalidated_by_writers(story_app):
+    from app.repositories.reward_repository import RewardRepository
+    from app.repositories.settings_repository import SettingsRepository
+
+    def reads():
+        return {name: MongoDB.db[name].calls.count("find_one") for name in ("children", "settings", "rewards")}
+
+    MongoDB.db["children"].documents[0]["parent_id"] = "parent-0"
+
+    cache = get_child_context_cache()
+    first, second = await asyncio.gather(cache.get("child-0"), cache.get("child-0"))
+    assert first is second and reads() == {"children": 1, "settings": 1, "rewards": 1}
+    assert (first.name, first.parent_id, first.age_range, first.level) == ("Abebe Kebede", "parent-0", "4-8", 0)
+    # Defaults were created by the first fetch
+    assert MongoDB.db["settings"].documents and MongoDB.db["rewards"].documents
+
+    assert (await cache.get("child-0")) is first and reads() == {"children": 1, "settings": 1, "rewards": 1}
+
+    await SettingsRepository().update("child-0", {"themes": ["space"]})
+    assert (await cache.get("child-0")).settings["themes"] == ["space"]
+
+    reward = RewardRepository()
+    MongoDB.db["rewards"].documents[0]["xp"] = 9
+    context = await cache.get("child-0")
+    await reward.add_xp_for_question("child-0")  # level up
+    assert context is not await cache.get("child-0")
+    assert (await cache.get("child-0")).level == 1
+
+    with pytest.raises(ValueError):
+        await cache.get("child-unknown")
+    # No defaults are left behind for a child that does not exist
+    for name in ("settings", "rewards"):
+        assert [document["child_id"] for document in MongoDB.db[name].documents] == ["child-0"]
+    assert cache.get_stats()["coalesced"] == 1
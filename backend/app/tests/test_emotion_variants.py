@@ -0,0 +1,48 @@
+import json
+import time
+
+import httpx
+
+from app.api.v1.dependencies.auth import get_current_user
+from app.db.mongo import MongoDB
+from app.models.enums import UserRole
+from app.tests.fakes import LLM_LATENCY
+
+
+async def test_emotion_variants_are_precomputed_once_the_feature_is_used(story_app):
+    from app.api.v1.dependencies.services import init_services
+
+    init_services(story_app)
+    story_service = story_app.state.story_service
+    variants = story_app.state.emotion_variants
+    variants.start()
+    stored = MongoDB.db["story_variants"].documents
+
+    # A child who never tapped an emotion costs no extra model calls
+    story = await story_service.generate_personalized_story("child-0")
+    await variants.join()
+    assert stored == [] and variants.get_stats()["skipped_inactive"] == 1
+
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        # First tap: regenerated live, then both variants of the new story are prepared
+        response = await client.put("/stories/story/update-emotion", json={"story_id": story.story_id, "emotion": "sad"})
+        assert response.status_code == 200
+        await variants.join()
+        story_id = response.json()["story_id"]
+        assert sorted(entry["variant"] for entry in stored) == ["positive", "uplifting"]
+        assert {entry["story_id"] for entry in stored} == {story_id}
+
+        # Second tap: the uplifting variant is swapped in without waiting for the model
+        start = time.perf_counter()
+        response = await client.put("/stories/story/update-emotion", json={"story_id": story_id, "emotion": "fear"})
+        assert response.status_code == 200
+        assert time.perf_counter() - start < LLM_LATENCY
+        assert all(entry["story_id"] != story_id for entry in stored)
+        await variants.join()
+
+    stats = variants.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"], stats["generated"]) == (1, 1, 0.5, 4)
+    assert len(stored) == 2
+    await variants.stop()
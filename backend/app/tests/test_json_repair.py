@@ -0,0 +1,32 @@
+import pytest
+
+from app.services.llm.json_repair import JSONRepairError, repair_json
+
+
+@pytest.mark.parametrize("text, expected", [
+    (
+        'Here is your story:\n```json\n{"title": "A", "content": "B"}\n```\nEnjoy!',
+        {"title": "A", "content": "B"}
+    ),
+    ('{"title": "A", "content": "B",}', {"title": "A", "content": "B"}),
+    ('{"tags": ["x", "y",], }', {"tags": ["x", "y"]}),
+    ('{"title": "A", "content": "Once upon a time', {"title": "A", "content": "Once upon a time"}),
+    ('{"title": "A", "tags": ["x", "y"', {"title": "A", "tags": ["x", "y"]}),
+    ('{"title": "A", "cont', {"title": "A"}),
+    ('{"title": "The "Big" Lion", "content": "ok"}', {"title": 'The "Big" Lion', "content": "ok"}),
+    ('{"title": "The "Big"\n  Lion"  \n}', {"title": 'The "Big"\n  Lion'}),
+    ('{"title": "A"  \n', {"title": "A"}),
+    ('{"title": "A",\n```\n"content": "B"}', {"title": "A", "content": "B"}),
+    ('{"title": "line one\nline two"}', {"title": "line one\nline two"}),
+    (
+        'Like this: {"title": "x"}. Answer: {"title": "Real", "content": "Story"}',
+        {"title": "Real", "content": "Story"}
+    ),
+])
+def test_repair_json(text, expected):
+    assert repair_json(text) == expected
+
+
+def test_repair_json_without_object():
+    with pytest.raises(JSONRepairError):
+        repair_json("I cannot write that story.")
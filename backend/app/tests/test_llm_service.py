@@ -0,0 +1,454 @@
+import asyncio
+import json
+import time
+
+import google.generativeai as genai
+import pytest
+
+from app.services.llm import llm_service as llm_module
+from app.services.llm.llm_service import LLMService
+from app.tests.fakes import FakeResponse
+
+
+def test_incremental_parser_handles_escapes_split_across_chunks():
+    from app.services.llm.json_stream import IncrementalJSONParser
+
+    document = json.dumps({"title": "Tig\u00e9 \"Lion\"", "content": "Line one\nLine \u00e9two"})
+    for size in (1, 3, 100):
+        parser = IncrementalJSONParser(stream_fields=["content"])
+        events = []
+        for i in range(0, len(document), size):
+            events.extend(parser.feed(document[i:i + size]))
+        fields = {field: value for kind, field, value in events if kind == "field"}
+        streamed = "".join(value for kind, field, value in events if kind == "delta")
+        assert fields == json.loads(document)
+        assert streamed == fields["content"]
+
+
+async def test_model_calls_respect_concurrency_limit(monkeypatch):
+    monkeypatch.setattr(llm_module.settings, "LLM_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(LLMService, "_semaphore", None)
+    in_flight = 0
+    peak = 0
+
+    async def tracking_generate(self, contents, generation_config=None, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return FakeResponse(json.dumps({"response": "Plants need sunlight."}))
+
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content_async", tracking_generate)
+    service = LLMService()
+    schema = {
+        "type": "object",
+        "properties": {"response": {"type": "string"}},
+        "required": ["response"]
+    }
+
+    results = await asyncio.gather(*[
+        service.generate_json_content(prompt=f"Question {i}", json_schema=schema)
+        for i in range(6)
+    ])
+
+    assert all(result["response"] == "Plants need sunlight." for result in results)
+    assert peak == 2
+
+
+async def test_model_call_timeout_is_retried_then_fails(monkeypatch):
+    monkeypatch.setattr(llm_module.settings, "LLM_REQUEST_TIMEOUT_SECONDS", 0.01)
+
+    async def slow_generate(self, contents, generation_config=None, **kwargs):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content_async", slow_generate)
+    service = LLMService()
+    schema = {"type": "object", "properties": {"response": {"type": "string"}}}
+
+    with pytest.raises(ValueError):
+        await service.generate_json_content(prompt="Hi", json_schema=schema, retry_count=2)
+
+
+def test_schema_registry_compiles_once_and_keeps_nested_objects():
+    from app.services.llm.schema_registry import SchemaRegistry
+
+    registry = SchemaRegistry()
+    schema = {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "vocabulary_table": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "word": {"type": "string"},
+                        "related_words": {"type": "array", "items": {"type": "string"}}
+                    },
+                    "required": ["word", "related_words"]
+                }
+            }
+        },
+        "required": ["title", "vocabulary_table"]
+    }
+    # Same schema, different key order, must map to the same entry
+    reordered = {"required": schema["required"], "properties": schema["properties"], "type": "object"}
+
+    compiled = registry.get(schema)
+    assert registry.get(reordered) is compiled
+    assert len(registry) == 1
+
+    response = {
+        "title": "The Brave Lion",
+        "vocabulary_table": [{"word": "brave", "related_words": ["sun", "tree", "river"]}]
+    }
+    assert compiled.model(**response).model_dump() == response
+    compiled.validator.validate(response)
+
+
+async def test_repairable_json_does_not_retry_the_model(model_calls):
+    async def truncated(self, contents, generation_config=None, **kwargs):
+        return FakeResponse('```json\n{"response": "Plants need sunlight",')
+
+    model_calls.respond = truncated
+    service = LLMService()
+    schema = {"type": "object", "properties": {"response": {"type": "string"}}, "required": ["response"]}
+
+    result = await service.generate_json_content(prompt="Plants?", json_schema=schema)
+
+    assert result == {"response": "Plants need sunlight"}
+    assert len(model_calls) == 1
+    schema_key = service.schema_registry.get(schema).fingerprint[:12]
+    assert service.repair_stats.get_stats()[schema_key]["repaired"] == 1
+
+
+async def test_identical_concurrent_requests_share_one_call(model_calls):
+    async def respond(self, contents, generation_config=None, **kwargs):
+        await asyncio.sleep(0.05)
+        return FakeResponse(json.dumps({"response": "Nouns name things."}))
+
+    model_calls.respond = respond
+    service = LLMService()
+    schema = {"type": "object", "properties": {"response": {"type": "string"}}}
+
+    results = await asyncio.gather(*[
+        service.generate_json_content(prompt="What is a noun?", json_schema=schema)
+        for _ in range(5)
+    ])
+
+    assert len(model_calls) == 1
+    assert all(result == {"response": "Nouns name things."} for result in results)
+    # Followers get their own copy of the result
+    results[1]["response"] = "changed"
+    assert results[0]["response"] == "Nouns name things."
+
+
+async def test_single_flight_fans_out_errors_and_survives_cancellation():
+    from app.services.llm.single_flight import SingleFlight
+
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise RuntimeError("quota exceeded")
+
+    first = asyncio.ensure_future(flights.do("key", failing))
+    second = asyncio.ensure_future(flights.do("key", failing))
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(first, second, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    started = 0
+
+    async def slow():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.05)
+        return "done"
+
+    leader = asyncio.ensure_future(flights.do("other", slow))
+    follower = asyncio.ensure_future(flights.do("other", slow))
+    await asyncio.sleep(0)
+    leader.cancel()
+    # The follower still gets the result of the shared call
+    assert await follower == "done"
+    assert started == 1
+    assert flights.get_stats()["coalesced"] == 2
+    assert flights.get_stats()["in_flight"] == 0
+
+
+async def test_scheduler_serves_interactive_before_background():
+    from app.services.llm.scheduler import LLMPriority, LLMScheduler
+
+    # 600 requests per minute refills one request every 0.1 seconds
+    scheduler = LLMScheduler(requests_per_minute=600)
+    scheduler.requests.available = 0
+    order = []
+
+    async def call(priority, name):
+        await scheduler.acquire(priority, tokens=10)
+        order.append(name)
+
+    tasks = [
+        asyncio.ensure_future(call(LLMPriority.BACKGROUND, "background")),
+        asyncio.ensure_future(call(LLMPriority.GENERATION, "story")),
+        asyncio.ensure_future(call(LLMPriority.INTERACTIVE, "chat")),
+    ]
+    await asyncio.gather(*tasks)
+
+    assert order == ["chat", "story", "background"]
+    stats = scheduler.get_stats()["priorities"]
+    assert stats["background"]["max_queue_seconds"] >= stats["interactive"]["max_queue_seconds"]
+
+
+async def test_scheduler_rejects_background_work_when_drained():
+    from app.services.llm.scheduler import LLMPriority, LLMRateLimitExceeded, LLMScheduler
+
+    scheduler = LLMScheduler(tokens_per_minute=1000, max_queue_size=1, background_policy="reject")
+    assert await scheduler.acquire(LLMPriority.BACKGROUND, tokens=1000) == 0.0
+
+    with pytest.raises(LLMRateLimitExceeded):
+        await scheduler.acquire(LLMPriority.BACKGROUND, tokens=500)
+
+    waiting = asyncio.ensure_future(scheduler.acquire(LLMPriority.GENERATION, tokens=500))
+    await asyncio.sleep(0)
+    # The generation queue only holds one waiter
+    with pytest.raises(LLMRateLimitExceeded):
+        await scheduler.acquire(LLMPriority.GENERATION, tokens=500)
+    waiting.cancel()
+    assert scheduler.get_stats()["priorities"]["background"]["rejected"] == 1
+
+
+async def test_stub_backend_returns_schema_valid_deterministic_responses():
+    from app.services.llm.backends import StubBackend
+
+    schema = {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string", "description": "The title of the story"},
+            "story_body": {"type": "string", "description": "The main content of the story"},
+            "vocabulary_table": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "word": {"type": "string"},
+                        "related_words": {"type": "array", "items": {"type": "string"}}
+                    },
+                    "required": ["word", "related_words"]
+                }
+            }
+        },
+        "required": ["title", "story_body", "vocabulary_table"]
+    }
+    service = LLMService()
+    service.backend = StubBackend(latency_seconds=0, distribution="fixed")
+
+    first = await service.generate_json_content("A story about a lion", schema, bypass_cache=True)
+    second = await service.generate_json_content("A story about a lion", schema, bypass_cache=True)
+    assert first == second
+    assert len(first["story_body"]) >= 200
+    assert len(first["vocabulary_table"]) == 3
+
+    service.backend = StubBackend(latency_seconds=0, distribution="fixed", failure_rate=1.0)
+    with pytest.raises(ValueError):
+        await service.generate_json_content("A story about a lion", schema, bypass_cache=True)
+
+
+async def test_llm_calls_are_recorded_per_caller_and_outcome(monkeypatch):
+    from app.services.llm.backends import StubBackend
+    from app.services.llm.metrics import LLMMetrics
+
+    schema = {
+        "type": "object",
+        "properties": {"response": {"type": "string"}},
+        "required": ["response"]
+    }
+    responses = iter(["not json at all", '{"answer": "wrong field"}', '{"response": "ok"}'])
+
+    async def flaky_generate(self, contents, generation_config=None, **kwargs):
+        return FakeResponse(next(responses))
+
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content_async", flaky_generate)
+    service = LLMService()
+    service.metrics = LLMMetrics()
+    await service.generate_json_content("hi", schema, bypass_cache=True, caller="chat")
+
+    stats = service.metrics.get_stats()["chat"]
+    assert stats["outcomes"] == {"json_error": 1, "validation_error": 1, "ok": 1}
+    assert stats["retries"] == 2
+    assert stats["retries_per_success"] == 2
+    # FakeResponse has no usage metadata, so tokens are estimated
+    assert stats["estimated_token_calls"] == 3
+
+    service.backend = StubBackend(latency_seconds=0, distribution="fixed")
+    await service.generate_json_content("hi", schema, bypass_cache=True, caller="question")
+    assert service.metrics.get_stats()["question"]["estimated_token_calls"] == 0
+
+    exposition = service.metrics.render_prometheus()
+    assert 'buddy_llm_calls_total{caller="chat",model="gemini-2.5-flash-preview-04-17",outcome="json_error"} 1' in exposition
+    assert 'buddy_llm_call_latency_seconds_bucket{caller="question",le="+Inf"} 1' in exposition
+
+
+async def test_model_handles_are_cached_per_system_instruction():
+    from app.services.llm.backends import StubBackend
+    from app.services.llm.model_cache import ModelCache
+
+    schema = {
+        "type": "object",
+        "properties": {"response": {"type": "string"}},
+        "required": ["response"]
+    }
+    service = LLMService()
+    service.backend = StubBackend(latency_seconds=0, distribution="fixed")
+    service.model_cache = ModelCache(max_entries=2)
+    sent = []
+    original_create = service.backend.create_model
+
+    def recording_create(**kwargs):
+        model = original_create(**kwargs)
+        original_generate = model.generate_content_async
+
+        async def generate(contents, **generate_kwargs):
+            sent.append((model.system_instruction, contents))
+            return await original_generate(contents, **generate_kwargs)
+
+        model.generate_content_async = generate
+        return model
+
+    service.backend.create_model = recording_create
+
+    for child in ("Abebe", "Almaz", "Kebede"):
+        await service.generate_json_content(f"Story for {child}", schema, system_instruction="RULES", bypass_cache=True)
+    await service.generate_json_content("Story for Abebe", schema, system_instruction="OTHER RULES", bypass_cache=True)
+
+    assert service.model_cache.get_stats() == {"hits": 2, "misses": 2, "evictions": 0, "size": 2}
+    # The static rules travel as the system instruction; only the dynamic part is the prompt
+    instruction, contents = sent[0]
+    assert instruction.startswith("RULES\n\n") and '"response"' in instruction
+    assert contents == "Story for Abebe"
+
+    await service.generate_json_content("Story", schema, system_instruction="THIRD RULES", bypass_cache=True)
+    assert service.model_cache.get_stats()["evictions"] == 1
+
+
+def test_circuit_breaker_opens_on_errors_and_closes_after_a_probe():
+    from app.services.llm.circuit_breaker import CircuitBreaker, CircuitState
+
+    breaker = CircuitBreaker("model", min_calls=4, error_rate=0.5, slow_call_seconds=1.0, open_seconds=0.05)
+    for success in (True, False, True):
+        breaker.record(success, 0.1)
+    assert breaker.state == CircuitState.CLOSED
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the probe
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitState.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitState.CLOSED
+
+    # Slow calls trip it as well
+    breaker = CircuitBreaker("model", min_calls=2, slow_call_seconds=1.0, slow_call_rate=0.8)
+    breaker.record(True, 2.0)
+    breaker.record(True, 3.0)
+    assert breaker.state == CircuitState.OPEN
+
+
+async def test_open_circuit_moves_calls_to_fallback_model_then_fails_fast(monkeypatch):
+    from app.services.llm.backends import StubBackend, StubModel
+    from app.services.llm.circuit_breaker import CircuitBreakers, LLMUnavailable
+
+    monkeypatch.setattr(llm_module.settings, "LLM_FALLBACK_MODEL", "fallback-model")
+    schema = {
+        "type": "object",
+        "properties": {"answer": {"type": "string"}},
+        "required": ["answer"]
+    }
+    service = LLMService()
+    service.backend = StubBackend(latency_seconds=0, distribution="fixed")
+    service.circuit_breakers = CircuitBreakers(min_calls=2, error_rate=0.5, open_seconds=60)
+    down = {service.model_name}
+    models = []
+    original_generate = StubModel.generate_content_async
+
+    async def generate(self, contents, **kwargs):
+        models.append(self.model_name)
+        if self.model_name in down:
+            raise RuntimeError("model is down")
+        return await original_generate(self, contents, **kwargs)
+
+    monkeypatch.setattr(StubModel, "generate_content_async", generate)
+
+    # The third attempt goes to the fallback once the primary's circuit opens
+    assert await service.generate_json_content("first", schema, bypass_cache=True)
+    assert models == [service.model_name, service.model_name, "fallback-model"]
+
+    # One failure in two calls trips the fallback too, and the retries stop there
+    down.add("fallback-model")
+    with pytest.raises(LLMUnavailable):
+        await service.generate_json_content("second", schema, bypass_cache=True)
+    assert len(models) == 4
+
+    # With every circuit open, calls fail without reaching a model
+    with pytest.raises(LLMUnavailable):
+        await service.generate_json_content("third", schema, bypass_cache=True)
+    assert len(models) == 4
+    stats = service.circuit_breakers.get_stats()["models"]
+    assert stats[service.model_name]["state"] == stats["fallback-model"]["state"] == "open"
+
+
+async def test_slow_call_is_hedged_and_the_loser_cancelled(monkeypatch):
+    from app.services.llm.backends import StubBackend, StubModel
+    from app.services.llm.hedging import Hedger
+    from app.services.llm.metrics import LLMMetrics
+
+    monkeypatch.setattr(llm_module.settings, "LLM_HEDGING_ENABLED", True)
+    schema = {
+        "type": "object",
+        "properties": {"answer": {"type": "string"}},
+        "required": ["answer"]
+    }
+    service = LLMService()
+    service.backend = StubBackend(latency_seconds=0, distribution="fixed")
+    service.metrics = LLMMetrics()
+    service.hedger = Hedger(callers=["story"], min_samples=1, min_delay_seconds=0.05, budget_burst=1.0)
+    service.hedger.record("story", 0.01)
+    calls = 0
+    original_generate = StubModel.generate_content_async
+
+    async def generate(self, contents, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(5)  # the tail
+        return await original_generate(self, contents, **kwargs)
+
+    monkeypatch.setattr(StubModel, "generate_content_async", generate)
+
+    start = time.perf_counter()
+    assert await service.generate_json_content("hello", schema, bypass_cache=True, caller="story")
+    assert time.perf_counter() - start < 1
+    assert calls == 2
+    assert service.metrics.get_stats()["story"]["outcomes"] == {"ok": 1, "cancelled": 1}
+    stats = service.hedger.get_stats()
+    assert (stats["hedged"], stats["hedge_won"], stats["losers_cancelled"]) == (1, 1, 1)
+
+    # The budget is spent, so the next slow call is not duplicated
+    calls = 0
+    task = asyncio.ensure_future(service.generate_json_content("again", schema, bypass_cache=True, caller="story"))
+    await asyncio.sleep(0.2)
+    assert calls == 1
+    assert service.hedger.get_stats()["budget_exhausted"] == 1
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
@@ -0,0 +1,32 @@
+import json
+
+
+def test_logging_is_queued_structured_and_sampled():
+    import io
+    import logging
+    from app.core.logging_setup import LazyJSON, SamplingFilter, setup_logging
+
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    stream = io.StringIO()
+    payload_logger = logging.getLogger("test.payload")
+    try:
+        listener = setup_logging("INFO", "json", {"test.payload": 0.0}, stream=stream)
+        payload = {"title": "Abebe and the Lion"}
+        logging.getLogger("test").info("Story %s stored", "story-1", extra={"child_id": "child-0"})
+        payload_logger.info("Response: %s", LazyJSON(payload))  # sampled out
+        payload_logger.warning("Unparseable response: %s", LazyJSON(payload))
+        payload["title"] = "changed after logging"
+        listener.stop()
+    finally:
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+        payload_logger.filters = [f for f in payload_logger.filters if not isinstance(f, SamplingFilter)]
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record["message"] for record in records] == [
+        "Story story-1 stored",
+        'Unparseable response: {"title": "Abebe and the Lion"}',
+    ]
+    assert records[0]["logger"] == "test" and records[0]["child_id"] == "child-0"
+    assert records[1]["level"] == "WARNING"
@@ -0,0 +1,81 @@
+import json
+from datetime import datetime, timedelta
+
+from app.db.mongo import MongoDB
+from app.services.llm import llm_service as llm_module
+from app.services.llm import response_cache as cache_module
+from app.services.llm.llm_service import LLMService
+from app.services.llm.response_cache import LLMResponseCache
+from app.tests.fakes import FakeCollection, FakeDatabase, FakeResponse
+
+
+async def test_response_cache_serves_repeated_prompts(monkeypatch, model_calls):
+    monkeypatch.setattr(MongoDB, "db", None)
+    monkeypatch.setattr(llm_module.settings, "LLM_CACHE_ENABLED", True)
+
+    async def respond(self, contents, generation_config=None, **kwargs):
+        return FakeResponse(json.dumps({"response": f"Answer {len(model_calls)}"}))
+
+    model_calls.respond = respond
+    service = LLMService()
+    service.response_cache = LLMResponseCache(max_entries=8, ttl_seconds=60)
+    schema = {"type": "object", "properties": {"response": {"type": "string"}}}
+
+    first = await service.generate_json_content(prompt="Why is the sky blue?", json_schema=schema)
+    second = await service.generate_json_content(prompt="Why is the sky blue?", json_schema=schema)
+    bypassed = await service.generate_json_content(
+        prompt="Why is the sky blue?", json_schema=schema, bypass_cache=True
+    )
+    refreshed = await service.generate_json_content(
+        prompt="Why is the sky blue?", json_schema=schema, refresh_cache=True
+    )
+    after_refresh = await service.generate_json_content(prompt="Why is the sky blue?", json_schema=schema)
+    # A longer answer may be cut off at a smaller token budget, so it is not shared
+    longer = await service.generate_json_content(prompt="Why is the sky blue?", json_schema=schema, max_tokens=4096)
+
+    assert first == second == {"response": "Answer 1"}
+    assert bypassed == {"response": "Answer 2"}
+    assert refreshed == after_refresh == {"response": "Answer 3"}
+    assert longer == {"response": "Answer 4"}
+    assert len(model_calls) == 4
+    stats = service.response_cache.get_stats()
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 2
+
+
+async def test_response_cache_evicts_and_expires(monkeypatch):
+    monkeypatch.setattr(MongoDB, "db", None)
+    cache = LLMResponseCache(max_entries=2, ttl_seconds=10)
+    await cache.set("a", {"n": 1})
+    await cache.set("b", {"n": 2})
+    await cache.get("a")
+    await cache.set("c", {"n": 3})
+
+    # "b" was least recently used
+    assert await cache.get("b") is None
+    assert await cache.get("a") == {"n": 1}
+
+    now = cache_module.time.monotonic()
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now + 11)
+    assert await cache.get("c") is None
+    assert cache.get_stats()["evictions"] == 1
+
+
+async def test_response_cache_does_not_share_values_with_callers(monkeypatch):
+    db = FakeDatabase()
+    db["llm_cache"] = FakeCollection([
+        {"_id": "stored", "value": {"words": ["brave"]}, "expires_at": datetime.utcnow() + timedelta(minutes=1)}
+    ])
+    monkeypatch.setattr(MongoDB, "db", db)
+    cache = LLMResponseCache(max_entries=8, ttl_seconds=60)
+
+    from_mongo = await cache.get("stored")
+    from_mongo["words"].append("kind")
+    assert await cache.get("stored") == {"words": ["brave"]}
+
+    monkeypatch.setattr(MongoDB, "db", None)
+    value = {"words": ["brave"]}
+    await cache.set("set", value)
+    value["words"].append("kind")
+    assert await cache.get("set") == {"words": ["brave"]}
+    assert cache.get_stats()["memory_hits"] == 2
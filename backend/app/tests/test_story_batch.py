@@ -0,0 +1,102 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.api.v1.dependencies.auth import get_current_user
+from app.db.mongo import MongoDB
+from app.models.enums import UserRole
+from app.tests.fakes import FAKE_VOCABULARY_WORDS, LLM_LATENCY, FakeCollection, FakeResponse
+
+
+async def test_batch_generation_reads_and_writes_all_children_at_once(story_app):
+    children = MongoDB.db["children"]
+    children.documents[0]["parent_id"] = "parent-0"
+    children.documents += [
+        {"child_id": "child-1", "parent_id": "parent-0", "first_name": "Sara"},
+        {"child_id": "child-2", "parent_id": "parent-0", "first_name": "Dawit"},
+        {"child_id": "child-3", "parent_id": "parent-1", "first_name": "Hana"},
+    ]
+    # Different settings, so no child waits for another's story template
+    MongoDB.db["settings"] = FakeCollection([
+        {"child_id": child_id, "age_range": "4-8", "themes": [theme], "moral_values": ["kindness"], "preferences": []}
+        for child_id, theme in (("child-1", "space"), ("child-2", "music"))
+    ])
+    watched = ("children", "settings", "rewards", "stories")
+
+    def calls():
+        return {name: MongoDB.db[name].calls[:] for name in watched}
+
+    def clear_calls():
+        for name in watched:
+            MongoDB.db[name].calls.clear()
+
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("parent-0", UserRole.PARENT)
+        start = time.perf_counter()
+        response = await client.post("/stories/parent/generate/batch", json={})
+        elapsed = time.perf_counter() - start
+        events = [
+            (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in response.text.strip().split("\n\n")
+        ]
+        assert [name for name, _ in events] == ["story", "story", "story", "done"]
+        assert sorted(data["child_id"] for name, data in events[:3]) == ["child-0", "child-1", "child-2"]
+        assert events[-1][1] == {"stored": 3, "failed": 0}
+        # Concurrent model calls, one query per collection, one write for the stories that finished together
+        assert elapsed < 2 * LLM_LATENCY
+        assert calls() == {
+            "children": ["find"], "settings": ["find", "insert_many"], "rewards": ["find", "insert_many"],
+            "stories": ["insert_many"]
+        }
+        assert len(MongoDB.db["vocabulary_words"].documents) == 3 * len(FAKE_VOCABULARY_WORDS)
+
+        # Selected children of another parent are refused; cached contexts need no reads
+        clear_calls()
+        response = await client.post("/stories/parent/generate/batch", json={"child_ids": ["child-1", "child-3"]})
+        assert "event: error\ndata: {\"child_id\": \"child-3\", \"status\": 403" in response.text
+        assert response.text.count("event: story") == 1
+        assert calls() == {"children": ["find"], "settings": [], "rewards": [], "stories": ["insert_many"]}
+
+
+async def test_batch_generation_reports_failed_writes_and_does_not_wait_for_vocabulary(story_app, model_calls):
+    from app.services.story_generation.story_service import StoryService
+
+    children = MongoDB.db["children"]
+    children.documents[0]["parent_id"] = "parent-0"
+    children.documents.append({"child_id": "child-1", "parent_id": "parent-0", "first_name": "Sara"})
+    MongoDB.db["settings"] = FakeCollection([
+        {"child_id": "child-1", "age_range": "4-8", "themes": ["space"], "moral_values": ["kindness"], "preferences": []}
+    ])
+
+    async def respond(self, contents, generation_config=None, **kwargs):
+        await asyncio.sleep(LLM_LATENCY)
+        return FakeResponse(json.dumps({"title": "Abebe and the Lion", "content": "{CHILD_NAME} shared injera."}))
+
+    async def generate_vocabulary_words(**kwargs):
+        await asyncio.sleep(5 * LLM_LATENCY)
+        raise RuntimeError("vocabulary failed")
+
+    model_calls.respond = respond
+    service = StoryService()
+    service.vocabulary_service.generate_vocabulary_words = generate_vocabulary_words
+
+    # Stories without vocabulary are sent before their vocabulary is generated
+    start = time.perf_counter()
+    events = []
+    async for event in service.generate_stories_for_children("parent-0"):
+        events.append((event["event"], time.perf_counter() - start))
+    assert [name for name, _ in events] == ["story", "story", "done"]
+    assert events[1][1] < 2 * LLM_LATENCY
+    # "done" still waits for the vocabulary, which failed without ending the stream
+    assert events[2][1] >= 5 * LLM_LATENCY
+
+    async def insert_many(documents):
+        raise RuntimeError("connection reset")
+
+    MongoDB.db["stories"].insert_many = insert_many
+    events = [event async for event in service.generate_stories_for_children("parent-0")]
+    assert [(event["event"], event.get("status")) for event in events] == [("error", 500), ("error", 500), ("done", None)]
+    assert events[-1]["stored"] == 0 and events[-1]["failed"] == 2
@@ -0,0 +1,43 @@
+import json
+
+
+async def test_story_corpus_only_parses_new_and_changed_pdfs(tmp_path, monkeypatch):
+    import os
+    from app.utils.story_processing.pdf_processor import PDFProcessor
+    from app.utils.story_processing.story_corpus import StoryCorpus
+
+    parsed = []
+
+    def extract_text(self, pdf_path):
+        parsed.append(os.path.basename(pdf_path))
+        with open(pdf_path) as file:
+            return file.read()
+
+    monkeypatch.setattr(PDFProcessor, "extract_text_from_pdf", extract_text)
+    stories_dir, cache_path = tmp_path / "stories", tmp_path / "cache" / "corpus.json"
+    stories_dir.mkdir()
+    (stories_dir / "lion.pdf").write_text("The brave lion")
+    (stories_dir / "coffee.pdf").write_text("Sharing coffee")
+
+    corpus = StoryCorpus(str(stories_dir), str(cache_path), refresh_seconds=0)
+    await corpus.warm_up()
+    assert sorted(parsed) == ["coffee.pdf", "lion.pdf"]
+    assert [story["title"] for story in await corpus.stories()] == ["coffee", "lion"]
+
+    # A restart reads the text from the cache file
+    parsed.clear()
+    restarted = StoryCorpus(str(stories_dir), str(cache_path), refresh_seconds=0)
+    assert len(await restarted.stories()) == 2 and parsed == []
+
+    # Touched but unchanged, changed, and deleted files
+    stat = os.stat(stories_dir / "coffee.pdf")
+    os.utime(stories_dir / "coffee.pdf", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (stories_dir / "lion.pdf").write_text("The brave lion and the kind bird")
+    stories = await restarted.stories()
+    assert parsed == ["lion.pdf"]
+    assert {story["title"]: story["content"] for story in stories}["lion"] == "The brave lion and the kind bird"
+    assert restarted.stats["rehashed"] == 1
+
+    (stories_dir / "coffee.pdf").unlink()
+    assert [story["title"] for story in await restarted.stories()] == ["lion"]
+    assert json.loads(cache_path.read_text())["files"].keys() == {str(stories_dir / "lion.pdf")}
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.api.v1.dependencies.auth import get_current_user
+from app.db.mongo import MongoDB
+from app.models.enums import UserRole
+from app.services.llm import llm_service as llm_module
+from app.services.llm.llm_service import LLMService
+from app.tests.fakes import FAKE_VOCABULARY_WORDS, LLM_LATENCY, FakeCollection, FakeResponse, fake_generate_content_async
+
+
+async def test_concurrent_story_generation_overlaps(story_app):
+    num_requests = 5
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/stories/generate") for _ in range(num_requests)
+        ])
+        elapsed = time.perf_counter() - start
+
+    assert all(response.status_code == 200 for response in responses)
+    # Each request makes one model call (story and vocabulary together). Run
+    # one after another that is num_requests * LLM_LATENCY; overlapping
+    # requests finish in roughly LLM_LATENCY.
+    sequential = num_requests * LLM_LATENCY
+    assert elapsed < sequential / 2
+
+
+@pytest.mark.parametrize("vocabulary_words, expected_calls", [
+    (FAKE_VOCABULARY_WORDS, 1),
+    (FAKE_VOCABULARY_WORDS[:1], 2),  # too few words: the vocabulary call is the fallback
+])
+async def test_story_vocabulary_comes_from_the_story_call(story_app, model_calls, vocabulary_words, expected_calls):
+    async def respond(self, contents, generation_config=None, **kwargs):
+        response = await fake_generate_content_async(self, contents, generation_config, **kwargs)
+        payload = json.loads(response.text)
+        if "title" in payload:
+            payload["vocabulary_words"] = vocabulary_words
+        return FakeResponse(json.dumps(payload))
+
+    model_calls.respond = respond
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        response = await client.post("/stories/generate")
+
+    assert response.status_code == 200
+    assert len(model_calls) == expected_calls
+    stored = MongoDB.db["vocabulary_words"].documents
+    assert [word["word"] for word in stored] == [word["word"] for word in vocabulary_words]
+
+
+async def test_story_stream_sends_title_tokens_then_story_id(story_app):
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        response = await client.get("/stories/generate/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for frame in response.text.strip().split("\n\n"):
+        name_line, data_line = frame.split("\n")
+        events.append((name_line[len("event: "):], json.loads(data_line[len("data: "):])))
+
+    names = [name for name, _ in events]
+    assert names[0] == "title" and events[0][1]["title"] == "Abebe and the Lion"
+    assert names[-1] == "done" and events[-1][1]["story_id"]
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == events[-1][1]["content"]
+
+
+async def test_story_generation_serves_stored_story_while_circuit_is_open(story_app, monkeypatch):
+    from datetime import datetime
+    from app.services.llm.circuit_breaker import CircuitBreakers
+
+    breakers = CircuitBreakers(min_calls=1, error_rate=0.5, open_seconds=60)
+    breakers.get(LLMService().model_name).record(False)
+    monkeypatch.setattr(llm_module, "get_circuit_breakers", lambda: breakers)
+    MongoDB.db["children"].documents.append({"child_id": "child-1", "first_name": "Almaz", "last_name": "Tesfaye"})
+    MongoDB.db["stories"] = FakeCollection([
+        {
+            "story_id": f"story-{day}", "title": f"Day {day}", "content": "A stored story.", "age_range": "4-8",
+            "themes": [], "moral_values": [], "child_id": "child-0", "created_at": datetime(2025, 1, day)
+        }
+        for day in (1, 3, 2)
+    ])
+
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        response = await client.post("/stories/generate")
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-1", UserRole.CHILD)
+        unavailable = await client.post("/stories/generate")
+
+    assert response.status_code == 200
+    assert response.json()["story_id"] == "story-3"
+    assert breakers.get_stats()["degraded"] == {"story": 1}
+    # No stored story to fall back on
+    assert unavailable.status_code == 503
+
+
+async def test_gather_or_cancel_cancels_the_other_branches_on_failure():
+    from app.services.story_generation.pipeline import gather_or_cancel
+
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("Child not found")
+
+    assert await gather_or_cancel(asyncio.sleep(0, "a"), asyncio.sleep(0.01, "b")) == ["a", "b"]
+    with pytest.raises(ValueError):
+        await gather_or_cancel(slow(), failing())
+    assert cancelled == ["slow"]
+
+
+async def test_rag_story_runs_independent_stages_concurrently(story_app, model_calls, tmp_path, monkeypatch):
+    from app.services.story_generation.pipeline import get_pipeline_metrics
+    from app.services.story_generation.story_service import StoryService
+    from app.utils.story_processing.story_corpus import StoryCorpus
+
+    async def respond(self, contents, generation_config=None, **kwargs):
+        await asyncio.sleep(LLM_LATENCY)
+        return FakeResponse(json.dumps({
+            "title": "Abebe and the Lion",
+            "story_body": "Abebe shared injera with a kind lion. " * 10,
+            "image_url": "",
+            "vocabulary_table": [{"word": "kind", "synonym": "gentle", "related_words": ["lion", "sun", "song"]}]
+        }))
+
+    async def generate_image(story_data):
+        await asyncio.sleep(LLM_LATENCY)
+        return "https://images.example/abebe.png"
+
+    model_calls.respond = respond
+    service = StoryService(story_corpus=StoryCorpus(str(tmp_path), cache_path=None))
+    monkeypatch.setattr(service.image_service, "generate_story_image", generate_image)
+    get_pipeline_metrics.cache_clear()
+
+    story = await service.generate_personalized_story_using_rag("child-0")
+
+    assert story.image_url == "https://images.example/abebe.png"
+    assert "named Abebe Kebede" in model_calls[0]
+    assert MongoDB.db["stories"].documents[0]["story_id"] == story.story_id
+    assert MongoDB.db["vocabulary_words"].documents[0]["story_id"] == story.story_id
+
+    stats = get_pipeline_metrics().get_stats()["rag_story"]
+    assert set(stats["stages_seconds"]) == {
+        "context", "retrieval", "story", "image", "store_story", "store_vocabulary"
+    }
+    assert stats["outcomes"] == {"success": 1}
+    [path] = stats["critical_paths"]
+    assert path.endswith("story > image > store_story")
+
+
+async def test_story_updates_answer_429_when_the_scheduler_rejects_them(story_app):
+    from app.api.v1.dependencies.services import init_services
+    from app.services.llm.scheduler import LLMRateLimitExceeded
+
+    init_services(story_app)
+    story_service = story_app.state.story_service
+    MongoDB.db["children"].documents[0]["parent_id"] = "parent-0"
+    story = await story_service.generate_personalized_story("child-0")
+
+    async def rejected(**kwargs):
+        raise LLMRateLimitExceeded("Too many requests are waiting for the model")
+
+    story_service.llm_service.generate_json_content = rejected
+
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("parent-0", UserRole.PARENT)
+        response = await client.put("/stories/parent/story/update", json={
+            "story_id": story.story_id, "child_id": "child-0", "parent_comment": "Add a cat"
+        })
+        assert response.status_code == 429
+
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        response = await client.put("/stories/story/update-emotion", json={"story_id": story.story_id, "emotion": "sad"})
+        assert response.status_code == 429
@@ -0,0 +1,21 @@
+def test_story_index_ranks_by_bm25_with_stems_and_synonyms():
+    from app.utils.story_processing.story_index import StoryIndex, expand_query, stem
+
+    assert stem("friends") == stem("friendship") == stem("friendly") == "friend"
+    assert stem("running") == "run" and stem("kindness") == "kind"
+
+    index = StoryIndex()
+    index.add("lion", {"title": "The Brave Lion", "content": "A brave lion was fearless and bold in the forest."})
+    index.add("coffee", {"title": "Coffee Ceremony", "content": "Friends shared coffee; their friendship grew."})
+    index.add("market", {"title": "Market Day", "content": "Almaz went to the market with her mother."})
+
+    courage = index.search(expand_query(["courage"]))
+    assert [story["title"] for story, _ in courage] == ["The Brave Lion"]  # only through synonyms
+    ranked = index.search(expand_query(["friendship", "courage"]), k=2)
+    assert {story["title"] for story, _ in ranked} == {"The Brave Lion", "Coffee Ceremony"}
+
+    # Replacing and removing a story updates its postings
+    index.add("lion", {"title": "The Sleepy Lion", "content": "A lion slept all day."})
+    assert index.search(expand_query(["courage"])) == []
+    index.remove("coffee")
+    assert index.search(expand_query(["friendship"])) == [] and len(index) == 2
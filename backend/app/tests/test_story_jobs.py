@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+import httpx
+
+from app.api.v1.dependencies.auth import get_current_user
+from app.db.mongo import MongoDB
+from app.models.enums import UserRole
+
+
+async def test_story_jobs_run_in_the_background_and_expired_leases_are_reclaimed(story_app):
+    from app.api.v1.dependencies.services import init_services
+
+    init_services(story_app)
+    runner = story_app.state.story_job_runner
+    runner.concurrency, runner.poll_seconds = 1, 0.05
+    MongoDB.db["children"].documents.append({"child_id": "child-1", "first_name": "Almaz", "last_name": "Tesfaye"})
+    jobs = MongoDB.db["jobs"].documents
+    # A job whose worker died mid-run: its lease has run out
+    jobs.append({
+        "job_id": "job-crashed", "kind": "story", "child_id": "child-0", "requested_by": "child-0",
+        "params": {}, "idempotency_key": None, "status": "running", "attempts": 1,
+        "available_at": datetime.utcnow(), "lease_owner": "dead-worker",
+        "lease_expires_at": datetime.utcnow() - timedelta(seconds=1), "result": None, "error": None,
+        "created_at": datetime.utcnow() - timedelta(minutes=1), "updated_at": datetime.utcnow()
+    })
+
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-1", UserRole.CHILD)
+        submitted = await client.post("/stories/jobs", json={}, headers={"Idempotency-Key": "retry-1"})
+        assert submitted.status_code == 202 and submitted.json()["status"] == "queued"
+        job_id = submitted.json()["job_id"]
+        # A client retry gets the same job back
+        retried = await client.post("/stories/jobs", json={}, headers={"Idempotency-Key": "retry-1"})
+        assert retried.json()["job_id"] == job_id
+
+        runner.start()
+        finished = (await client.get(f"/stories/jobs/{job_id}", params={"wait": 5})).json()
+        assert finished["status"] == "succeeded"
+        assert finished["story"]["title"] == "Abebe and the Lion"
+
+        events = await client.get(f"/stories/jobs/{job_id}/events")
+        assert events.text.count("event: status") == 1 and '"succeeded"' in events.text
+
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        reclaimed = (await client.get("/stories/jobs/job-crashed", params={"wait": 5})).json()
+        assert (reclaimed["status"], reclaimed["attempts"]) == ("succeeded", 2)
+        # Another child cannot see the job
+        assert (await client.get(f"/stories/jobs/{job_id}")).status_code == 404
+
+    await runner.stop()
+    stats = runner.get_stats()
+    assert (stats["submitted"], stats["deduplicated"], stats["succeeded"], stats["reclaimed"]) == (1, 1, 2, 1)
+    assert len(MongoDB.db["stories"].documents) == 2
+
+
+async def test_story_job_worker_survives_a_failed_database_write(story_app):
+    from app.api.v1.dependencies.services import init_services
+
+    init_services(story_app)
+    runner = story_app.state.story_job_runner
+    runner.concurrency, runner.poll_seconds = 1, 0.05
+    complete = runner.job_repository.complete
+    failures = []
+
+    async def complete_once_failing(job_id, worker_id, result):
+        if not failures:
+            failures.append(job_id)
+            raise RuntimeError("connection reset")
+        return await complete(job_id, worker_id, result)
+
+    runner.job_repository.complete = complete_once_failing
+    MongoDB.db["children"].documents.append({"child_id": "child-1", "first_name": "Almaz", "last_name": "Tesfaye"})
+
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        first = (await client.post("/stories/jobs", json={})).json()["job_id"]
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-1", UserRole.CHILD)
+        second = (await client.post("/stories/jobs", json={})).json()["job_id"]
+
+        runner.start()
+        finished = (await client.get(f"/stories/jobs/{second}", params={"wait": 5})).json()
+        assert finished["status"] == "succeeded"
+
+    await runner.stop()
+    assert failures == [first]
+    assert runner.get_stats()["succeeded"] == 1
+
+
+async def test_story_jobs_retry_while_no_model_is_available_and_each_request_is_a_job(story_app):
+    from app.api.v1.dependencies.services import init_services
+    from app.services.llm.circuit_breaker import LLMUnavailable
+
+    init_services(story_app)
+    runner = story_app.state.story_job_runner
+    runner.concurrency, runner.poll_seconds = 1, 0.01
+    # Live requests would be served this old story while the circuit is open
+    MongoDB.db["stories"].documents.append({
+        "story_id": "story-old", "child_id": "child-0", "title": "An Old Story", "content": "Once upon a time.",
+        "age_range": "4-8", "themes": [], "moral_values": [], "created_at": datetime.utcnow()
+    })
+    new_story_data = runner.story_service.new_story_data
+    unavailable = []
+
+    async def new_story_data_once_unavailable(*args, **kwargs):
+        if not unavailable:
+            unavailable.append(True)
+            raise LLMUnavailable("No LLM model is available right now")
+        return await new_story_data(*args, **kwargs)
+
+    runner.story_service.new_story_data = new_story_data_once_unavailable
+
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        first = (await client.post("/stories/jobs", json={})).json()["job_id"]
+        second = (await client.post("/stories/jobs", json={})).json()["job_id"]
+        assert first != second
+
+        runner.start()
+        finished = (await client.get(f"/stories/jobs/{first}", params={"wait": 5})).json()
+        assert (finished["status"], finished["attempts"]) == ("succeeded", 2)
+        assert finished["story"]["title"] == "Abebe and the Lion"
+        assert (await client.get(f"/stories/jobs/{second}", params={"wait": 5})).json()["status"] == "succeeded"
+
+    await runner.stop()
+    stats = runner.get_stats()
+    assert (stats["submitted"], stats["deduplicated"], stats["retried"], stats["succeeded"]) == (2, 0, 1, 2)
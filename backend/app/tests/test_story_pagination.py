@@ -0,0 +1,41 @@
+import time
+
+import httpx
+
+from app.api.v1.dependencies.auth import get_current_user
+from app.db.mongo import MongoDB
+from app.models.enums import UserRole
+
+
+async def test_story_listing_pages_with_an_opaque_cursor(story_app):
+    from datetime import datetime, timedelta
+
+    from app.models.story.story import Story
+
+    base = datetime(2024, 1, 1)
+    stories = MongoDB.db["stories"]
+    # Pairs of stories share a creation time, so story_id has to break the ties
+    stories.documents = [
+        Story(story_id=f"story-{i:02d}", title=f"Story {i}", content="...", age_range="4-8", themes=[],
+              moral_values=[], child_id="child-0", created_at=base + timedelta(minutes=i // 2)).model_dump()
+        for i in range(25)
+    ] + [Story(title="Other", content="...", age_range="4-8", themes=[], moral_values=[], child_id="child-1").model_dump()]
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        seen, totals, cursor = [], [], None
+        while True:
+            params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+            page = (await client.get("/stories/my-stories", params=params)).json()
+            seen += [story["story_id"] for story in page["stories"]]
+            totals.append(page["total"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == [f"story-{i:02d}" for i in reversed(range(25))]
+        # The total is counted once, on the first page
+        assert totals == [25, None, None] and stories.calls.count("count_documents") == 1
+
+        page = (await client.get("/stories/my-stories", params={"skip": 20, "limit": 10})).json()
+        assert [story["story_id"] for story in page["stories"]][0] == "story-04" and page["total"] == 25
+        assert (await client.get("/stories/my-stories", params={"cursor": "not-a-cursor"})).status_code == 400
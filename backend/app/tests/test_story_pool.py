@@ -0,0 +1,70 @@
+import time
+
+import httpx
+
+from app.api.v1.dependencies.auth import get_current_user
+from app.db.mongo import MongoDB
+from app.models.enums import UserRole
+from app.tests.fakes import LLM_LATENCY, FakeCollection
+
+
+async def test_story_pool_serves_pregenerated_stories_and_is_invalidated(story_app):
+    from app.api.v1.dependencies.services import init_services
+    from app.repositories.settings_repository import SettingsRepository
+
+    MongoDB.db["settings"] = FakeCollection([{
+        "_id": "settings-0", "child_id": "child-0", "age_range": "4-8",
+        "themes": ["friendship"], "moral_values": ["kindness"], "preferences": ["animals"]
+    }])
+    init_services(story_app)
+    pool = story_app.state.story_pool
+    pool.size = 1
+    pool.start()
+    pooled = MongoDB.db["story_pool"].documents
+
+    transport = httpx.ASGITransport(app=story_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        story_app.dependency_overrides[get_current_user] = lambda: ("child-0", UserRole.CHILD)
+        # Empty pool: generated live, then refilled in the background
+        assert (await client.post("/stories/generate")).status_code == 200
+        await pool.join()
+        assert len(pooled) == 1
+        pooled_id = id(pooled[0])
+
+        start = time.perf_counter()
+        response = await client.post("/stories/generate")
+        assert response.status_code == 200
+        assert time.perf_counter() - start < LLM_LATENCY
+        await pool.join()
+        assert len(pooled) == 1 and id(pooled[0]) != pooled_id
+
+    stats = pool.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"], stats["generated"]) == (1, 1, 0.5, 2)
+    assert stats["refill_lag_seconds"]["count"] == 2
+    assert len(MongoDB.db["stories"].documents) == 2
+
+    await SettingsRepository().update("child-0", {"screen_time": 30})
+    assert len(pooled) == 1
+    await SettingsRepository().update("child-0", {"themes": ["space"]})
+    assert pooled == []
+    await pool.stop()
+
+
+async def test_story_pool_refills_share_templates_between_identical_children(story_app, model_calls):
+    from app.api.v1.dependencies.services import init_services
+
+    MongoDB.db["children"].documents.append({"child_id": "child-1", "first_name": "Almaz", "last_name": "Tesfaye"})
+    init_services(story_app)
+    pool = story_app.state.story_pool
+    pool.size = 1
+    pool.start()
+
+    pool.request_refill("child-0")
+    pool.request_refill("child-1")
+    await pool.join()
+    await pool.stop()
+
+    assert len(model_calls) == 1 and "{CHILD_NAME}" in model_calls[0]
+    pooled = {entry["child_id"]: entry["story_data"]["content"] for entry in MongoDB.db["story_pool"].documents}
+    assert "Abebe Kebede shared" in pooled["child-0"] and "Almaz Tesfaye shared" in pooled["child-1"]
+    assert story_app.state.story_service.story_templates.get_stats()["hits"] == 1
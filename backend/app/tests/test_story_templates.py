@@ -0,0 +1,43 @@
+import asyncio
+
+from app.db.mongo import MongoDB
+from app.tests.fakes import FakeCollection
+
+
+async def test_children_with_identical_settings_share_story_templates(story_app, model_calls):
+    from app.services.story_generation.story_service import StoryService
+
+    MongoDB.db["children"].documents += [
+        {"child_id": "child-1", "first_name": "Sara"},
+        {"child_id": "child-2", "first_name": "Dawit"},
+        {"child_id": "child-3", "first_name": "Hana"},
+    ]
+    MongoDB.db["settings"] = FakeCollection([
+        {"child_id": child_id, "age_range": "6-8", "themes": ["space"], "moral_values": ["honesty"], "preferences": []}
+        for child_id in ("child-2", "child-3")
+    ])
+    service = StoryService()
+
+    # Default settings: one model call, a copy with each child's own name
+    first = await service.generate_personalized_story("child-0")
+    second = await service.generate_personalized_story("child-1")
+    assert len(model_calls) == 1 and "{CHILD_NAME}" in model_calls[0] and "Abebe" not in model_calls[0]
+    assert "Abebe Kebede shared" in first.content and "Sara shared" in second.content
+    assert "{CHILD_NAME}" not in second.content
+
+    # A child never gets the same template twice
+    await service.generate_personalized_story("child-0")
+    assert len(model_calls) == 2
+    assert "Sara shared" in (await service.generate_personalized_story("child-1")).content
+    assert len(model_calls) == 2
+
+    # Concurrent misses for another profile wait for one generation
+    await asyncio.gather(
+        service.generate_personalized_story("child-2"),
+        service.generate_personalized_story("child-3")
+    )
+    assert len(model_calls) == 3
+    templates = MongoDB.db["story_templates"].documents
+    assert len(templates) == 3 and sorted(templates[2]["served_to"]) == ["child-2", "child-3"]
+    stats = service.story_templates.get_stats()
+    assert (stats["hits"], stats["generated"], stats["coalesced"], stats["unshareable"]) == (3, 3, 1, 0)
@@ -1,7 +1,10 @@
+import logging
 import random
 from datetime import datetime, timedelta
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 def generate_otp() -> str:
     """Generate a 6-digit OTP."""
     return str(random.randint(100000, 999999))
@@ -9,10 +12,8 @@ def generate_otp() -> str:
 def is_otp_expired(expires_at: datetime) -> bool:
     """Check if OTP has expired."""
     current_time = datetime.utcnow()
-    print(f"Current time (UTC): {current_time}")
-    print(f"OTP expires at: {expires_at}")
     is_expired = current_time > expires_at
-    print(f"Is OTP expired? {is_expired}")
+    logger.debug("OTP expires at %s (now %s UTC), expired: %s", expires_at, current_time, is_expired)
     return is_expired
 
 def get_otp_expiry(minutes: int = 5) -> datetime:
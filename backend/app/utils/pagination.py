@@ -0,0 +1,23 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+def encode_cursor(created_at: datetime, story_id: str) -> str:
+    """Opaque continuation token for the page after the story with this sort key."""
+    payload = json.dumps([created_at.isoformat(), story_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Recover the sort key from a continuation token.
+
+    Raises:
+        ValueError: If the token was not produced by encode_cursor
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, story_id = json.loads(payload)
+        return datetime.fromisoformat(created_at), str(story_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
@@ -1,7 +1,10 @@
 import PyPDF2
 from typing import List, Dict
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 class PDFProcessor:
     def __init__(self, stories_dir: str):
         self.stories_dir = stories_dir
@@ -9,17 +12,14 @@ class PDFProcessor:
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """Extract text from a PDF file."""
         try:
-            text = ""
             with open(pdf_path, 'rb') as file:
                 # Create a PDF reader object
                 pdf_reader = PyPDF2.PdfReader(file)
                 
-                # Extract text from each page
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            return text
+                # Extract text from each page, joined once instead of concatenated page by page
+                return "".join(page.extract_text() + "\n" for page in pdf_reader.pages)
         except Exception as e:
-            print(f"Error processing PDF {pdf_path}: {str(e)}")
+            logger.error("Error processing PDF %s: %s", pdf_path, e)
             return ""
 
     def process_stories(self) -> List[Dict[str, str]]:
@@ -37,6 +37,6 @@ class PDFProcessor:
                             'title': os.path.splitext(filename)[0]
                         })
         except Exception as e:
-            print(f"Error processing stories directory: {str(e)}")
+            logger.error("Error processing stories directory: %s", e)
         
         return stories 
\ No newline at end of file
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.config.settings import get_settings
+from app.utils.story_processing.pdf_processor import PDFProcessor
+from app.utils.story_processing.story_index import StoryIndex, expand_query
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+CACHE_VERSION = 1
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StoryCorpus:
+    """
+    The example stories PDF corpus, parsed once and kept in memory.
+
+    Extracted text is also saved to `cache_path`, keyed by file path with
+    the file's size, mtime and content hash, so a restart does not parse
+    the PDFs again. A refresh only looks at what changed: files whose size
+    and mtime are unchanged are not read at all, files that were touched
+    but hash the same are not parsed again, and deleted files are dropped.
+
+    `stories()` and `search()` refresh at most every `refresh_seconds`; the
+    files are scanned in a thread, so a request never waits on PDF parsing
+    once `warm_up()` has run. The BM25 index is updated with the stories
+    that changed only.
+    """
+
+    def __init__(
+        self,
+        stories_dir: str = settings.STORY_CORPUS_DIR,
+        cache_path: Optional[str] = settings.STORY_CORPUS_CACHE_PATH,
+        refresh_seconds: float = settings.STORY_CORPUS_REFRESH_SECONDS
+    ):
+        self.stories_dir = stories_dir
+        self.cache_path = cache_path
+        self.refresh_seconds = refresh_seconds
+        self.pdf_processor = PDFProcessor(stories_dir)
+        self._entries: Optional[Dict[str, Dict]] = None  # path -> size, mtime_ns, sha256, title, content
+        self._stories: List[Dict[str, str]] = []
+        self.index = StoryIndex()
+        self._refreshed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.stats = {"refreshes": 0, "parsed": 0, "rehashed": 0, "unchanged": 0, "removed": 0}
+
+    async def warm_up(self) -> None:
+        """Load the corpus before the first request needs it; call once at startup."""
+        await self._refresh()
+        logger.info("Story corpus ready: %d stories from %s", len(self._stories), self.stories_dir)
+
+    async def stories(self) -> List[Dict[str, str]]:
+        """The corpus stories (filename, title and content), refreshed if due."""
+        await self._refresh_if_due()
+        return self._stories
+
+    async def search(
+        self,
+        terms: List[str],
+        k: int = 5,
+        extra_terms: Optional[List[str]] = None
+    ) -> List[Tuple[Dict[str, str], float]]:
+        """
+        The `k` stories that best match `terms` (expanded with synonyms) and
+        `extra_terms` (taken as they are), with their BM25 scores.
+        """
+        await self._refresh_if_due()
+        query = expand_query(extra_terms or [], expand=False)
+        for term, weight in expand_query(terms).items():
+            query[term] = max(query.get(term, 0.0), weight)
+        return self.index.search(query, k)
+
+    async def _refresh_if_due(self) -> None:
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+            await self._refresh()
+
+    async def _refresh(self) -> None:
+        async with self._lock:
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+                return  # another request refreshed it while this one waited
+            # Files are read in a thread; the index is only changed here, on the event loop
+            self._apply(await asyncio.to_thread(self._scan))
+
+    def refresh(self) -> None:
+        """Bring the corpus up to date with the stories directory. Blocks on file IO."""
+        self._apply(self._scan())
+
+    def _scan(self) -> Dict[str, Dict]:
+        """Read what changed in the stories directory and return the new entries."""
+        if self._entries is None:
+            self._entries = self._load_cache()
+
+        entries: Dict[str, Dict] = {}
+        changed = False
+        try:
+            filenames = sorted(name for name in os.listdir(self.stories_dir) if name.endswith(".pdf"))
+        except OSError as e:
+            logger.error("Error processing stories directory: %s", e)
+            filenames = []
+
+        for filename in filenames:
+            path = os.path.join(self.stories_dir, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # deleted while listing
+            cached = self._entries.get(path)
+            if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+                entries[path] = cached
+                self.stats["unchanged"] += 1
+                continue
+
+            changed = True
+            sha256 = _file_hash(path)
+            if cached and cached["sha256"] == sha256:
+                # Touched or copied, but the same content
+                entries[path] = {**cached, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                self.stats["rehashed"] += 1
+                continue
+
+            entries[path] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": sha256,
+                "filename": filename,
+                "title": os.path.splitext(filename)[0],
+                "content": self.pdf_processor.extract_text_from_pdf(path)
+            }
+            self.stats["parsed"] += 1
+
+        removed = len(set(self._entries) - set(entries))
+        self.stats["removed"] += removed
+        changed = changed or removed > 0
+
+        if changed:
+            self._save_cache(entries)
+        return entries
+
+    def _apply(self, entries: Dict[str, Dict]) -> None:
+        for path in set(self.index.keys()) - set(entries):
+            self.index.remove(path)
+        stories = []
+        for path, entry in entries.items():
+            # Only stories that were successfully processed are served
+            if not entry["content"]:
+                self.index.remove(path)
+                continue
+            story = {"filename": entry["filename"], "content": entry["content"], "title": entry["title"]}
+            stories.append(story)
+            if path not in self.index or self.index.version(path) != entry["sha256"]:
+                self.index.add(path, story, version=entry["sha256"])
+        self._entries = entries
+        self._stories = stories
+        self._refreshed_at = time.monotonic()
+        self.stats["refreshes"] += 1
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                cache = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable story corpus cache %s: %s", self.cache_path, e)
+            return {}
+        if cache.get("version") != CACHE_VERSION:
+            return {}
+        return cache.get("files", {})
+
+    def _save_cache(self, entries: Dict[str, Dict]) -> None:
+        if not self.cache_path:
+            return
+        try:
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.cache_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump({"version": CACHE_VERSION, "files": entries}, file)
+            # Readers never see a half-written cache
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning("Could not save story corpus cache %s: %s", self.cache_path, e)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "stories": len(self._stories), "indexed": len(self.index)}
+
+
+@lru_cache()
+def get_story_corpus() -> StoryCorpus:
+    return StoryCorpus()
@@ -0,0 +1,168 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN = re.compile(r"[a-z]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from had has have he her his i in is it its me my of on or our she so that the
+their them then there they this to was we were what when which who will with you your
+""".split())
+
+# Tried in order; the first suffix that leaves a stem of at least three letters is removed
+_SUFFIXES = (
+    ("sses", "ss"), ("ies", "y"), ("ship", ""), ("ness", ""), ("ment", ""), ("ous", ""), ("ful", ""),
+    ("ing", ""), ("edly", ""), ("ed", ""), ("ly", ""), ("es", ""), ("s", ""),
+)
+
+# Words a child's themes and moral values are also written as in stories
+SYNONYMS = {
+    "kindness": ["kind", "caring", "gentle", "helpful", "help"],
+    "courage": ["brave", "bravery", "courageous", "fearless", "bold"],
+    "honesty": ["honest", "truth", "truthful"],
+    "friendship": ["friend", "together", "companion"],
+    "adventure": ["adventurous", "journey", "explore", "quest", "travel"],
+    "learning": ["learn", "lesson", "school", "discover", "study"],
+    "respect": ["respectful", "polite", "elders"],
+    "sharing": ["share", "generous", "give"],
+    "patience": ["patient", "calm", "wait"],
+    "responsibility": ["responsible", "duty"],
+    "gratitude": ["grateful", "thankful", "thank"],
+    "family": ["mother", "father", "sister", "brother", "grandmother", "grandfather"],
+    "animals": ["animal", "lion", "monkey", "bird", "cow", "donkey", "hyena"],
+    "nature": ["forest", "river", "tree", "mountain", "flower"],
+}
+
+SYNONYM_WEIGHT = 0.5  # a synonym match counts half as much as the term itself
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Strip common English suffixes, so "friends" and "friendship" both index as "friend"."""
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == "s" and word.endswith(("ss", "us")):
+                return word
+            word = word[:-len(suffix)] + replacement
+            if suffix in ("ing", "ed") and len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]  # running -> run
+            return word
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case, split into words, drop stopwords and stem."""
+    return [stem(word) for word in _TOKEN.findall(text.lower()) if word not in STOPWORDS]
+
+
+def _build_synonyms() -> Dict[str, List[str]]:
+    synonyms: Dict[str, set] = defaultdict(set)
+    for word, related in SYNONYMS.items():
+        group = {stem(term) for term in [word, *related]}
+        for term in group:
+            synonyms[term] |= group - {term}
+    return {term: sorted(related) for term, related in synonyms.items()}
+
+
+_SYNONYM_STEMS = _build_synonyms()
+
+
+def expand_query(terms: Iterable[str], expand: bool = True) -> Dict[str, float]:
+    """
+    Weighted index terms for a list of phrases such as themes or moral values.
+    With `expand`, each term's synonyms are added at SYNONYM_WEIGHT.
+    """
+    weights: Dict[str, float] = {}
+    for phrase in terms:
+        for token in tokenize(phrase):
+            weights[token] = max(weights.get(token, 0.0), 1.0)
+            if expand:
+                for synonym in _SYNONYM_STEMS.get(token, []):
+                    weights[synonym] = max(weights.get(synonym, 0.0), SYNONYM_WEIGHT)
+    return weights
+
+
+class StoryIndex:
+    """
+    Inverted index over stories with Okapi BM25 scoring.
+
+    Postings map each stemmed term to the stories containing it and how
+    often, so a search only touches the stories that share a term with the
+    query. Stories are added, replaced and removed one at a time; `version`
+    (e.g. a content hash) tells whether a stored story is current.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._lengths: Dict[str, int] = {}
+        self._stories: Dict[str, Dict] = {}
+        self._versions: Dict[str, Optional[str]] = {}
+        self._total_length = 0
+        self._norms: Optional[Dict[str, float]] = None  # per-story length normalization, reset on change
+
+    def __len__(self) -> int:
+        return len(self._stories)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._stories
+
+    def keys(self) -> List[str]:
+        return list(self._stories)
+
+    def version(self, key: str) -> Optional[str]:
+        return self._versions.get(key)
+
+    def add(self, key: str, story: Dict, version: Optional[str] = None) -> None:
+        """Index a story (title and content), replacing any story stored under `key`."""
+        self.remove(key)
+        counts = Counter(tokenize(f"{story.get('title', '')}\n{story.get('content', '')}"))
+        for term, count in counts.items():
+            self._postings[term][key] = count
+        length = sum(counts.values())
+        self._lengths[key] = length
+        self._total_length += length
+        self._stories[key] = story
+        self._versions[key] = version
+        self._norms = None
+
+    def remove(self, key: str) -> None:
+        story = self._stories.pop(key, None)
+        if story is None:
+            return
+        self._versions.pop(key, None)
+        self._total_length -= self._lengths.pop(key)
+        self._norms = None
+        for term in set(tokenize(f"{story.get('title', '')}\n{story.get('content', '')}")):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: Dict[str, float], k: int = 5) -> List[Tuple[Dict, float]]:
+        """The `k` best stories for weighted query terms, best first, with their scores."""
+        count = len(self._stories)
+        if not count or not query:
+            return []
+        if self._norms is None:
+            average_length = self._total_length / count or 1.0
+            self._norms = {
+                key: self.k1 * (1 - self.b + self.b * length / average_length)
+                for key, length in self._lengths.items()
+            }
+        norms = self._norms
+        scores: Dict[str, float] = defaultdict(float)
+        for term, weight in query.items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            boost = weight * math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5)) * (self.k1 + 1)
+            for key, frequency in postings.items():
+                scores[key] += boost * frequency / (frequency + norms[key])
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self._stories[key], score) for key, score in best]
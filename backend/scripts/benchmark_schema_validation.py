@@ -0,0 +1,120 @@
+import os
+import sys
+import timeit
+from typing import Any, Dict, List
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from jsonschema import validate
+from pydantic import create_model
+
+from app.services.llm.schema_registry import SchemaRegistry
+
+VOCABULARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "vocabulary_words": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "word": {"type": "string"},
+                    "synonym": {"type": "string"},
+                    "meaning": {"type": "string"},
+                    "related_words": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["word", "synonym", "meaning", "related_words"]
+            }
+        }
+    },
+    "required": ["vocabulary_words"]
+}
+
+VOCABULARY_RESPONSE = {
+    "vocabulary_words": [
+        {
+            "word": word,
+            "synonym": "bold",
+            "meaning": "Not afraid of danger",
+            "related_words": ["market", "coffee", "river"]
+        }
+        for word in ["brave", "gentle", "curious", "humble", "cheerful"]
+    ]
+}
+
+QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "question": {"type": "string"},
+        "options": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 4},
+        "correct_option_index": {"type": "integer", "minimum": 0, "maximum": 3},
+        "explanation": {"type": "string"}
+    },
+    "required": ["question", "options", "correct_option_index", "explanation"],
+    "additionalProperties": False
+}
+
+QUESTION_RESPONSE = {
+    "question": "What do plants need to grow?",
+    "options": ["Sunlight and water", "Toys", "Clothes", "A bed"],
+    "correct_option_index": 0,
+    "explanation": "Plants make food from sunlight and need water."
+}
+
+
+def legacy_create_model(schema: Dict[str, Any]):
+    """The per-call model construction LLMService used before the registry."""
+    fields = {}
+    for field_name, field_schema in schema["properties"].items():
+        field_type = str
+        if field_schema.get("type") == "integer":
+            field_type = int
+        elif field_schema.get("type") == "array":
+            field_type = List[str]
+        required = field_name in schema.get("required", [])
+        fields[field_name] = (field_type, ... if required else None)
+    return create_model("DynamicModel", **fields)
+
+
+def benchmark(label: str, func, number: int) -> float:
+    seconds = min(timeit.repeat(func, number=number, repeat=3))
+    per_call_us = seconds / number * 1_000_000
+    print(f"{label:<45} {per_call_us:>10.1f} us/call")
+    return per_call_us
+
+
+def main():
+    number = 500
+    registry = SchemaRegistry()
+
+    print("Pydantic validation (generate_json_content)")
+    before = benchmark(
+        "  before: create_model on every call",
+        lambda: legacy_create_model(QUESTION_SCHEMA)(**QUESTION_RESPONSE).model_dump(),
+        number
+    )
+    after = benchmark(
+        "  after: registry lookup + cached model",
+        lambda: registry.get(QUESTION_SCHEMA).model(**QUESTION_RESPONSE).model_dump(),
+        number
+    )
+    print(f"  speedup: {before / after:.1f}x\n")
+
+    print("jsonschema validation (generate_content_with_json_format)")
+    before = benchmark(
+        "  before: jsonschema.validate on every call",
+        lambda: validate(instance=VOCABULARY_RESPONSE, schema=VOCABULARY_SCHEMA),
+        number
+    )
+    after = benchmark(
+        "  after: registry lookup + compiled validator",
+        lambda: registry.get(VOCABULARY_SCHEMA).validator.validate(VOCABULARY_RESPONSE),
+        number
+    )
+    print(f"  speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+# Building a Gemini model needs a key but makes no request, so any value will do
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+
+from fastapi import FastAPI
+
+from app.api.v1.dependencies.services import get_story_service, init_services
+from app.db.mongo import MongoDB
+from app.services.llm.backends import get_llm_backend
+from app.services.llm.llm_service import LLMService
+from app.services.story_generation.story_service import StoryService
+from app.services.vocabulary.vocabulary_service import VocabularyService
+
+
+def legacy_story_service() -> StoryService:
+    """
+    What every story route did per request before: a StoryService with two
+    LLMServices (its own and VocabularyService's), each configuring the
+    Gemini client and building its model, plus a PDFProcessor, ImageService
+    and repositories.
+    """
+    get_llm_backend.cache_clear()
+    llm_service = LLMService()
+    get_llm_backend.cache_clear()
+    vocabulary_service = VocabularyService(llm_service=LLMService())
+    return StoryService(llm_service=llm_service, vocabulary_service=vocabulary_service)
+
+
+def benchmark(label: str, func, number: int) -> float:
+    seconds = min(timeit.repeat(func, number=number, repeat=3))
+    per_call_us = seconds / number * 1_000_000
+    print(f"{label:<50} {per_call_us:>10.1f} us/request")
+    return per_call_us
+
+
+def main():
+    # The motor client connects lazily, so no database server is needed
+    asyncio.run(MongoDB.connect_to_db())
+    number = 200
+
+    app = FastAPI()
+    init_services(app)
+    request = SimpleNamespace(app=app)
+
+    print("Story service per request (/stories/*, /vocabulary/*)")
+    before = benchmark("  before: build StoryService in the route", legacy_story_service, number)
+    after = benchmark("  after: shared instance from the dependency", lambda: get_story_service(request), number)
+    print(f"  overhead removed: {before - after:.1f} us/request ({before / after:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+import time
+from statistics import mean
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+# Answer every model call offline with a fixed latency, like a warm Gemini call
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("LLM_STUB_LATENCY_DISTRIBUTION", "fixed")
+os.environ.setdefault("LLM_STUB_LATENCY_SECONDS", "0.5")
+
+from app.db.mongo import MongoDB
+from app.services.llm.llm_service import LLMService
+from app.services.story_generation import story_service as story_module
+from app.services.story_generation.story_service import StoryService
+from app.services.vocabulary.vocabulary_service import VocabularyService
+
+
+class MemoryCollection:
+    """Just enough of a motor collection for story generation."""
+
+    def __init__(self, documents=None):
+        self.documents = list(documents or [])
+
+    async def find_one(self, query, projection=None):
+        for document in self.documents:
+            if all(document.get(key) == value for key, value in query.items()):
+                return document
+        return None
+
+    async def insert_one(self, document):
+        self.documents.append(document)
+
+    async def insert_many(self, documents):
+        self.documents.extend(documents)
+
+
+class MemoryDatabase(dict):
+    def __missing__(self, name):
+        self[name] = MemoryCollection()
+        return self[name]
+
+
+async def run(single_call: bool, number: int) -> list:
+    story_module.settings.STORY_SINGLE_CALL_VOCABULARY = single_call
+    llm_service = LLMService()
+    service = StoryService(
+        llm_service=llm_service,
+        vocabulary_service=VocabularyService(llm_service=llm_service)
+    )
+    latencies = []
+    for _ in range(number):
+        start = time.perf_counter()
+        await service.generate_personalized_story("child-0")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    MongoDB.db = MemoryDatabase()
+    MongoDB.db["children"] = MemoryCollection([
+        {"child_id": "child-0", "first_name": "Abebe", "last_name": "Kebede"}
+    ])
+    number = 5
+
+    print(f"Story generation with the stub backend ({os.environ['LLM_STUB_LATENCY_SECONDS']}s per model call)")
+    results = {}
+    for label, single_call in (("before: story call + vocabulary call", False), ("after: one combined call", True)):
+        latencies = asyncio.run(run(single_call, number))
+        results[single_call] = mean(latencies)
+        print(f"  {label:<40} mean {results[single_call]:.3f}s  max {max(latencies):.3f}s")
+
+    print(f"  vocabulary words stored: {len(MongoDB.db['vocabulary_words'].documents)}")
+    print(f"  latency removed: {results[False] - results[True]:.3f}s per story")
+
+
+if __name__ == "__main__":
+    main()